@@ -1,8 +1,15 @@
 import requests
 import json
+import asyncio
+import functools
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
 
 # Version: 1.4.2
 
+logger = logging.getLogger("esri-gdh-bridge")
+
 
 class GeodesignHubClient:
     """
@@ -11,25 +18,110 @@ class GeodesignHubClient:
 
     """
 
-    def __init__(self, token: str, url: str = None, project_id: str = None):
+    def __init__(
+        self,
+        token: str,
+        url: str = None,
+        project_id: str = None,
+        pool_maxsize: int = requests.adapters.DEFAULT_POOLSIZE,
+        cache=None,
+        single_flight=None,
+        metrics=None,
+    ):
         """
-        Declare your project id, token and the url (optional).
+        Declare your project id, token and the url (optional). Raise pool_maxsize when
+        the client is shared by more threads than the default connection pool holds.
+        A cache object with a get(client, url) method can be passed to answer the
+        read endpoints and a single_flight object with a do(key, fetch) method to
+        share identical requests that are in flight at the same time. A metrics object
+        with a record(endpoint, method, status_code, elapsed, size, retries) method is
+        called for every response received from the API.
         """
         self.project_id = project_id
         self.token = token
+        self.token_hash = hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+        self.cache = cache
+        self.single_flight = single_flight
+        self.metrics = metrics
         self.sec_url = url if url else "https://www.geodesignhub.com/api/v1/"
         self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
         headers = {
             "Authorization": "Token " + self.token,
             "Content-Type": "application/json; charset=utf-8",
         }
         self.session.headers = headers
+        if self.metrics is not None:
+            self.session.hooks["response"].append(self._record_metrics)
+
+    def _record_metrics(self, r, *args, **kwargs):
+        """Response hook, the body of a streamed response is not read here."""
+        try:
+            if kwargs.get("stream"):
+                size = int(r.headers.get("Content-Length", 0))
+            else:
+                size = len(r.content)
+            self.metrics.record(
+                endpoint=self.endpoint_name(r.request.url),
+                method=r.request.method,
+                status_code=r.status_code,
+                elapsed=r.elapsed.total_seconds(),
+                size=size,
+                retries=getattr(r, "gdh_retries", 0),
+            )
+        except (ValueError, TypeError, AttributeError, requests.RequestException) as e:
+            # A bad Content-Length, a response without a request or a body that cannot be read
+            logger.warning(f"Could not record Geodesignhub API metrics for {r.url}: {e}")
+
+    def _get(self, sec_url: str):
+        """All read endpoints go through here, so that the cache can answer them."""
+        if self.cache is not None:
+            return self.cache.get(self, sec_url)
+        return self._fetch(sec_url)
+
+    def _fetch(self, sec_url: str, headers: dict = None):
+        """Sends the GET request to the Geodesignhub API."""
+        if self.single_flight is not None:
+            etag = headers.get("If-None-Match", "") if headers else ""
+            key = "GET " + sec_url + " " + self.token_hash + " " + etag
+            return self.single_flight.do(
+                key, lambda: self.session.get(sec_url, headers=headers)
+            )
+        r = self.session.get(sec_url, headers=headers)
+        return r
+
+    def endpoint_name(self, sec_url: str) -> str:
+        """Returns the endpoint of a url without the project and object ids e.g. 'systems/{id}'."""
+        path = (
+            sec_url[len(self.sec_url) :]
+            if sec_url.startswith(self.sec_url)
+            else sec_url
+        )
+        parts = [p for p in path.split("?")[0].split("/") if p]
+        if (
+            len(parts) < 2
+            or parts[0] != "projects"
+            or parts[1] in ("create", "create-igc-project")
+        ):
+            return "/".join(parts)
+
+        parts = parts[2:]
+        endpoint_parts = []
+        for i, part in enumerate(parts):
+            # Team and synthesis ids follow cteams
+            if part.isdigit() or (parts[0] == "cteams" and i in (1, 2)):
+                endpoint_parts.append("{id}")
+            else:
+                endpoint_parts.append(part)
+        return "/".join(endpoint_parts) if endpoint_parts else "project"
 
     def get_project_details(self):
         """This method gets all systems for a particular project."""
 
         sec_url = self.sec_url + "projects" + "/" + self.project_id + "/"
-        r = self.session.get(sec_url)
+        r = self._get(sec_url)
         return r
 
     def get_all_systems(self):
@@ -37,7 +129,7 @@ class GeodesignHubClient:
         sec_url = (
             self.sec_url + "projects" + "/" + self.project_id + "/" + "systems" + "/"
         )
-        r = self.session.get(sec_url)
+        r = self._get(sec_url)
         return r
 
     def get_project_center(self):
@@ -45,7 +137,7 @@ class GeodesignHubClient:
         sec_url = (
             self.sec_url + "projects" + "/" + self.project_id + "/" + "center" + "/"
         )
-        r = self.session.get(sec_url)
+        r = self._get(sec_url)
         return r
 
     def get_single_system(self, system_id: int):
@@ -61,7 +153,7 @@ class GeodesignHubClient:
             + str(system_id)
             + "/"
         )
-        r = self.session.get(sec_url)
+        r = self._get(sec_url)
         return r
 
     def get_constraints(self):
@@ -75,7 +167,7 @@ class GeodesignHubClient:
             + "constraints"
             + "/"
         )
-        r = self.session.get(sec_url)
+        r = self._get(sec_url)
         return r
 
     def get_first_boundaries(self):
@@ -83,7 +175,7 @@ class GeodesignHubClient:
         sec_url = (
             self.sec_url + "projects" + "/" + self.project_id + "/" + "boundaries" + "/"
         )
-        r = self.session.get(sec_url)
+        r = self._get(sec_url)
         return r
 
     def get_second_boundaries(self):
@@ -97,7 +189,7 @@ class GeodesignHubClient:
             + "secondboundaries"
             + "/"
         )
-        r = self.session.get(sec_url)
+        r = self._get(sec_url)
         return r
 
     def get_project_bounds(self):
@@ -105,13 +197,13 @@ class GeodesignHubClient:
         sec_url = (
             self.sec_url + "projects" + "/" + self.project_id + "/" + "bounds" + "/"
         )
-        r = self.session.get(sec_url)
+        r = self._get(sec_url)
         return r
 
     def get_project_tags(self):
         """Returns a list of tags created in the project."""
         sec_url = self.sec_url + "projects" + "/" + self.project_id + "/" + "tags" + "/"
-        r = self.session.get(sec_url)
+        r = self._get(sec_url)
         return r
 
     def get_all_design_teams(self):
@@ -119,10 +211,11 @@ class GeodesignHubClient:
         sec_url = (
             self.sec_url + "projects" + "/" + self.project_id + "/" + "cteams" + "/"
         )
-        r = self.session.get(sec_url)
+        r = self._get(sec_url)
         return r
 
-    def get_single_synthesis(self, teamid: int, synthesisid: str):
+    def get_single_synthesis(self, teamid: int, synthesisid: str, stream: bool = False):
+        """Set stream to read the GeoJSON body incrementally with iter_content, streamed responses bypass the cache."""
         assert isinstance(teamid, int), "Team id is not a integer: %r" % teamid
         assert len(synthesisid) == 16, "Synthesis : %s" % synthesisid
         sec_url = (
@@ -136,7 +229,9 @@ class GeodesignHubClient:
             + str(synthesisid)
             + "/"
         )
-        r = self.session.get(sec_url)
+        if stream:
+            return self.session.get(sec_url, stream=True)
+        r = self._get(sec_url)
         return r
 
     def get_single_synthesis_details(self, teamid: int, synthesisid: str):
@@ -153,7 +248,7 @@ class GeodesignHubClient:
             + str(synthesisid)
             + "/details/"
         )
-        r = self.session.get(sec_url)
+        r = self._get(sec_url)
         return r
 
     def get_single_synthesis_esri_json(self, teamid: int, synthesisid: str):
@@ -170,7 +265,7 @@ class GeodesignHubClient:
             + str(synthesisid)
             + "/esri/"
         )
-        r = self.session.get(sec_url)
+        r = self._get(sec_url)
         return r
 
     def get_single_synthesis_diagrams(self, teamid: int, synthesisid: str):
@@ -186,7 +281,7 @@ class GeodesignHubClient:
             + str(synthesisid)
             + "/diagrams/"
         )
-        r = self.session.get(sec_url)
+        r = self._get(sec_url)
         return r
 
     def get_synthesis_timeline(self, teamid: int, synthesisid: str):
@@ -202,7 +297,7 @@ class GeodesignHubClient:
             + str(synthesisid)
             + "/timeline/"
         )
-        r = self.session.get(sec_url)
+        r = self._get(sec_url)
         return r
 
     def get_synthesis_diagrams(self, teamid: int, synthesisid: str):
@@ -218,7 +313,7 @@ class GeodesignHubClient:
             + str(synthesisid)
             + "/diagrams/"
         )
-        r = self.session.get(sec_url)
+        r = self._get(sec_url)
         return r
 
     def get_design_team_members(self, teamid: int):
@@ -237,7 +332,7 @@ class GeodesignHubClient:
             + "members"
             + "/"
         )
-        r = self.session.get(sec_url)
+        r = self._get(sec_url)
         return r
 
     def get_synthesis_system_projects(self, sysid: int, teamid: int, synthesisid: str):
@@ -256,7 +351,7 @@ class GeodesignHubClient:
             + str(sysid)
             + "/projects/"
         )
-        r = self.session.get(sec_url)
+        r = self._get(sec_url)
         return r
 
     def post_as_diagram(
@@ -338,6 +433,23 @@ class GeodesignHubClient:
 
         return r
 
+    def post_many_as_diagram_with_external_geometries(
+        self, diagrams: list, max_parallel: int = 4
+    ) -> list:
+        """Posts several diagrams with external geometries, each entry holds the keyword arguments of
+        post_as_diagram_with_external_geometries. The session and its connections are reused and up to
+        max_parallel requests are sent at once. Returns the response, or the exception raised, for
+        every entry in the same order."""
+
+        def post_diagram(diagram: dict):
+            try:
+                return self.post_as_diagram_with_external_geometries(**diagram)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+            return list(executor.map(post_diagram, diagrams))
+
     def get_single_diagram(self, diagid: int):
         """This method gets the geometry of a diagram given a digram id."""
         assert isinstance(diagid, int), "diagram id is not an integer: %r" % id
@@ -352,7 +464,7 @@ class GeodesignHubClient:
             + str(diagid)
             + "/"
         )
-        r = self.session.get(sec_url)
+        r = self._get(sec_url)
         return r
 
     def get_all_diagrams(self):
@@ -360,7 +472,7 @@ class GeodesignHubClient:
         sec_url = (
             self.sec_url + "projects" + "/" + self.project_id + "/" + "diagrams/all/"
         )
-        r = self.session.get(sec_url)
+        r = self._get(sec_url)
         return r
 
     def get_diagram_changeid(self, diagid: int):
@@ -377,7 +489,7 @@ class GeodesignHubClient:
             + str(diagid)
             + "/changeid/"
         )
-        r = self.session.get(sec_url)
+        r = self._get(sec_url)
         return r
 
     def post_as_ealuation_JSON(self, geoms, sysid: int, username: str = None):
@@ -412,7 +524,7 @@ class GeodesignHubClient:
             self.sec_url + "projects" + "/" + self.project_id + "/" + "plugins" + "/"
         )
 
-        r = self.session.get(sec_url)
+        r = self._get(sec_url)
         return r
 
     def add_plugins_to_project(self, tag_ids):
@@ -508,3 +620,66 @@ class GeodesignHubClient:
 
         r = self.session.post(sec_url, data=json.dumps(project_create_payload))
         return r
+
+
+class AsyncGeodesignHubClient:
+    """
+    An asyncio variant of the GeodesignHubClient, it offers the same methods as
+    coroutines. The blocking calls are run on a small thread pool so that several
+    requests to the Geodesignhub API can be in flight at the same time e.g.
+
+        systems, tags = await asyncio.gather(
+            client.get_all_systems(), client.get_project_tags()
+        )
+
+    """
+
+    def __init__(
+        self,
+        token: str = None,
+        url: str = None,
+        project_id: str = None,
+        max_concurrency: int = 5,
+        client: GeodesignHubClient = None,
+    ):
+        """
+        Declare your project id, token and the url (optional) or pass an existing client
+        whose session should be reused.
+        """
+        self.client = (
+            client
+            if client
+            else GeodesignHubClient(token=token, url=url, project_id=project_id)
+        )
+        self.max_concurrency = max_concurrency
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="gdh-api"
+        )
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self.client, name)
+        if name.startswith("_") or not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        async def call_in_executor(*args, **kwargs):
+            return await self.run(attribute, *args, **kwargs)
+
+        return call_in_executor
+
+    async def run(self, function, *args, **kwargs):
+        """Runs any other blocking function on the same thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(function, *args, **kwargs)
+        )
+
+    def close(self):
+        """Release the worker threads, the session of the wrapped client is left open."""
+        self.executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
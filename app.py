@@ -7,12 +7,13 @@ from data_definitions import (
     AGOLExportStatus,
     AGOLImportStatus,
     custom_asdict_factory,
-    GeodesignhubDesignDetail,
-    GeodesignhubDataStorage,
-    GeodesignhubDesignGeoJSON,
-    ArcGISDesignPayload,
-    AGOLSubmissionPayload,
-    GeodesignhubProjectTags,
+    AGOLSubmissionJobReference,
+    AGOLExportContext,
+    ExportPrefetchPayload,
+    ExportPrefetchResult,
+    FeatureServiceLayer,
+    FeatureServiceLayersPage,
+    GeodesignhubSystemChoice,
     AllSystemDetails,
     ImportConfirmationPayload,
     ImporttoGDHItem,
@@ -32,15 +33,34 @@ from dacite import from_dict
 from flask import request, Response
 from dotenv import load_dotenv, find_dotenv
 import os
+import hashlib
 import utils
 from flask import session, redirect, url_for
 from dataclasses import asdict
 from flask import render_template
 from esri_bridge import create_app
 import uuid
-import geojson
 from gdh_downloads_helper import GeodesignhubDataDownloader
-import json
+from json_serialization_helper import dumps_json, parse_precision
+import config
+from gdh_metrics_helper import collect_metrics, export_metrics
+from gdh_api_cache_helper import GeodesignhubAPICache
+from project_metadata_cache_helper import get_project_metadata_cache
+from session_storage_helper import SessionStorage
+from session_log_helper import (
+    is_session_log_cursor,
+    parse_session_log_read,
+    queue_session_log_read,
+    read_session_logs,
+)
+from session_storage_helper import decode_value
+from circuit_breaker_helper import (
+    OPEN,
+    CircuitOpenError,
+    circuit_breaker_states,
+    get_circuit_breaker,
+    is_upstream_failure,
+)
 from conn import get_redis
 from rq import Queue
 from worker import conn
@@ -59,7 +79,6 @@ from gdh_import_helper import process_gdh_import, process_gdh_feature_service_im
 from wtforms.validators import InputRequired
 import logging
 from logging.config import dictConfig
-import re
 
 load_dotenv(find_dotenv())
 ENV_FILE = find_dotenv()
@@ -90,11 +109,17 @@ logger = logging.getLogger("esri-gdh-bridge")
 app = Flask(__name__)
 r = get_redis()
 q = Queue(connection=conn)
+high_priority_q = Queue("high", connection=conn)
+session_storage = SessionStorage(r)
 csrf = CSRFProtect(app)
 bootstrap = Bootstrap5(app)
 
 MIMETYPE = "application/json"
 
+# Create the breakers up front so that the health endpoint always lists them
+gdh_circuit_breaker = get_circuit_breaker("geodesignhub")
+arcgis_circuit_breaker = get_circuit_breaker("arcgis")
+
 
 def get_locale():
     # if the user has set up the language manually it will be stored in the session,
@@ -127,6 +152,7 @@ class ExportConfirmationForm(FlaskForm):
         session_id (HiddenField): A hidden field to store the session ID.
         webmap (BooleanField): A boolean field to indicate whether to include the webmap in the export.
         storymap (BooleanField): A boolean field to indicate whether to include the storymap in the export.
+        incremental_sync (BooleanField): A boolean field to update the layer of an earlier export of the design in place.
         submit (SubmitField): A submit button to trigger the export process.
     """
 
@@ -135,6 +161,7 @@ class ExportConfirmationForm(FlaskForm):
     session_id = HiddenField()
     webmap = BooleanField("Include Webmap")
     storymap = BooleanField("Include Storymap")
+    incremental_sync = BooleanField("Update earlier export")
     submit = SubmitField(label="Export Design to ArcGIS Online →")
 
 
@@ -244,59 +271,44 @@ class FeatureServiceSelectionForm(FlaskForm):
     submit = SubmitField("Next")
 
 
-class FeatureLayerEntryForm(FlaskForm):
-    layer_url = HiddenField()
-    layer_id = HiddenField()
-    layer_name = StringField("Layer Name", render_kw={"readonly": True})
-    project_or_policy = SelectField(
-        "Project or Policy",
-        coerce=str,
-        validators=[InputRequired()],
-        choices=[("project", "Project"), ("policy", "Policy")],
-    )
-    destination_gdh_system = SelectField(
-        "Destination System",
-        coerce=int,
-        validators=[InputRequired()],
-        choices=[(0, "Select System")],
-    )
-
-    should_migrate = BooleanField("Import this layer?")
-
-
 class FeatureServiceLayerSelectionForm(FlaskForm):
     agol_token = HiddenField()
     gdh_project_id = HiddenField()
     session_id = HiddenField()
     gdh_api_token = HiddenField()
     feature_service_id = HiddenField()
-    layers = FieldList(FormField(FeatureLayerEntryForm), min_entries=1)
+    # The layers are listed by the page from list_feature_service_layers
     submit = SubmitField("Import selected layers to Geodesignhub →")
 
 
 @app.route("/get_gdh_import_processing_result", methods=["GET"])
 def get_gdh_import_processing_result():
     """
-    Retrieves all Redis messages for a given session ID.
+    Retrieves the import log messages of a session, oldest first.
 
     Args:
         session_id (str): The session ID to retrieve messages for.
-        redis_instance (redis.Redis): The Redis instance to query.
+        since (str): Optional cursor of the last message already read, only later messages are returned.
 
     Returns:
-        List[str]: A list of messages associated with the session ID.
+        AGOLImportStatus: The messages and the cursor to pass as since in the next request.
     """
     session_id = request.args.get("session_id", "0")
+    since = request.args.get("since", "")
+    if since and not is_session_log_cursor(since):
+        error_msg = ErrorResponse(
+            status=0, message="The since cursor is not valid.", code=400
+        )
+        return Response(dumps_json(error_msg), status=400, mimetype=MIMETYPE)
 
-    redis_instance = get_redis()
     try:
-        messages = redis_instance.lrange(f"session_logs:{session_id}", 0, -1)
-        all_messages = [message.decode("utf-8") for message in messages]
+        messages, cursor = read_session_logs(r, session_id, since=since)
 
         import_response = AGOLImportStatus(
             status=2,
-            messages=all_messages,
+            messages=messages,
             success_url="",
+            cursor=cursor,
         )
     except Exception as e:
         logger.error(f"Error retrieving messages for session {session_id}: {e}")
@@ -305,17 +317,26 @@ def get_gdh_import_processing_result():
             status=1,
             messages=["There was a error retrieving messages"],
             success_url="",
+            cursor=since,
         )
 
-    import_response = asdict(import_response)
-
-    return Response(json.dumps(import_response), status=200, mimetype=MIMETYPE)
+    return Response(dumps_json(import_response), status=200, mimetype=MIMETYPE)
 
 
 @app.route("/get_task_debug_info", methods=["GET"])
 def get_task_debug_info():
     task_id = request.args.get("task_id", "")
-    result = {"task_id": task_id, "rq_job": {}, "export_status": None, "import_logs": []}
+    # Only the import logs after the since cursor are returned, with the cursor of the last one
+    since = request.args.get("since", "")
+    if not is_session_log_cursor(since):
+        since = ""
+    result = {
+        "task_id": task_id,
+        "rq_job": {},
+        "export_status": None,
+        "import_logs": [],
+        "log_cursor": since,
+    }
 
     try:
         job = q.fetch_job(task_id)
@@ -330,17 +351,112 @@ def get_task_debug_info():
     except Exception as e:
         result["rq_job"] = {"error": str(e)}
 
-    raw = r.get(f"{task_id}_status")
-    if raw:
-        result["export_status"] = json.loads(raw)
+    result["export_status"] = session_storage.get(f"{task_id}_status")
 
     try:
-        logs = r.lrange(f"session_logs:{task_id}", 0, -1)
-        result["import_logs"] = [m.decode("utf-8") for m in logs]
+        result["import_logs"], result["log_cursor"] = read_session_logs(
+            r, task_id, since=since
+        )
     except Exception:
         pass
 
-    return Response(json.dumps(result), status=200, mimetype=MIMETYPE)
+    return Response(dumps_json(result), status=200, mimetype=MIMETYPE)
+
+
+def degraded_response(name: str, retry_after: float) -> Response:
+    """Returned right away instead of waiting on an upstream whose circuit is open"""
+    error_msg = ErrorResponse(
+        status=0,
+        message=f"{name} is currently unavailable, please try again in a few minutes.",
+        code=503,
+    )
+    return Response(
+        dumps_json(error_msg),
+        status=503,
+        mimetype=MIMETYPE,
+        headers={"Retry-After": str(int(retry_after) + 1)},
+    )
+
+
+@app.errorhandler(CircuitOpenError)
+def handle_circuit_open(e: CircuitOpenError):
+    upstream_names = {"geodesignhub": "Geodesignhub", "arcgis": "ArcGIS Online"}
+    return degraded_response(upstream_names.get(e.name, e.name), e.retry_after)
+
+
+def gdh_error_response(error_msg: ErrorResponse) -> Response:
+    """Responds to a failed Geodesignhub download, degraded when its circuit is open"""
+    if gdh_circuit_breaker.state == OPEN:
+        return degraded_response("Geodesignhub", gdh_circuit_breaker.retry_after())
+    return Response(
+        dumps_json(error_msg), status=error_msg.code, mimetype=MIMETYPE
+    )
+
+
+@app.route("/gdh_api_metrics", methods=["GET"])
+def get_gdh_api_metrics():
+    """Returns the Geodesignhub API metrics of the web and worker processes, with the
+    hit, miss, revalidated and stale counters of the shared response cache per endpoint"""
+    return Response(
+        dumps_json(
+            {
+                "processes": collect_metrics(r),
+                "api_cache": GeodesignhubAPICache(
+                    redis_instance=r, endpoint_ttls={}
+                ).stats(),
+                "session_storage": session_storage.stats(),
+            }
+        ),
+        status=200,
+        mimetype=MIMETYPE,
+    )
+
+
+@app.route("/invalidate_project_metadata/", methods=["POST"])
+@csrf.exempt
+def invalidate_project_metadata():
+    """Drops the cached systems, tags, details, bounds and center of a project for every
+    process, e.g. after the project was edited on Geodesignhub"""
+    project_id = request.values.get("projectid", "")
+    apitoken = request.values.get("apitoken", "")
+
+    my_geodesignhub_downloader = GeodesignhubDataDownloader(
+        session_id=uuid.uuid4(), project_id=project_id, apitoken=apitoken
+    )
+    # Only tokens with access to the project may invalidate it, asked of Geodesignhub
+    # itself as a cached answer outlives a revoked token or access
+    my_geodesignhub_downloader.api_helper.cache = None
+    _gdh_project_details = my_geodesignhub_downloader.parse_project_details(
+        my_geodesignhub_downloader.api_helper.get_project_details()
+    )
+    if isinstance(_gdh_project_details, ErrorResponse):
+        return gdh_error_response(_gdh_project_details)
+
+    metadata_cache = get_project_metadata_cache()
+    if metadata_cache is not None:
+        metadata_cache.invalidate(project_id)
+    GeodesignhubAPICache(redis_instance=r, endpoint_ttls={}).invalidate(project_id)
+    return Response(
+        dumps_json({"status": 1, "project_id": project_id}),
+        status=200,
+        mimetype=MIMETYPE,
+    )
+
+
+@app.after_request
+def export_gdh_api_metrics(response):
+    export_metrics(r, min_interval=30)
+    return response
+
+
+def export_status_in_progress() -> AGOLExportStatus:
+    return AGOLExportStatus(
+        status=2,
+        messages=[
+            "Import from ArcGIS Online is still in progress, please check back afer a few minutes"
+        ],
+        success_url="",
+    )
 
 
 @app.route("/get_agol_processing_result", methods=["GET"])
@@ -348,20 +464,75 @@ def get_agol_processing_result():
     session_id = request.args.get("session_id", "0")
     agol_processing_key = session_id + "_status"
 
-    processing_result_exists = r.exists(agol_processing_key)
-    if processing_result_exists:
-        s = r.get(agol_processing_key)
-        agol_status = json.loads(s)
-    else:
-        agol_export_status = AGOLExportStatus(
-            status=2,
-            messages=[
-                "Import from ArcGIS Online is still in progress, please check back afer a few minutes"
-            ],
-            success_url="",
+    agol_status = session_storage.get(agol_processing_key)
+    if agol_status is None:
+        agol_status = export_status_in_progress()
+    return Response(dumps_json(agol_status), status=200, mimetype=MIMETYPE)
+
+
+@app.route("/get_processing_results", methods=["POST"])
+@csrf.exempt
+def get_processing_results():
+    """
+    Returns the export and import status of many sessions at once, for dashboards that
+    track several jobs. The JSON body lists the session_ids and, optionally, the cursors
+    of the import logs already read per session ID. The statuses are read in one pipelined
+    round trip to Redis and returned keyed by session ID in the shapes of
+    get_agol_processing_result and get_gdh_import_processing_result.
+    """
+    max_session_ids = config.external_api_settings["BATCH_STATUS_MAX_SESSION_IDS"]
+    request_data = request.get_json(silent=True) or {}
+    session_ids = request_data.get("session_ids")
+    cursors = request_data.get("cursors") or {}
+    if (
+        not isinstance(session_ids, list)
+        or not session_ids
+        or len(session_ids) > max_session_ids
+        or not all(isinstance(session_id, str) for session_id in session_ids)
+        or not isinstance(cursors, dict)
+        or not all(
+            isinstance(cursor, str) and is_session_log_cursor(cursor)
+            for cursor in cursors.values()
+        )
+    ):
+        error_msg = ErrorResponse(
+            status=0,
+            message=f"Send between 1 and {max_session_ids} session_ids and valid cursors.",
+            code=400,
+        )
+        return Response(dumps_json(error_msg), status=400, mimetype=MIMETYPE)
+
+    session_ids = list(dict.fromkeys(session_ids))
+    pipe = r.pipeline(transaction=False)
+    pipe.mget([session_id + "_status" for session_id in session_ids])
+    for session_id in session_ids:
+        queue_session_log_read(pipe, session_id, since=cursors.get(session_id, ""))
+    stored_statuses, *log_reads = pipe.execute()
+
+    export_statuses = {}
+    import_statuses = {}
+    for session_id, stored_status, entries in zip(
+        session_ids, stored_statuses, log_reads
+    ):
+        export_statuses[session_id] = (
+            decode_value(stored_status)
+            if stored_status is not None
+            else export_status_in_progress()
+        )
+        messages, cursor = parse_session_log_read(
+            entries, since=cursors.get(session_id, "")
+        )
+        import_statuses[session_id] = AGOLImportStatus(
+            status=2, messages=messages, success_url="", cursor=cursor
         )
-        agol_status = asdict(agol_export_status)
-    return Response(json.dumps(agol_status), status=200, mimetype=MIMETYPE)
+
+    return Response(
+        dumps_json(
+            {"export_statuses": export_statuses, "import_statuses": import_statuses}
+        ),
+        status=200,
+        mimetype=MIMETYPE,
+    )
 
 
 @app.route("/export/", methods=["GET", "POST"])
@@ -371,14 +542,12 @@ def export_design():
     It performs the following steps:
     1. Parses request arguments to extract project and authentication details.
     2. Initializes a session and creates an export confirmation form.
-    3. Downloads project details and systems from Geodesignhub.
-    4. Validates the export confirmation form and processes the form data.
-    5. Retrieves and parses design details and project tags from the session.
-    6. Prepares the payload for AGOL submission, including design data, tags, and additional options.
-    7. Enqueues a job to publish the design to AGOL and redirects the user upon success.
-    8. If the form is not submitted, it downloads design data, details, and tags from Geodesignhub.
-    9. Caches the design data and tags in the session.
-    10. Renders the export confirmation template with the necessary data.
+    3. Validates the export confirmation form and reads the export context of the session.
+    4. Prepares the payload for AGOL submission from the context and the checkbox options.
+    5. Enqueues a job to publish the design to AGOL and redirects the user upon success.
+    6. If the form is not submitted, it enqueues a job on the high priority queue that downloads the design,
+       its details, project details, systems and tags from Geodesignhub and stores them as the export context.
+    7. Renders the export confirmation template right away, the page polls for the result of the job.
     Returns:
         Response: A redirect response to the next step in the export process or a rendered template for export confirmation.
     """
@@ -389,6 +558,11 @@ def export_design():
         design_team_id = request.args.get("cteamid")
         design_id = request.args.get("synthesisid")
         agol_token = request.args.get("arcgisToken")
+        # Decimals the design coordinates are rounded to, e.g. 6 for about 10 cm in WGS84
+        coordinate_precision = parse_precision(
+            request.args.get("precision"),
+            default=config.external_api_settings["GDH_COORDINATE_PRECISION"],
+        )
 
     except KeyError:
         error_msg = ErrorResponse(
@@ -406,62 +580,40 @@ def export_design():
         session_id=session_id,
     )
 
-    my_geodesignhub_downloader = GeodesignhubDataDownloader(
-        session_id=session_id,
-        project_id=project_id,
-        synthesis_id=design_id,
-        cteam_id=design_team_id,
-        apitoken=apitoken,
-    )
-    _gdh_project_details = my_geodesignhub_downloader.get_project_details()
-    _gdh_systems_raw = my_geodesignhub_downloader.download_project_systems()
-
     if export_confirmation_form.validate_on_submit():
         diagram_upload_form_data = export_confirmation_form.data
         agol_token = diagram_upload_form_data["agol_token"]
 
         existing_session_id = diagram_upload_form_data["session_id"]
-        existing_session_key = existing_session_id + "_design"
-
-        design_details_str = r.get(existing_session_key)
+        # The context is taken so that a second submit of the same session cannot enqueue again
+        _export_context = session_storage.getdel(existing_session_id + "_context")
+        if _export_context is None:
+            error_msg = ErrorResponse(
+                status=0,
+                message="This export has expired or was already submitted, please start the export again from Geodesignhub.",
+                code=400,
+            )
+            return Response(dumps_json(error_msg), status=400, mimetype=MIMETYPE)
+        export_context = from_dict(data_class=AGOLExportContext, data=_export_context)
 
         # Capture checkbox values
         include_webmap = export_confirmation_form.webmap.data
         include_storymap = export_confirmation_form.storymap.data
+        incremental_sync = export_confirmation_form.incremental_sync.data
 
-        tags_key = existing_session_id + "_tags"
-
-        project_tags_str = r.get(tags_key)
-        _all_project_tags = json.loads(project_tags_str.decode("utf-8"))
-        project_tags_parsed = from_dict(
-            data_class=GeodesignhubProjectTags, data=_all_project_tags
-        )
-
-        _design_feature_collection = json.loads(design_details_str.decode("utf-8"))
-        _design_details_parsed = my_geodesignhub_downloader.parse_transform_geojson(
-            design_feature_collection=_design_feature_collection["design_geojson"]
-        )
-
-        _design_feature_collection["design_geojson"]["geojson"] = _design_details_parsed
-
-        design_details = from_dict(
-            data_class=GeodesignhubDataStorage,
-            data=_design_feature_collection,
-        )
-
-        agol_design_submission = ArcGISDesignPayload(
-            gdh_design_details=design_details,
-        )
-        _gdh_systems = AllSystemDetails(systems=_gdh_systems_raw)
-        agol_submission_payload = AGOLSubmissionPayload(
-            design_data=agol_design_submission,
-            tags_data=project_tags_parsed,
-            agol_token=agol_token,
+        # The job takes over the blobs of the context, the worker loads and releases them
+        agol_submission_payload = AGOLSubmissionJobReference(
             session_id=existing_session_id,
-            gdh_systems_information=_gdh_systems,
-            gdh_project_details=_gdh_project_details,
+            agol_token=agol_token,
+            design_blob=export_context.design_blob,
+            tags_blob=export_context.tags_blob,
+            systems_blob=export_context.systems_blob,
+            gdh_project_details=export_context.gdh_project_details,
             include_webmap=include_webmap,  # Add this field to your payload class
             include_storymap=include_storymap,  # Add this field to your payload class
+            incremental_sync=incremental_sync,
+            diagram_change_ids=export_context.diagram_change_ids,
+            export_mode=config.external_api_settings["AGOL_EXPORT_MODE"],
         )
 
         agol_submission_job = q.enqueue(
@@ -483,51 +635,31 @@ def export_design():
             )
         )
 
-    _design_feature_collection = (
-        my_geodesignhub_downloader.download_design_data_from_geodesignhub()
-    )
-    gj_serialized = json.loads(geojson.dumps(_design_feature_collection))
-
-    design_geojson = GeodesignhubDesignGeoJSON(geojson=gj_serialized)
-    _design_details = (
-        my_geodesignhub_downloader.download_design_details_from_geodesignhub()
-    )
-    _project_tags = my_geodesignhub_downloader.download_project_tags()
-    design_details = from_dict(
-        data_class=GeodesignhubDesignDetail, data=_design_details
-    )
-    _design_name = design_details.description
-    # Make the design name only alpha numeric since AGOL only supports alpha-numeric names
-    _design_name = re.sub("[^0-9a-zA-Z]+", "_", _design_name)
-
-    project_tags = from_dict(data_class=GeodesignhubProjectTags, data=_project_tags)
-
-    _num_features = len(gj_serialized["features"])
-    gdh_data_for_storage = GeodesignhubDataStorage(
-        design_geojson=design_geojson,
-        design_id=design_id,
-        design_team_id=design_team_id,
+    # A download would hold this thread for as long as Geodesignhub takes, so a job on the
+    # high priority queue prefetches the design and the page shows it when the job is done
+    if gdh_circuit_breaker.state == OPEN:
+        return degraded_response("Geodesignhub", gdh_circuit_breaker.retry_after())
+    prefetch_payload = ExportPrefetchPayload(
+        session_id=str(session_id),
         project_id=project_id,
-        design_name=_design_name,
+        design_team_id=design_team_id,
+        design_id=design_id,
+        apitoken=apitoken,
+        coordinate_precision=coordinate_precision,
+    )
+    high_priority_q.enqueue(
+        utils.prefetch_export_context,
+        prefetch_payload,
+        job_id=utils.export_prefetch_key(str(session_id)),
+        job_timeout=600,
     )
 
-    session_key = str(session_id) + "_design"
-    # Cache it
-    r.set(session_key, json.dumps(asdict(gdh_data_for_storage)))
-    r.expire(session_key, time=60000)
-    tags_storage_key = str(session_id) + "_tags"
-    # Cache it
-    r.set(tags_storage_key, json.dumps(asdict(project_tags)))
-    r.expire(tags_storage_key, time=60000)
-
-    confirmation_message = "Design is ready for migration"
-    message_type = MessageType.primary
     export_confirmation_payload = ExportConfirmationPayload(
         agol_token=agol_token,
-        message_type=message_type,
-        message=confirmation_message,
-        geodesignhub_design_feature_count=_num_features,
-        geodesignhub_design_name=gdh_data_for_storage.design_name,
+        message_type=MessageType.secondary,
+        message="Downloading the design from Geodesignhub...",
+        geodesignhub_design_feature_count=0,
+        geodesignhub_design_name="",
         session_id=session_id,
     )
 
@@ -540,6 +672,26 @@ def export_design():
     )
 
 
+@app.route("/get_export_prefetch_result", methods=["GET"])
+def get_export_prefetch_result():
+    """Returns the feature count and name of the design prefetched for the export page"""
+    session_id = request.args.get("session_id", "0")
+    prefetch_key = utils.export_prefetch_key(session_id)
+    prefetch_result = session_storage.get(prefetch_key)
+    if prefetch_result is None:
+        prefetch_result = ExportPrefetchResult(
+            status=2, message="Downloading the design from Geodesignhub..."
+        )
+        # A job that was killed e.g. by its timeout never stores a result
+        job = high_priority_q.fetch_job(prefetch_key)
+        if job is None or job.is_failed:
+            prefetch_result = ExportPrefetchResult(
+                status=0,
+                message="Error in downloading the design from Geodesignhub, please start the export again.",
+            )
+    return Response(dumps_json(prefetch_result), status=200, mimetype=MIMETYPE)
+
+
 @app.route("/export_result/", methods=["GET"])
 def redirect_after_export():
     """
@@ -567,6 +719,7 @@ def redirect_after_export():
         message=message,
         agol_token=agol_token,
         session_id=session_id,
+        progress_stream_url=config.external_api_settings["PROGRESS_STREAM_URL"],
     )
 
 
@@ -576,58 +729,21 @@ def import_view_for_feature_service(
     """
     Handles the import view for selecting layers from an ArcGIS Feature Service to be imported into a Geodesignhub project.
     This function performs the following steps:
-    1. Initializes helpers for ArcGIS Online and Geodesignhub data access using the provided payload.
-    2. Downloads and prepares the list of systems from the specified Geodesignhub project.
-    3. Retrieves available layers from the selected ArcGIS Feature Service.
-    4. Populates a form with entries for each layer, allowing the user to select the destination system and specify if the layer represents a project or policy.
-    5. Prepares and returns the rendered template for user confirmation and further selection.
+    1. Populates a form with the tokens, the project, the session and the selected Feature Service.
+    2. Renders the template right away, the page then loads the layers of the Feature Service a page at a time
+       and the systems of the project once from list_feature_service_layers, so that the user can select the
+       destination system and specify if each layer represents a project or policy.
     Args:
         feature_service_import_payload (FeatureServiceImportPayload):
             An object containing authentication tokens and identifiers required for accessing ArcGIS Online and Geodesignhub resources.
     Returns:
         flask.Response:
-            A rendered HTML template ('import_feature_service_layers.html') with the populated form and confirmation message for the user to select layers to import.
+            A rendered HTML template ('import_feature_service_layers.html') with the form and confirmation message for the user to select layers to import.
     """
 
-    my_agol_helper = ArcGISHelper(
-        agol_token=feature_service_import_payload.agol_token,
-    )
-
-    my_geodesignhub_downloader = GeodesignhubDataDownloader(
-        session_id=feature_service_import_payload.session_id,
-        project_id=feature_service_import_payload.gdh_project_id,
-        apitoken=feature_service_import_payload.gdh_api_token,
-    )
-    _gdh_systems_raw = my_geodesignhub_downloader.download_project_systems()
-    _gdh_systems = AllSystemDetails(systems=_gdh_systems_raw)
-
     # Step 2: Layer selection for the chosen Feature Service
     feature_service_id = request.form["feature_service_id"]
-
-    layers = my_agol_helper.get_layers_for_feature_service(feature_service_id)
-    # Populate the layers fieldlist in the form
     feature_service_layers_form = FeatureServiceLayerSelectionForm()
-    form_layer_entries = []
-    # Populate the FeatureLayerEntryForm for each layer in the selected Feature Service
-    for layer in layers[:100]:
-        entry = FeatureLayerEntryForm()
-        entry.layer_url.data = layer.url
-
-        entry.layer_id.data = layer.properties.id
-        entry.layer_name.data = layer.properties.name
-        entry.project_or_policy.name = "project_or_policy_" + str(layer.properties.id)
-        entry.project_or_policy.choices = [("project", "Project"), ("policy", "Policy")]
-
-        entry.destination_gdh_system.name = "system_" + str(layer.properties.id)
-        entry.destination_gdh_system.choices = [
-            (
-                system.id,
-                system.name,
-            )
-            for system in _gdh_systems.systems
-        ]
-        form_layer_entries.append(entry)
-    feature_service_layers_form.layers = form_layer_entries
 
     feature_service_layers_form.agol_token.data = (
         feature_service_import_payload.agol_token
@@ -661,6 +777,100 @@ def import_view_for_feature_service(
     )
 
 
+@app.route("/feature_service_layers/", methods=["POST"])
+def list_feature_service_layers():
+    """
+    Lists the layers of a Feature Service a page at a time for the layer selection of the
+    feature service import. The JSON body has the agol_token, gdh_project_id, gdh_api_token,
+    session_id and feature_service_id of the import form and the cursor of the page, which
+    is empty for the first page. The layers are read from ArcGIS Online for the first page
+    and kept with the session and a hash of the ArcGIS token for the next ones. The systems
+    of the project, which every layer can be imported to, are only sent with the first page.
+    """
+    request_data = request.get_json(silent=True) or {}
+    session_id = str(request_data.get("session_id", ""))
+    feature_service_id = str(request_data.get("feature_service_id", ""))
+    cursor = str(request_data.get("cursor") or "")
+    if (
+        not session_id
+        or not feature_service_id
+        or not (cursor == "" or cursor.isdigit())
+    ):
+        error_msg = ErrorResponse(
+            status=0,
+            message="Could not parse the Session ID, Feature Service ID or cursor of the request.",
+            code=400,
+        )
+        return Response(dumps_json(error_msg), status=400, mimetype=MIMETYPE)
+
+    layers_key = session_id + "_layers"
+    agol_token = str(request_data.get("agol_token", ""))
+    # The listing is only served to requests with the token it was read with, another
+    # token lists the layers from ArcGIS Online again, which checks it
+    agol_token_hash = hashlib.sha256(agol_token.encode("utf-8")).hexdigest()
+    stored_layers = session_storage.get(layers_key) if cursor else None
+    if (
+        stored_layers
+        and stored_layers["feature_service_id"] == feature_service_id
+        and stored_layers.get("agol_token_hash") == agol_token_hash
+    ):
+        layers = [FeatureServiceLayer(**layer) for layer in stored_layers["layers"]]
+    else:
+        try:
+            my_agol_helper = ArcGISHelper(agol_token=agol_token)
+            layers = my_agol_helper.get_layers_for_feature_service(feature_service_id)
+        except ValueError as e:
+            error_msg = ErrorResponse(status=0, message=str(e), code=404)
+            return Response(dumps_json(error_msg), status=404, mimetype=MIMETYPE)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            # ArcGIS raises plain exceptions, e.g. for an expired token
+            logger.error(f"Could not list the layers of {feature_service_id}: {e}")
+            code = 502 if is_upstream_failure(e) else 400
+            error_msg = ErrorResponse(
+                status=0,
+                message=f"ArcGIS Online could not list the layers of the Feature Service: {e}",
+                code=code,
+            )
+            return Response(dumps_json(error_msg), status=code, mimetype=MIMETYPE)
+        session_storage.set(
+            layers_key,
+            {
+                "feature_service_id": feature_service_id,
+                "agol_token_hash": agol_token_hash,
+                "layers": layers,
+            },
+            ex=3600,
+        )
+
+    systems = None
+    if not cursor:
+        my_geodesignhub_downloader = GeodesignhubDataDownloader(
+            session_id=session_id,
+            project_id=request_data.get("gdh_project_id"),
+            apitoken=request_data.get("gdh_api_token"),
+        )
+        _gdh_systems = my_geodesignhub_downloader.download_project_systems()
+        if isinstance(_gdh_systems, ErrorResponse):
+            return gdh_error_response(_gdh_systems)
+        systems = [
+            GeodesignhubSystemChoice(id=system.id, name=system.name)
+            for system in _gdh_systems
+        ]
+
+    page_size = config.external_api_settings["FEATURE_SERVICE_LAYERS_PAGE_SIZE"]
+    offset = int(cursor) if cursor else 0
+    next_offset = offset + page_size
+    layers_page = FeatureServiceLayersPage(
+        layers=layers[offset:next_offset],
+        next_cursor=str(next_offset) if next_offset < len(layers) else "",
+        total=len(layers),
+        systems=systems,
+    )
+    return Response(dumps_json(layers_page), status=200, mimetype=MIMETYPE)
+
+
 @app.route("/import-feature-service/", methods=["POST"])
 def process_feature_service_import():
     import_format = "feature-service"
@@ -977,6 +1187,7 @@ def redirect_after_import():
         message=message,
         agol_token=agol_token,
         session_id=session_id,
+        progress_stream_url=config.external_api_settings["PROGRESS_STREAM_URL"],
     )
 
 
@@ -993,7 +1204,17 @@ def inject_conf_var():
 
 @app.route("/")
 def ping(language=None):
-    return Response(json.dumps({"status": "healthy"}), status=200, mimetype=MIMETYPE)
+    circuit_breakers = circuit_breaker_states()
+    status = (
+        "degraded"
+        if any(breaker["state"] == OPEN for breaker in circuit_breakers.values())
+        else "healthy"
+    )
+    return Response(
+        dumps_json({"status": status, "circuit_breakers": circuit_breakers}),
+        status=200,
+        mimetype=MIMETYPE,
+    )
 
 
 @app.route("/language/<language>")
@@ -0,0 +1,88 @@
+"""
+Measures the throughput of the export download (the GET of export_design) against fixtures
+served by the local Geodesignhub replay server, without calling Geodesignhub.
+
+    python benchmarks/benchmark_export_replay.py fixtures.jsonl --project-id <id> \
+        --cteam-id <id> --synthesis-id <id> --requests 50 --concurrency 4
+
+The response cache, the project metadata cache and request coalescing are off unless
+--with-cache is given, so that every export reaches the replay server.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+from gdh_replay_helper import GeodesignhubReplayServer, load_fixtures  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("fixtures")
+    parser.add_argument("--project-id", required=True)
+    parser.add_argument("--cteam-id", required=True)
+    parser.add_argument("--synthesis-id", required=True)
+    parser.add_argument("--apitoken", default="replay")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--extra-latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--with-cache", action="store_true")
+    args = parser.parse_args()
+
+    server = GeodesignhubReplayServer(
+        ("127.0.0.1", 0),
+        fixtures=load_fixtures(args.fixtures),
+        latency_scale=args.latency_scale,
+        extra_latency=args.extra_latency,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    config.external_api_settings["GDH_SERVICE_URL"] = (
+        f"http://127.0.0.1:{server.server_port}/api/v1/"
+    )
+    config.external_api_settings["GDH_API_CACHE_ENABLED"] = args.with_cache
+    config.external_api_settings["GDH_SINGLE_FLIGHT_ENABLED"] = args.with_cache
+    config.external_api_settings["GDH_PROJECT_METADATA_CACHE_ENABLED"] = args.with_cache
+    from gdh_downloads_helper import GeodesignhubDataDownloader
+
+    def export_once() -> float:
+        started_at = time.perf_counter()
+        GeodesignhubDataDownloader(
+            session_id=uuid.uuid4(),
+            project_id=args.project_id,
+            apitoken=args.apitoken,
+            cteam_id=args.cteam_id,
+            synthesis_id=args.synthesis_id,
+        ).download_export_data_from_geodesignhub()
+        return time.perf_counter() - started_at
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        latencies = sorted(executor.map(lambda _: export_once(), range(args.requests)))
+    elapsed = time.perf_counter() - started_at
+    server.shutdown()
+
+    print(f"exports: {args.requests}, concurrency: {args.concurrency}")
+    print(f"throughput: {args.requests / elapsed:.2f} exports/s")
+    print(
+        f"latency p50: {statistics.median(latencies):.3f}s "
+        f"p95: {latencies[int(0.95 * (len(latencies) - 1))]:.3f}s "
+        f"max: {latencies[-1]:.3f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
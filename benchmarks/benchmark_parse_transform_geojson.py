@@ -0,0 +1,127 @@
+"""
+Compares the columnar transform of design features with the per feature implementation it
+replaced, on synthetic designs of 10k features.
+
+    python benchmarks/benchmark_parse_transform_geojson.py --features 10000 --repeat 5
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+from dataclasses import asdict
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dacite import from_dict  # noqa: E402
+from geojson import Feature, FeatureCollection, LineString, Point, Polygon  # noqa: E402
+
+from data_definitions import GeodesignhubFeatureProperties  # noqa: E402
+from design_transform_helper import transform_design_features  # noqa: E402
+
+
+def legacy_parse_transform_geojson(design_feature_collection) -> FeatureCollection:
+    """GeodesignhubDataDownloader.parse_transform_geojson before the columnar rewrite"""
+    _design_details_feature_collection = design_feature_collection["geojson"]
+    _all_features: List[Feature] = []
+    for f in _design_details_feature_collection["features"]:
+        _diagram_properties_raw = {}
+        _f_props = f["properties"]
+        _diagram_properties_raw["diagram_id"] = _f_props["diagramid"]
+        _diagram_properties_raw["project_or_policy"] = _f_props["areatype"]
+        _diagram_properties_raw["diagram_name"] = _f_props["description"]
+        _diagram_properties_raw["color"] = _f_props["color"]
+        _diagram_properties_raw["tag_codes"] = _f_props["tag_codes"]
+        _diagram_properties_raw["notes"] = _f_props["notes"]
+        _diagram_properties_raw["start_date"] = _f_props["start_date"]
+        _diagram_properties_raw["end_date"] = _f_props["end_date"]
+        _diagram_properties_raw["grid_location"] = _f_props["grid_location"]
+        _diagram_properties_raw["system_name"] = _f_props["sysname"]
+
+        _feature_properties = from_dict(
+            data_class=GeodesignhubFeatureProperties, data=_diagram_properties_raw
+        )
+        _geometry = None
+        if f["geometry"]["type"] == "Polygon":
+            _geometry = Polygon(coordinates=f["geometry"]["coordinates"])
+        elif f["geometry"]["type"] == "LineString":
+            _geometry = LineString(coordinates=f["geometry"]["coordinates"])
+        elif f["geometry"]["type"] == "Point":
+            _geometry = Point(coordinates=f["geometry"]["coordinates"])
+        if _geometry:
+            _feature = Feature(geometry=_geometry, properties=asdict(_feature_properties))
+            _all_features.append(_feature)
+
+    return FeatureCollection(features=_all_features)
+
+
+def synthetic_design(num_features: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+
+    def position():
+        return [rng.uniform(-180, 180), rng.uniform(-85, 85)]
+
+    features = []
+    for i in range(num_features):
+        kind = i % 10
+        if kind < 7:
+            ring = [position() for _ in range(rng.randint(4, 40))]
+            geometry = {"type": "Polygon", "coordinates": [ring + [ring[0]]]}
+        elif kind < 9:
+            geometry = {
+                "type": "LineString",
+                "coordinates": [position() for _ in range(rng.randint(2, 20))],
+            }
+        else:
+            geometry = {"type": "Point", "coordinates": position()}
+        features.append(
+            {
+                "type": "Feature",
+                "geometry": geometry,
+                "properties": {
+                    "diagramid": i,
+                    "areatype": "project" if i % 2 else "policy",
+                    "description": f"Diagram {i}",
+                    "color": "#3388ff",
+                    "tag_codes": "T1,T2",
+                    "notes": "",
+                    "start_date": "2024-01-01",
+                    "end_date": "2030-01-01",
+                    "grid_location": "A1",
+                    "sysname": "Transport",
+                },
+            }
+        )
+    return {"geojson": {"type": "FeatureCollection", "features": features}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--features", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    design = synthetic_design(args.features)
+    assert transform_design_features(design) == legacy_parse_transform_geojson(design)
+
+    per_10k = 10000 / args.features
+    legacy = min(
+        timeit.repeat(
+            lambda: legacy_parse_transform_geojson(design), number=1, repeat=args.repeat
+        )
+    )
+    columnar = min(
+        timeit.repeat(
+            lambda: transform_design_features(design), number=1, repeat=args.repeat
+        )
+    )
+    print(f"features: {args.features}, best of {args.repeat}")
+    print(f"legacy:   {legacy * per_10k * 1000:.1f} ms per 10k features")
+    print(f"columnar: {columnar * per_10k * 1000:.1f} ms per 10k features")
+    print(f"speedup:  {legacy / columnar:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
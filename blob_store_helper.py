@@ -0,0 +1,88 @@
+import hashlib
+import logging
+from typing import Any
+
+import redis
+
+from json_serialization_helper import dumps_json
+from session_storage_helper import decode_value, encode_serialized
+
+logger = logging.getLogger("esri-gdh-bridge")
+
+BLOB_KEY_PREFIX = "gdh_blob"
+
+
+class BlobStore:
+    """
+    A content addressed store for the large parts of job payloads e.g. a design or the
+    systems of a project, so that jobs carry only the hashes of their data. Blobs are
+    serialized to JSON, encoded with the session storage codec and stored once per content
+    hash with a reference count, every put adds a reference and every release removes one.
+    A blob is deleted when its last reference is released, blobs of jobs that never finish
+    expire after the TTL.
+    """
+
+    def __init__(self, redis_instance: redis.Redis, ttl: int = 86400):
+        self.redis_instance = redis_instance
+        self.ttl = ttl
+
+    def blob_key(self, blob_hash: str) -> str:
+        return f"{BLOB_KEY_PREFIX}:{blob_hash}"
+
+    def refs_key(self, blob_hash: str) -> str:
+        return f"{BLOB_KEY_PREFIX}:{blob_hash}:refs"
+
+    def put(self, obj: Any) -> str:
+        """Stores obj and returns its content hash, obj can be anything dumps_json serializes"""
+        return self.put_serialized(dumps_json(obj).encode("utf-8"))
+
+    def put_serialized(self, serialized: bytes) -> str:
+        """Stores the JSON serialized by the caller, see put"""
+        blob_hash = hashlib.sha256(serialized).hexdigest()
+        key = self.blob_key(blob_hash)
+        refs_key = self.refs_key(blob_hash)
+        encoded = None
+
+        def add_reference(pipe: redis.client.Pipeline):
+            nonlocal encoded
+            # The keys are watched, a release that deletes the blob between this check
+            # and the write aborts the transaction and it runs again
+            exists = pipe.exists(key)
+            # Content that is already stored is not compressed again
+            if not exists and encoded is None:
+                encoded = encode_serialized(serialized)
+            pipe.multi()
+            if not exists:
+                pipe.set(key, encoded)
+            pipe.expire(key, self.ttl)
+            pipe.incr(refs_key)
+            pipe.expire(refs_key, self.ttl)
+
+        self.redis_instance.transaction(add_reference, key, refs_key)
+        return blob_hash
+
+    def get(self, blob_hash: str) -> Any:
+        stored = self.redis_instance.get(self.blob_key(blob_hash))
+        if stored is None:
+            raise KeyError(f"Blob {blob_hash} was not found, it may have expired")
+        return decode_value(stored)
+
+    def release(self, blob_hash: str):
+        """Removes a reference to the blob, it is deleted with the last one"""
+        key = self.blob_key(blob_hash)
+        refs_key = self.refs_key(blob_hash)
+
+        def remove_reference(pipe: redis.client.Pipeline):
+            # A put of the same content while the count is read aborts the transaction,
+            # so a blob is never deleted with a reference that was just added
+            refs = int(pipe.get(refs_key) or 0)
+            pipe.multi()
+            if refs <= 1:
+                pipe.delete(key, refs_key)
+            else:
+                pipe.decr(refs_key)
+
+        try:
+            self.redis_instance.transaction(remove_reference, key, refs_key)
+        except redis.RedisError as e:
+            logger.warning(f"Could not release blob {blob_hash}, it expires later: {e}")
@@ -0,0 +1,235 @@
+import functools
+import logging
+import re
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Tuple, Type
+
+import requests
+
+import config
+
+logger = logging.getLogger("esri-gdh-bridge")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# ArcGIS errors end with the code of the response e.g. "Invalid token. (Error Code: 498)",
+# requests that could not be sent are raised as a general error
+ERROR_CODE = re.compile(r"Error Code: (\d{3})")
+ARCGIS_REQUEST_FAILED = "A general error occurred"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(
+            f"{name} is unavailable, retry in {int(retry_after) + 1} seconds"
+        )
+
+
+class CircuitBreaker:
+    """
+    Tracks the outcome of the calls to an upstream over a rolling window. The circuit opens
+    when at least min_requests calls were made in the window and either the share of failed
+    calls or the share of calls slower than latency_threshold reaches its threshold. While
+    open, calls fail immediately. After open_seconds a single probe call is let through,
+    the circuit closes when it succeeds and opens again when it fails. State is kept per
+    process.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window_seconds: float = 60,
+        min_requests: int = 10,
+        error_rate_threshold: float = 0.5,
+        latency_threshold: float = 10,
+        slow_rate_threshold: float = 0.5,
+        open_seconds: float = 30,
+    ):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_requests = min_requests
+        self.error_rate_threshold = error_rate_threshold
+        self.latency_threshold = latency_threshold
+        self.slow_rate_threshold = slow_rate_threshold
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probe_in_flight = False
+        # (finished at, failed, slow) of each call in the window
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float):
+        while self._calls and self._calls[0][0] < now - self.window_seconds:
+            self._calls.popleft()
+
+    def _open(self, now: float, reason: str):
+        self.state = OPEN
+        self.opened_at = now
+        self.trips += 1
+        self._probe_in_flight = False
+        self._calls.clear()
+        logger.warning(f"Circuit for {self.name} opened: {reason}")
+
+    def retry_after(self) -> float:
+        return max(self.opened_at + self.open_seconds - time.monotonic(), 0)
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self.retry_after() > 0:
+                return False
+            # Let one probe through once the circuit has been open long enough
+            if self._probe_in_flight:
+                return False
+            self.state = HALF_OPEN
+            self._probe_in_flight = True
+            return True
+
+    def record(self, failed: bool, elapsed: float):
+        now = time.monotonic()
+        slow = elapsed >= self.latency_threshold
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if failed or slow:
+                    self._open(now, "probe call failed")
+                else:
+                    self.state = CLOSED
+                    self._probe_in_flight = False
+                    logger.info(f"Circuit for {self.name} closed")
+                return
+            if self.state == OPEN:
+                return
+
+            self._calls.append((now, failed, slow))
+            self._prune(now)
+            total = len(self._calls)
+            if total < self.min_requests:
+                return
+            failures = sum(1 for _, call_failed, _ in self._calls if call_failed)
+            slow_calls = sum(1 for _, _, call_slow in self._calls if call_slow)
+            if failures / total >= self.error_rate_threshold:
+                self._open(now, f"{failures} of {total} calls failed")
+            elif slow_calls / total >= self.slow_rate_threshold:
+                self._open(
+                    now,
+                    f"{slow_calls} of {total} calls took longer than {self.latency_threshold}s",
+                )
+
+    def call(
+        self,
+        function: Callable,
+        *args,
+        ignored_exceptions: Tuple[Type[BaseException], ...] = (),
+        is_failure: Callable[[BaseException], bool] = None,
+        **kwargs,
+    ):
+        """Calls the function through the breaker, exceptions other than ignored_exceptions count
+        as failures unless is_failure says they do not. Every call is recorded, so a failed
+        half open probe can never leave the circuit waiting for its result."""
+        if not self.allow_request():
+            raise CircuitOpenError(self.name, self.retry_after())
+        started_at = time.monotonic()
+        failed = True
+        try:
+            result = function(*args, **kwargs)
+            failed = False
+            return result
+        except ignored_exceptions:
+            failed = False
+            raise
+        except Exception as e:
+            failed = is_failure(e) if is_failure is not None else True
+            raise
+        finally:
+            self.record(failed=failed, elapsed=time.monotonic() - started_at)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            self._prune(time.monotonic())
+            return {
+                "state": self.state,
+                "retry_after": round(self.retry_after(), 1) if self.state == OPEN else 0,
+                "calls_in_window": len(self._calls),
+                "failures_in_window": sum(1 for _, failed, _ in self._calls if failed),
+                "trips": self.trips,
+            }
+
+
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """Returns the process wide breaker of an upstream e.g. 'geodesignhub' or 'arcgis'"""
+    with _circuit_breakers_lock:
+        breaker = _circuit_breakers.get(name)
+        if breaker is None:
+            settings = config.external_api_settings
+            breaker = CircuitBreaker(
+                name=name,
+                window_seconds=settings["CIRCUIT_BREAKER_WINDOW_SECONDS"],
+                min_requests=settings["CIRCUIT_BREAKER_MIN_REQUESTS"],
+                error_rate_threshold=settings["CIRCUIT_BREAKER_ERROR_RATE"],
+                latency_threshold=settings["CIRCUIT_BREAKER_LATENCY_SECONDS"],
+                slow_rate_threshold=settings["CIRCUIT_BREAKER_SLOW_RATE"],
+                open_seconds=settings["CIRCUIT_BREAKER_OPEN_SECONDS"],
+            )
+            _circuit_breakers[name] = breaker
+        return breaker
+
+
+def circuit_breaker_states() -> Dict[str, dict]:
+    with _circuit_breakers_lock:
+        breakers = list(_circuit_breakers.values())
+    return {breaker.name: breaker.as_dict() for breaker in breakers}
+
+
+def is_upstream_failure(e: BaseException) -> bool:
+    """Whether an exception means the upstream is unavailable: connection errors, timeouts and
+    5xx responses. Errors of the caller e.g. an expired token or a missing permission are not
+    failures of the upstream and must not open the circuit for every other user."""
+    if isinstance(e, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(e, (ConnectionError, TimeoutError)):
+        return True
+    if isinstance(e, requests.HTTPError) and e.response is not None:
+        return e.response.status_code >= 500
+    message = str(e)
+    if message.startswith(ARCGIS_REQUEST_FAILED):
+        return True
+    match = ERROR_CODE.search(message)
+    return match is not None and int(match.group(1)) >= 500
+
+
+def guarded_by(
+    name: str,
+    ignored_exceptions: Tuple[Type[BaseException], ...] = (ValueError,),
+    is_failure: Callable[[BaseException], bool] = is_upstream_failure,
+):
+    """Decorator that sends the calls of a function through the breaker of an upstream"""
+
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            return get_circuit_breaker(name).call(
+                function,
+                *args,
+                ignored_exceptions=ignored_exceptions,
+                is_failure=is_failure,
+                **kwargs,
+            )
+
+        return wrapper
+
+    return decorator
@@ -6,6 +6,16 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 load_dotenv(os.path.join(basedir, ".env"))
 
 
+def parse_endpoint_settings(value: str, defaults: dict) -> dict:
+    """Parses per endpoint overrides like 'systems=300,tags=60' on top of the defaults"""
+    settings = dict(defaults)
+    for entry in value.split(","):
+        if "=" in entry:
+            endpoint, setting = entry.split("=", 1)
+            settings[endpoint.strip()] = int(setting)
+    return settings
+
+
 class Config(object):
     REDIS_URL = environ.get("REDIS_URL", "redis://localhost:6379")
     LANGUAGES = {"en": "English"}
@@ -19,4 +29,94 @@ external_api_settings = {
     "GDH_SERVICE_URL": environ.get(
         "SERVICE_URL", "https://www.geodesignhub.com/api/v1/"
     ),
+    "GDH_MAX_CONCURRENCY": int(environ.get("GDH_MAX_CONCURRENCY", "8")),
+    "GDH_SINGLE_FLIGHT_ENABLED": environ.get("GDH_SINGLE_FLIGHT_ENABLED", "1") == "1",
+    "GDH_SINGLE_FLIGHT_ACROSS_PROCESSES": environ.get(
+        "GDH_SINGLE_FLIGHT_ACROSS_PROCESSES", "0"
+    )
+    == "1",
+    # Client side rate limit per API token and retries of failed Geodesignhub requests
+    "GDH_RATE_LIMIT_PER_SECOND": float(environ.get("GDH_RATE_LIMIT_PER_SECOND", "10")),
+    "GDH_RATE_LIMIT_BURST": float(environ.get("GDH_RATE_LIMIT_BURST", "20")),
+    "GDH_RETRY_BACKOFF_BASE": float(environ.get("GDH_RETRY_BACKOFF_BASE", "0.5")),
+    "GDH_MAX_RETRIES": int(environ.get("GDH_MAX_RETRIES", "3")),
+    # The large synthesis downloads are retried fewer times
+    "GDH_ENDPOINT_MAX_RETRIES": parse_endpoint_settings(
+        environ.get("GDH_ENDPOINT_MAX_RETRIES", ""),
+        defaults={"cteams/{id}/{id}": 2, "cteams/{id}/{id}/esri": 2},
+    ),
+    # Seconds to wait for Geodesignhub to accept a connection and to send data
+    "GDH_CONNECT_TIMEOUT": float(environ.get("GDH_CONNECT_TIMEOUT", "5")),
+    "GDH_READ_TIMEOUT": float(environ.get("GDH_READ_TIMEOUT", "60")),
+    # Circuit breakers of the Geodesignhub and ArcGIS upstreams, see circuit_breaker_helper
+    "CIRCUIT_BREAKER_WINDOW_SECONDS": float(
+        environ.get("CIRCUIT_BREAKER_WINDOW_SECONDS", "60")
+    ),
+    "CIRCUIT_BREAKER_MIN_REQUESTS": int(environ.get("CIRCUIT_BREAKER_MIN_REQUESTS", "10")),
+    "CIRCUIT_BREAKER_ERROR_RATE": float(environ.get("CIRCUIT_BREAKER_ERROR_RATE", "0.5")),
+    "CIRCUIT_BREAKER_LATENCY_SECONDS": float(
+        environ.get("CIRCUIT_BREAKER_LATENCY_SECONDS", "10")
+    ),
+    "CIRCUIT_BREAKER_SLOW_RATE": float(environ.get("CIRCUIT_BREAKER_SLOW_RATE", "0.5")),
+    "CIRCUIT_BREAKER_OPEN_SECONDS": float(environ.get("CIRCUIT_BREAKER_OPEN_SECONDS", "30")),
+    # Record latency, size and status of every Geodesignhub API response
+    "GDH_API_METRICS_ENABLED": environ.get("GDH_API_METRICS_ENABLED", "1") == "1",
+    # Records the Geodesignhub API traffic to this file, see gdh_replay_helper
+    "GDH_RECORD_FIXTURES_PATH": environ.get("GDH_RECORD_FIXTURES_PATH", ""),
+    # Decimals coordinates are rounded to on export and import, 6 is about 10 cm in WGS84
+    "GDH_COORDINATE_PRECISION": int(environ.get("GDH_COORDINATE_PRECISION", "6")),
+    # keep or explode the multi-part geometries of a design on export
+    "GDH_MULTIPART_POLICY": environ.get("GDH_MULTIPART_POLICY", "keep"),
+    # stdlib, orjson or auto, which uses orjson when it is installed
+    "JSON_BACKEND": environ.get("JSON_BACKEND", "auto"),
+    "GDH_API_CACHE_ENABLED": environ.get("GDH_API_CACHE_ENABLED", "1") == "1",
+    # Seconds a response of each read endpoint is served from the cache before it is revalidated
+    "GDH_API_CACHE_TTLS": parse_endpoint_settings(
+        environ.get("GDH_API_CACHE_TTLS", ""),
+        defaults={
+            "project": 600,
+            "systems": 300,
+            "systems/{id}": 300,
+            "tags": 60,
+            "bounds": 3600,
+            "center": 3600,
+        },
+    ),
+    # geojson uploads a GeoJSON item and publishes it, esri_json creates the feature service and adds the features
+    "AGOL_EXPORT_MODE": environ.get("AGOL_EXPORT_MODE", "geojson"),
+    # Seconds the design and systems of an export job are kept if the job never finishes
+    "BLOB_STORE_TTL": int(environ.get("BLOB_STORE_TTL", "86400")),
+    # zstd, zlib, none or auto, which uses zstd when zstandard is installed
+    "SESSION_STORAGE_COMPRESSION": environ.get("SESSION_STORAGE_COMPRESSION", "auto"),
+    # Parsed project metadata shared by the web and worker processes, see project_metadata_cache_helper
+    "GDH_PROJECT_METADATA_CACHE_ENABLED": environ.get(
+        "GDH_PROJECT_METADATA_CACHE_ENABLED", "1"
+    )
+    == "1",
+    "GDH_PROJECT_METADATA_TTLS": parse_endpoint_settings(
+        environ.get("GDH_PROJECT_METADATA_TTLS", ""),
+        defaults={
+            "systems": 300,
+            "tags": 60,
+            "project_details": 600,
+            "bounds": 3600,
+            "center": 3600,
+        },
+    ),
+    # The import log of a session keeps about this many messages and expires this many seconds after the last one
+    "SESSION_LOG_MAX_ENTRIES": int(environ.get("SESSION_LOG_MAX_ENTRIES", "1000")),
+    "SESSION_LOG_TTL": int(environ.get("SESSION_LOG_TTL", "86400")),
+    # Session IDs accepted by one request to get_processing_results
+    "BATCH_STATUS_MAX_SESSION_IDS": int(
+        environ.get("BATCH_STATUS_MAX_SESSION_IDS", "300")
+    ),
+    # Layers of a Feature Service sent per page of the feature service import
+    "FEATURE_SERVICE_LAYERS_PAGE_SIZE": int(
+        environ.get("FEATURE_SERVICE_LAYERS_PAGE_SIZE", "50")
+    ),
+    # Public URL of progress_stream.py e.g. https://bridge.example.com:8090, the status pages poll when it is empty
+    "PROGRESS_STREAM_URL": environ.get("PROGRESS_STREAM_URL", "").rstrip("/"),
+    "PROGRESS_STREAM_PORT": int(environ.get("PROGRESS_STREAM_PORT", "8090")),
+    # Seconds between the keepalive comments of an idle progress stream
+    "PROGRESS_STREAM_KEEPALIVE": float(environ.get("PROGRESS_STREAM_KEEPALIVE", "15")),
 }
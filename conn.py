@@ -2,9 +2,16 @@
 import os
 from urllib.parse import urlparse
 import redis
+import redis.asyncio
 def get_redis()-> redis.Redis:
 
     url = urlparse(os.environ.get("REDIS_URL", "redis://localhost:6379"))
     r = redis.Redis(host=url.hostname, port=url.port, password=url.password, ssl=(url.scheme == "rediss"), ssl_cert_reqs=None)
     return r 
 
+
+def get_async_redis() -> redis.asyncio.Redis:
+
+    url = urlparse(os.environ.get("REDIS_URL", "redis://localhost:6379"))
+    r = redis.asyncio.Redis(host=url.hostname, port=url.port, password=url.password, ssl=(url.scheme == "rediss"), ssl_cert_reqs=None)
+    return r
@@ -138,6 +138,17 @@ class GeodesignhubDataStorage:
     design_team_id: str
     project_id: str
     design_name: str
+    # Decimals the coordinates of the design were rounded to
+    coordinate_precision: int = 6
+
+
+@dataclass
+class GeoJSONSerializationReport:
+    # The design as received from Geodesignhub against the design as stored for the export
+    precision: int
+    original_bytes: int
+    serialized_bytes: int
+    bytes_saved: int
 
 
 @dataclass
@@ -212,6 +223,16 @@ class GeodesignhubProjectData:
     tags: GeodesignhubProjectTags
 
 
+@dataclass
+class GeodesignhubExportData:
+    # Everything the export page needs, downloaded concurrently from Geodesignhub
+    project_details: Union[ErrorResponse, GeodesignhubProjectDetails]
+    systems: Union[ErrorResponse, List[GeodesignhubSystem]]
+    design_data: Union[ErrorResponse, dict]
+    design_details: Union[ErrorResponse, dict]
+    tags: Union[ErrorResponse, dict]
+
+
 @dataclass
 class AGOLExportStatus:
     status: int
@@ -224,6 +245,8 @@ class AGOLImportStatus:
     status: int
     messages: list[str]
     success_url: str
+    # Read the messages after this one with the since parameter
+    cursor: str = ""
 
 
 @dataclass
@@ -237,6 +260,67 @@ class AGOLSubmissionPayload:
     gdh_project_details: GeodesignhubProjectDetails
     include_webmap: bool  # Add this field
     include_storymap: bool  # Add this field
+    # Update the layer of an earlier export in place
+    incremental_sync: bool = False
+    # The change ID of each diagram, read together with the design
+    diagram_change_ids: Dict[str, str] = field(default_factory=dict)
+    # geojson or esri_json, see utils.publish_design_to_agol
+    export_mode: str = "geojson"
+
+
+@dataclass
+class AGOLExportContext:
+    # Stored by the export prefetch job so that the POST can enqueue without calling Geodesignhub
+    design_blob: str
+    tags_blob: str
+    systems_blob: str
+    gdh_project_details: GeodesignhubProjectDetails
+    # Only read for designs that were exported before, see utils.prefetch_export_context
+    diagram_change_ids: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class ExportPrefetchPayload:
+    # Enqueued by the GET of /export/, the job downloads the design and stores the export context
+    session_id: str
+    project_id: str
+    design_team_id: str
+    design_id: str
+    apitoken: str
+    coordinate_precision: int
+
+
+@dataclass
+class ExportPrefetchResult:
+    # 2 while the design is downloaded, 1 when the export context is stored, 0 on errors
+    status: int
+    message: str
+    geodesignhub_design_feature_count: int = 0
+    geodesignhub_design_name: str = ""
+
+
+@dataclass
+class AGOLSubmissionJobReference:
+    # Enqueued instead of AGOLSubmissionPayload, the design, tags and systems are in the blob store
+    session_id: str
+    agol_token: str
+    design_blob: str
+    tags_blob: str
+    systems_blob: str
+    gdh_project_details: GeodesignhubProjectDetails
+    include_webmap: bool
+    include_storymap: bool
+    incremental_sync: bool = False
+    diagram_change_ids: Dict[str, str] = field(default_factory=dict)
+    export_mode: str = "geojson"
+
+
+@dataclass
+class GeodesignhubDesignSyncState:
+    # The hosted feature layer the design was exported to and the change ID of every diagram at that time
+    feature_service_item_id: str
+    diagram_change_ids: Dict[str, str]
+    synced_at: float
 
 
 @dataclass
@@ -397,6 +481,29 @@ class GeoPackageImportPayload:
     items_to_import: Optional[List[str]] = None
 
 
+@dataclass
+class FeatureServiceLayer:
+    id: int
+    name: str
+    url: str
+
+
+@dataclass
+class GeodesignhubSystemChoice:
+    id: int
+    name: str
+
+
+@dataclass
+class FeatureServiceLayersPage:
+    layers: List[FeatureServiceLayer]
+    # Sent as the cursor of the next request, empty on the last page
+    next_cursor: str
+    total: int
+    # The destination systems of every layer, only sent with the first page
+    systems: Optional[List[GeodesignhubSystemChoice]] = None
+
+
 @dataclass
 class FeatureServiceImportPayload:
     gdh_project_id: str
@@ -0,0 +1,132 @@
+import logging
+import math
+from dataclasses import asdict
+from typing import Dict, List, Optional
+
+import redis
+from dacite import from_dict
+from shapely.geometry import Polygon, shape
+from shapely.geometry.polygon import orient
+
+from data_definitions import GeodesignhubDesignSyncState
+from json_serialization_helper import dumps_json, loads_json
+
+logger = logging.getLogger("esri-gdh-bridge")
+
+DESIGN_SYNC_KEY_PREFIX = "gdh_design_sync"
+# Sync state is kept for 90 days after the last export of a design
+DESIGN_SYNC_STATE_TTL = 90 * 24 * 3600
+WEB_MERCATOR_WKIDS = (102100, 3857)
+
+
+def design_sync_key(
+    project_id: str, design_team_id: str, design_id: str, agol_username: str
+) -> str:
+    return f"{DESIGN_SYNC_KEY_PREFIX}:{project_id}:{design_team_id}:{design_id}:{agol_username}"
+
+
+def design_exported_key(project_id: str, design_team_id: str, design_id: str) -> str:
+    # Set while any ArcGIS user has a sync state for the design
+    return f"{DESIGN_SYNC_KEY_PREFIX}_exported:{project_id}:{design_team_id}:{design_id}"
+
+
+def is_design_exported(
+    redis_instance: redis.Redis, project_id: str, design_team_id: str, design_id: str
+) -> bool:
+    key = design_exported_key(project_id, design_team_id, design_id)
+    return bool(redis_instance.exists(key))
+
+
+def load_design_sync_state(
+    redis_instance: redis.Redis, key: str
+) -> Optional[GeodesignhubDesignSyncState]:
+    stored = redis_instance.get(key)
+    if not stored:
+        return None
+    return from_dict(data_class=GeodesignhubDesignSyncState, data=loads_json(stored))
+
+
+def store_design_sync_state(
+    redis_instance: redis.Redis,
+    key: str,
+    sync_state: GeodesignhubDesignSyncState,
+    exported_key: str,
+):
+    pipe = redis_instance.pipeline()
+    pipe.set(key, dumps_json(asdict(sync_state)), ex=DESIGN_SYNC_STATE_TTL)
+    pipe.set(exported_key, 1, ex=DESIGN_SYNC_STATE_TTL)
+    pipe.execute()
+
+
+def group_features_by_diagram(feature_collection: dict) -> Dict[str, List[dict]]:
+    """Groups the features of a design by the diagram they were drawn from"""
+    features_by_diagram: Dict[str, List[dict]] = {}
+    for feature in feature_collection["features"]:
+        diagram_id = str(feature["properties"]["diagram_id"])
+        features_by_diagram.setdefault(diagram_id, []).append(feature)
+    return features_by_diagram
+
+
+def _to_web_mercator(coordinate) -> List[float]:
+    lng, lat = coordinate[0], max(min(coordinate[1], 85.0511287798), -85.0511287798)
+    x = lng * 20037508.34 / 180
+    y = math.log(math.tan((90 + lat) * math.pi / 360)) * 6378137
+    return [x, y]
+
+
+def geojson_to_esri_geometry(geometry: dict, wkid: int = 4326) -> dict:
+    """
+    Converts a WGS84 GeoJSON geometry to Esri JSON in the spatial reference of the layer,
+    polygon rings are oriented the Esri way with the exterior ring clockwise
+    """
+    project = _to_web_mercator if wkid in WEB_MERCATOR_WKIDS else list
+    spatial_reference = {"wkid": wkid}
+    geometry_type = geometry["type"]
+    coordinates = geometry["coordinates"]
+
+    if geometry_type == "Point":
+        x, y = project(coordinates)
+        return {"x": x, "y": y, "spatialReference": spatial_reference}
+    if geometry_type == "MultiPoint":
+        return {
+            "points": [project(c) for c in coordinates],
+            "spatialReference": spatial_reference,
+        }
+    if geometry_type in ("LineString", "MultiLineString"):
+        lines = [coordinates] if geometry_type == "LineString" else coordinates
+        return {
+            "paths": [[project(c) for c in line] for line in lines],
+            "spatialReference": spatial_reference,
+        }
+    if geometry_type in ("Polygon", "MultiPolygon"):
+        polygons = shape(geometry)
+        polygons = [polygons] if isinstance(polygons, Polygon) else polygons.geoms
+        rings = []
+        for polygon in polygons:
+            oriented = orient(polygon, sign=-1.0)
+            for ring in [oriented.exterior, *oriented.interiors]:
+                rings.append([project(c) for c in ring.coords])
+        return {"rings": rings, "spatialReference": spatial_reference}
+    raise ValueError(f"Unsupported geometry type: {geometry_type}")
+
+
+def geojson_to_esri_feature(
+    feature: dict, field_names: Dict[str, str], wkid: int = 4326
+) -> dict:
+    """
+    Converts a design feature to an Esri JSON feature for edit_features, properties are
+    matched to field_names (lower case name to field name) and tag_codes is added as text
+    """
+    attributes = {
+        field_names[name.lower()]: value
+        for name, value in feature["properties"].items()
+        if name.lower() in field_names
+    }
+    if "tag_codes" in feature["properties"]:
+        attributes[field_names.get("tag_codes", "tag_codes")] = str(
+            feature["properties"]["tag_codes"]
+        )
+    return {
+        "geometry": geojson_to_esri_geometry(feature["geometry"], wkid=wkid),
+        "attributes": attributes,
+    }
@@ -0,0 +1,166 @@
+import logging
+from dataclasses import fields
+from operator import itemgetter
+from typing import Callable, Dict, List, Tuple
+
+from geojson import FeatureCollection
+
+from data_definitions import GeodesignhubFeatureProperties
+
+logger = logging.getLogger("esri-gdh-bridge")
+
+# Geodesignhub property each field of GeodesignhubFeatureProperties is read from
+FEATURE_PROPERTY_SOURCES = {
+    "diagram_id": "diagramid",
+    "project_or_policy": "areatype",
+    "diagram_name": "description",
+    "color": "color",
+    "tag_codes": "tag_codes",
+    "notes": "notes",
+    "start_date": "start_date",
+    "end_date": "end_date",
+    "grid_location": "grid_location",
+    "system_name": "sysname",
+}
+# Same number of decimals as the geojson package uses for coordinates by default
+COORDINATE_PRECISION = 6
+
+FEATURE_PROPERTY_NAMES = tuple(
+    field.name for field in fields(GeodesignhubFeatureProperties)
+)
+_project_feature_properties = itemgetter(
+    *(FEATURE_PROPERTY_SOURCES[name] for name in FEATURE_PROPERTY_NAMES)
+)
+
+
+def _round_position(position, precision: int) -> list:
+    return [round(value, precision) for value in position]
+
+
+def _round_positions(positions, precision: int) -> list:
+    return [_round_position(position, precision) for position in positions]
+
+
+def _round_rings(rings, precision: int) -> list:
+    return [_round_positions(ring, precision) for ring in rings]
+
+
+def _round_polygons(polygons, precision: int) -> list:
+    return [_round_rings(rings, precision) for rings in polygons]
+
+
+_COORDINATE_CLEANERS: Dict[str, Callable] = {
+    "Point": _round_position,
+    "LineString": _round_positions,
+    "Polygon": _round_rings,
+    "MultiPoint": _round_positions,
+    "MultiLineString": _round_rings,
+    "MultiPolygon": _round_polygons,
+}
+# Geometry type of the parts of each multi-part type
+MULTIPART_TYPES = {
+    "MultiPoint": "Point",
+    "MultiLineString": "LineString",
+    "MultiPolygon": "Polygon",
+}
+# Geometry type of the layer in AGOLItemSchema.publish_parameters each geometry is routed to
+LAYER_GEOMETRY_TYPES = {
+    "Point": "esriGeometryPoint",
+    "LineString": "esriGeometryPolyline",
+    "MultiLineString": "esriGeometryPolyline",
+    "Polygon": "esriGeometryPolygon",
+    "MultiPolygon": "esriGeometryPolygon",
+}
+
+MULTIPART_KEEP = "keep"
+MULTIPART_EXPLODE = "explode"
+
+
+def normalize_design_geometries(
+    features: List[dict],
+    multipart_policy: str = MULTIPART_KEEP,
+    precision: int = COORDINATE_PRECISION,
+) -> Tuple[List[dict], List[int]]:
+    """
+    Classifies the geometries of the features in one pass and rounds their coordinates to
+    precision decimals.
+    Multi-part geometries are kept, or split into one geometry per part when the policy is
+    explode. Multi points are always split, a point layer cannot hold them. Returns the
+    geometries and the index of the feature each one came from, geometries of other types
+    are left out.
+    """
+    geometries: List[dict] = []
+    source_indexes: List[int] = []
+    for index, f in enumerate(features):
+        geometry = f["geometry"]
+        geometry_type = geometry["type"] if geometry else None
+        clean_coordinates = _COORDINATE_CLEANERS.get(geometry_type)
+        if clean_coordinates is None:
+            continue
+        coordinates = clean_coordinates(geometry["coordinates"], precision)
+        part_type = MULTIPART_TYPES.get(geometry_type)
+        if part_type and (
+            multipart_policy == MULTIPART_EXPLODE or part_type == "Point"
+        ):
+            geometries.extend(
+                {"type": part_type, "coordinates": part} for part in coordinates
+            )
+            source_indexes.extend([index] * len(coordinates))
+        else:
+            geometries.append({"type": geometry_type, "coordinates": coordinates})
+            source_indexes.append(index)
+    return geometries, source_indexes
+
+
+def transform_design_features(
+    design_feature_collection: dict,
+    multipart_policy: str = MULTIPART_KEEP,
+    precision: int = COORDINATE_PRECISION,
+) -> FeatureCollection:
+    """
+    Renames and projects the properties of the features of a design to the fields of
+    GeodesignhubFeatureProperties, in one pass over each column, and normalizes their
+    geometries. For Polygon, LineString and Point features at the default precision the
+    output is equal to building geojson Feature objects from dataclasses, without creating
+    and validating an object per feature.
+    """
+    features = design_feature_collection["geojson"]["features"]
+    geometries, source_indexes = normalize_design_geometries(
+        features, multipart_policy=multipart_policy, precision=precision
+    )
+    dropped = len(features) - len(set(source_indexes))
+    if dropped:
+        logger.info(f"{dropped} features with unsupported geometries were left out")
+
+    property_rows = map(
+        _project_feature_properties, [features[i]["properties"] for i in source_indexes]
+    )
+    _all_features: List[dict] = [
+        {
+            "type": "Feature",
+            "geometry": geometry,
+            "properties": dict(zip(FEATURE_PROPERTY_NAMES, property_row)),
+        }
+        for geometry, property_row in zip(geometries, property_rows)
+    ]
+
+    # Assigned directly, the constructor would turn every feature into a geojson object again
+    _diagram_feature_collection = FeatureCollection(features=[])
+    _diagram_feature_collection["features"] = _all_features
+    return _diagram_feature_collection
+
+
+def route_features_to_layers(
+    features: List[dict], publish_parameters: dict
+) -> Dict[str, List[dict]]:
+    """Groups normalized features by the name of the layer in publish_parameters with their geometry type"""
+    layer_names = {
+        layer["geometryType"]: layer["name"] for layer in publish_parameters["layers"]
+    }
+    routed_features: Dict[str, List[dict]] = {
+        layer["name"]: [] for layer in publish_parameters["layers"]
+    }
+    for f in features:
+        layer_name = layer_names[LAYER_GEOMETRY_TYPES[f["geometry"]["type"]]]
+        routed_features[layer_name].append(f)
+    return routed_features
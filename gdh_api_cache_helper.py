@@ -0,0 +1,135 @@
+import logging
+import time
+from typing import Dict
+
+import redis
+import requests
+
+logger = logging.getLogger("esri-gdh-bridge")
+
+CACHE_KEY_PREFIX = "gdh_api_cache"
+CACHE_STATS_KEY = "gdh_api_cache:stats"
+
+
+def build_cached_response(
+    sec_url: str, content: bytes, status_code: int = 200, headers: dict = None
+) -> requests.Response:
+    """Rebuilds a requests Response from a stored body, callers can use status_code, json() and text as usual."""
+    r = requests.Response()
+    r.status_code = status_code
+    r.url = sec_url
+    r._content = content
+    r.encoding = "utf-8"
+    if headers:
+        r.headers.update(headers)
+    return r
+
+
+class GeodesignhubAPICache:
+    """
+    A Redis backed cache for the read endpoints of the Geodesignhub API, it is shared by
+    all web and worker processes. Entries are keyed by project ID, a hash of the API token
+    and the url. Fresh entries are served directly, once the TTL of an endpoint has passed
+    the entry is revalidated with If-None-Match when the API sent an ETag, otherwise it is
+    downloaded again. An expired entry is served when the API fails with a 5xx status.
+    Endpoints without a TTL are never cached.
+    """
+
+    def __init__(
+        self,
+        redis_instance: redis.Redis,
+        endpoint_ttls: Dict[str, int],
+        revalidation_window: int = 3600,
+    ):
+        self.redis_instance = redis_instance
+        self.endpoint_ttls = endpoint_ttls
+        # How long an expired entry with an ETag is kept around for revalidation
+        self.revalidation_window = revalidation_window
+
+    def cache_key(self, client, sec_url: str) -> str:
+        path = (
+            sec_url[len(client.sec_url) :]
+            if sec_url.startswith(client.sec_url)
+            else sec_url
+        )
+        return f"{CACHE_KEY_PREFIX}:{client.project_id}:{client.token_hash}:{path}"
+
+    def get(self, client, sec_url: str) -> requests.Response:
+        endpoint = client.endpoint_name(sec_url)
+        ttl = self.endpoint_ttls.get(endpoint)
+        if not ttl:
+            return client._fetch(sec_url)
+
+        key = self.cache_key(client, sec_url)
+        try:
+            cached = self.redis_instance.hgetall(key)
+        except redis.RedisError as e:
+            logger.warning(f"Geodesignhub API cache unavailable, fetching {endpoint}: {e}")
+            return client._fetch(sec_url)
+
+        now = time.time()
+        if cached and float(cached[b"expires_at"]) > now:
+            self.count(endpoint, "hit")
+            return build_cached_response(sec_url, cached[b"content"])
+
+        etag = cached.get(b"etag", b"").decode("utf-8") if cached else ""
+        headers = {"If-None-Match": etag} if etag else None
+        r = client._fetch(sec_url, headers=headers)
+
+        if r.status_code == 304 and cached:
+            self.count(endpoint, "revalidated")
+            self.store(key, content=cached[b"content"], etag=etag, ttl=ttl)
+            return build_cached_response(sec_url, cached[b"content"])
+
+        # Serve the stale entry while Geodesignhub is failing or its circuit is open
+        if r.status_code >= 500 and cached:
+            self.count(endpoint, "stale")
+            return build_cached_response(sec_url, cached[b"content"])
+
+        self.count(endpoint, "miss")
+        if r.status_code == 200:
+            self.store(key, content=r.content, etag=r.headers.get("ETag", ""), ttl=ttl)
+        return r
+
+    def store(self, key: str, content: bytes, etag: str, ttl: int):
+        try:
+            pipe = self.redis_instance.pipeline()
+            pipe.hset(
+                key,
+                mapping={
+                    "content": content,
+                    "etag": etag,
+                    "expires_at": time.time() + ttl,
+                },
+            )
+            pipe.expire(key, ttl + self.revalidation_window if etag else ttl)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Could not store Geodesignhub API response in cache: {e}")
+
+    def count(self, endpoint: str, outcome: str):
+        try:
+            self.redis_instance.hincrby(CACHE_STATS_KEY, f"{endpoint}:{outcome}", 1)
+        except redis.RedisError:
+            pass
+
+    def invalidate(self, project_id: str):
+        """Removes all cached responses for a project, for every token."""
+        keys = list(
+            self.redis_instance.scan_iter(match=f"{CACHE_KEY_PREFIX}:{project_id}:*")
+        )
+        if keys:
+            self.redis_instance.delete(*keys)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Returns the hit, miss, revalidated and stale counters per endpoint."""
+        stats: Dict[str, Dict[str, int]] = {}
+        try:
+            counters = self.redis_instance.hgetall(CACHE_STATS_KEY)
+        except redis.RedisError as e:
+            logger.warning(f"Could not read Geodesignhub API cache stats: {e}")
+            return stats
+        for field, value in counters.items():
+            endpoint, outcome = field.decode("utf-8").rsplit(":", 1)
+            stats.setdefault(endpoint, {})[outcome] = int(value)
+        return stats
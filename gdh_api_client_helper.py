@@ -0,0 +1,90 @@
+import GeodesignHub
+import config
+from circuit_breaker_helper import get_circuit_breaker
+from conn import get_redis
+from gdh_metrics_helper import registry
+from gdh_replay_helper import FixtureRecorder
+from gdh_api_cache_helper import GeodesignhubAPICache
+from gdh_singleflight_helper import SingleFlight
+from gdh_transport_helper import GeodesignhubTransportAdapter, RetryPolicy
+
+r = get_redis()
+
+# Appends the traffic of all clients to a fixture file for the replay server
+fixture_recorder = (
+    FixtureRecorder(config.external_api_settings["GDH_RECORD_FIXTURES_PATH"])
+    if config.external_api_settings["GDH_RECORD_FIXTURES_PATH"]
+    else None
+)
+
+# One single flight group per process so that all clients share in-flight requests
+single_flight = SingleFlight(
+    redis_instance=(
+        r if config.external_api_settings["GDH_SINGLE_FLIGHT_ACROSS_PROCESSES"] else None
+    )
+)
+
+
+def create_gdh_api_client(
+    project_id: str, token: str, pool_maxsize: int = None
+) -> GeodesignHub.GeodesignHubClient:
+    """Builds a GeodesignHubClient for the configured service url, with the shared response cache and
+    request coalescing when they are enabled, and the retrying, rate limited transport guarded by the
+    Geodesignhub circuit breaker"""
+    cache = None
+    if config.external_api_settings["GDH_API_CACHE_ENABLED"]:
+        cache = GeodesignhubAPICache(
+            redis_instance=r,
+            endpoint_ttls=config.external_api_settings["GDH_API_CACHE_TTLS"],
+        )
+
+    pool_maxsize = (
+        pool_maxsize
+        if pool_maxsize
+        else config.external_api_settings["GDH_MAX_CONCURRENCY"]
+    )
+    gdh_api_client = GeodesignHub.GeodesignHubClient(
+        url=config.external_api_settings["GDH_SERVICE_URL"],
+        project_id=project_id,
+        token=token,
+        pool_maxsize=pool_maxsize,
+        cache=cache,
+        single_flight=(
+            single_flight
+            if config.external_api_settings["GDH_SINGLE_FLIGHT_ENABLED"]
+            else None
+        ),
+        metrics=(
+            registry if config.external_api_settings["GDH_API_METRICS_ENABLED"] else None
+        ),
+    )
+
+    backoff_base = config.external_api_settings["GDH_RETRY_BACKOFF_BASE"]
+    transport_adapter = GeodesignhubTransportAdapter(
+        token_hash=gdh_api_client.token_hash,
+        endpoint_name=gdh_api_client.endpoint_name,
+        rate=config.external_api_settings["GDH_RATE_LIMIT_PER_SECOND"],
+        burst=config.external_api_settings["GDH_RATE_LIMIT_BURST"],
+        default_policy=RetryPolicy(
+            max_retries=config.external_api_settings["GDH_MAX_RETRIES"],
+            backoff_base=backoff_base,
+        ),
+        endpoint_policies={
+            endpoint: RetryPolicy(max_retries=max_retries, backoff_base=backoff_base)
+            for endpoint, max_retries in config.external_api_settings[
+                "GDH_ENDPOINT_MAX_RETRIES"
+            ].items()
+        },
+        circuit_breaker=get_circuit_breaker("geodesignhub"),
+        timeout=(
+            config.external_api_settings["GDH_CONNECT_TIMEOUT"],
+            config.external_api_settings["GDH_READ_TIMEOUT"],
+        ),
+        pool_maxsize=pool_maxsize,
+    )
+    gdh_api_client.session.mount("https://", transport_adapter)
+    gdh_api_client.session.mount("http://", transport_adapter)
+    if fixture_recorder is not None:
+        gdh_api_client.session.hooks["response"].append(fixture_recorder)
+
+    return gdh_api_client
@@ -1,44 +1,34 @@
 from data_definitions import (
     ErrorResponse,
+    GeodesignhubExportData,
     GeodesignhubProjectBounds,
     GeodesignhubSystem,
     GeodesignhubProjectData,
     GeodesignhubProjectDetails,
     GeodesignhubDesignFeatureProperties,
-    GeodesignhubFeatureProperties,
     GeodesignhubProjectCenter,
     GeodesignhubProjectTags,
     GeodesignhubSystemDetail,
 )
-import json
-from shapely.geometry.base import BaseGeometry
-from json import encoder
-from shapely.geometry import mapping
+import asyncio
+import logging
 from dacite import from_dict
-from typing import List, Union
-from geojson import Feature, FeatureCollection, Polygon, LineString, Point
+from typing import Dict, Iterator, List, Union
+from geojson import FeatureCollection
 import GeodesignHub
-from dataclasses import asdict
+from gdh_api_client_helper import create_gdh_api_client
+from geojson_stream_helper import iter_feature_collection_features
+from design_transform_helper import COORDINATE_PRECISION, transform_design_features
+from json_serialization_helper import loads_json
+from project_metadata_cache_helper import get_project_metadata_cache
 import config
 from arcgis.gis import GIS, Item
 
 from uuid import uuid4
 
+logger = logging.getLogger("esri-gdh-bridge")
 
-class ShapelyEncoder(json.JSONEncoder):
-    """Encodes JSON strings into shapes processed by Shapely"""
-
-    def default(self, obj):
-        if isinstance(obj, BaseGeometry):
-            return mapping(obj)
-        return json.JSONEncoder.default(self, obj)
-
-
-def export_to_json(data):
-    """Export a shapely output to JSON"""
-    encoder.FLOAT_REPR = lambda o: format(o, ".6f")
-    return json.loads(json.dumps(data, sort_keys=True, cls=ShapelyEncoder))
-
+STREAM_CHUNK_SIZE = 64 * 1024
 
 
 class GeodesignhubDataDownloader:
@@ -54,6 +44,7 @@ class GeodesignhubDataDownloader:
         cteam_id=None,
         synthesis_id=None,
         diagram_id=None,
+        max_concurrency: int = None,
     ):
         self.session_id = session_id
         self.project_id = project_id
@@ -62,18 +53,44 @@ class GeodesignhubDataDownloader:
         self.synthesis_id = synthesis_id
         d = int(diagram_id) if diagram_id else None
         self.diagram_id = d
+        # Bytes of the design JSON read from the last streamed design response
+        self.design_bytes_downloaded = 0
+        self.max_concurrency = (
+            max_concurrency
+            if max_concurrency
+            else config.external_api_settings["GDH_MAX_CONCURRENCY"]
+        )
 
-        self.api_helper = GeodesignHub.GeodesignHubClient(
-            url=config.external_api_settings["GDH_SERVICE_URL"],
+        self.api_helper = create_gdh_api_client(
             project_id=self.project_id,
             token=self.apitoken,
+            pool_maxsize=self.max_concurrency,
+        )
+        self.metadata_cache = get_project_metadata_cache()
+
+    def read_through_metadata_cache(self, kind: str, load):
+        """Returns the project metadata of kind from the shared cache, calling load on a miss"""
+        if self.metadata_cache is None:
+            return load()
+        return self.metadata_cache.get(
+            project_id=self.project_id,
+            token_hash=self.api_helper.token_hash,
+            kind=kind,
+            load=load,
         )
 
     def get_project_details(
         self,
     ) -> Union[ErrorResponse, GeodesignhubProjectDetails]:
         """This method gets details of a project from Geodesignhub"""
-        d = self.api_helper.get_project_details()
+        return self.read_through_metadata_cache(
+            "project_details",
+            lambda: self.parse_project_details(self.api_helper.get_project_details()),
+        )
+
+    def parse_project_details(
+        self, d
+    ) -> Union[ErrorResponse, GeodesignhubProjectDetails]:
         try:
             assert d.status_code == 200
         except AssertionError:
@@ -96,7 +113,14 @@ class GeodesignhubDataDownloader:
     def download_project_systems(
         self,
     ) -> Union[ErrorResponse, List[GeodesignhubSystem]]:
-        s = self.api_helper.get_all_systems()
+        return self.read_through_metadata_cache(
+            "systems",
+            lambda: self.parse_project_systems(self.api_helper.get_all_systems()),
+        )
+
+    def parse_project_systems(
+        self, s
+    ) -> Union[ErrorResponse, List[GeodesignhubSystem]]:
         # Check responses / data
         try:
             assert s.status_code == 200
@@ -119,6 +143,11 @@ class GeodesignhubDataDownloader:
 
     def download_project_bounds(
         self,
+    ) -> Union[ErrorResponse, GeodesignhubProjectBounds]:
+        return self.read_through_metadata_cache("bounds", self._download_project_bounds)
+
+    def _download_project_bounds(
+        self,
     ) -> Union[ErrorResponse, GeodesignhubProjectBounds]:
         b = self.api_helper.get_project_bounds()
         try:
@@ -136,7 +165,11 @@ class GeodesignhubDataDownloader:
         return bounds
 
     def download_project_tags(self) -> Union[ErrorResponse, dict]:
-        t = self.api_helper.get_project_tags()
+        return self.read_through_metadata_cache(
+            "tags", lambda: self.parse_project_tags(self.api_helper.get_project_tags())
+        )
+
+    def parse_project_tags(self, t) -> Union[ErrorResponse, dict]:
         try:
             assert t.status_code == 200
         except AssertionError:
@@ -150,6 +183,11 @@ class GeodesignhubDataDownloader:
 
     def download_project_center(
         self,
+    ) -> Union[ErrorResponse, GeodesignhubProjectCenter]:
+        return self.read_through_metadata_cache("center", self._download_project_center)
+
+    def _download_project_center(
+        self,
     ) -> Union[ErrorResponse, GeodesignhubProjectCenter]:
         c = self.api_helper.get_project_center()
         try:
@@ -171,7 +209,9 @@ class GeodesignhubDataDownloader:
         r = self.api_helper.get_single_synthesis_details(
             teamid=int(self.cteam_id), synthesisid=self.synthesis_id
         )
+        return self.parse_design_details(r)
 
+    def parse_design_details(self, r) -> Union[ErrorResponse, dict]:
         try:
             assert r.status_code == 200
         except AssertionError:
@@ -186,54 +226,27 @@ class GeodesignhubDataDownloader:
 
         return _design_details_raw
 
-    def parse_transform_geojson(self, design_feature_collection) -> FeatureCollection:
-        _design_details_feature_collection = design_feature_collection["geojson"]
-        _all_features: List[Feature] = []
-        for f in _design_details_feature_collection["features"]:
-            _diagram_properties_raw = {}
-            _f_props = f["properties"]
-            _diagram_properties_raw["diagram_id"] = _f_props["diagramid"]
-            _diagram_properties_raw["project_or_policy"] = _f_props["areatype"]
-            _diagram_properties_raw["diagram_name"] = _f_props["description"]
-            _diagram_properties_raw["color"] = _f_props["color"]
-            _diagram_properties_raw["tag_codes"] = _f_props["tag_codes"]
-            _diagram_properties_raw["notes"] = _f_props["notes"]
-            _diagram_properties_raw["start_date"] = _f_props["start_date"]
-            _diagram_properties_raw["end_date"] = _f_props["end_date"]
-            _diagram_properties_raw["grid_location"] = _f_props["grid_location"]
-            _diagram_properties_raw["system_name"] = _f_props["sysname"]
-
-            _feature_properties = from_dict(
-                data_class=GeodesignhubFeatureProperties, data=_diagram_properties_raw
-            )
-            _geometry = None
-            # We assume that GDH will provide a polygon
-            if f["geometry"]["type"] == "Polygon":
-                _geometry = Polygon(coordinates=f["geometry"]["coordinates"])
-            elif f["geometry"]["type"] == "LineString":
-                _geometry = LineString(coordinates=f["geometry"]["coordinates"])
-            elif f["geometry"]["type"] == "Point":
-                _geometry = Point(coordinates=f["geometry"]["coordinates"])
-            if _geometry:
-                _feature = Feature(
-                    geometry=_geometry, properties=asdict(_feature_properties)
-                )
-                _all_features.append(_feature)
-
-        _diagram_feature_collection = FeatureCollection(features=_all_features)
-
-        return _diagram_feature_collection
+    def parse_transform_geojson(
+        self, design_feature_collection, precision: int = COORDINATE_PRECISION
+    ) -> FeatureCollection:
+        """Maps the features of the design to the properties exported to ArcGIS, see design_transform_helper"""
+        return transform_design_features(
+            design_feature_collection,
+            multipart_policy=config.external_api_settings["GDH_MULTIPART_POLICY"],
+            precision=precision,
+        )
 
-    def download_design_data_from_geodesignhub(
+    def stream_design_features_from_geodesignhub(
         self,
-    ) -> Union[ErrorResponse, dict]:
+    ) -> Union[ErrorResponse, Iterator[dict]]:
+        """Returns a generator that decodes the features of the design one at a time from the response stream"""
         r = self.api_helper.get_single_synthesis(
-            teamid=int(self.cteam_id), synthesisid=self.synthesis_id
+            teamid=int(self.cteam_id), synthesisid=self.synthesis_id, stream=True
         )
-
         try:
             assert r.status_code == 200
         except AssertionError:
+            r.close()
             error_msg = ErrorResponse(
                 status=0,
                 message="Could not parse Project ID, Diagram ID or API Token ID. One or more of these were not found in your JSON request.",
@@ -241,17 +254,37 @@ class GeodesignhubDataDownloader:
             )
             return error_msg
 
-        _esri_design_details_raw = r.json()
+        self.design_bytes_downloaded = 0
 
-        return _esri_design_details_raw
+        def _counted_chunks() -> Iterator[bytes]:
+            for chunk in r.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                self.design_bytes_downloaded += len(chunk)
+                yield chunk
 
-    def download_esri_design_data_from_geodesignhub(
-        self,
+        def _iter_design_features() -> Iterator[dict]:
+            try:
+                yield from iter_feature_collection_features(_counted_chunks())
+            finally:
+                r.close()
+
+        return _iter_design_features()
+
+    def download_design_data_from_geodesignhub(
+        self, stream: bool = False
     ) -> Union[ErrorResponse, dict]:
-        r = self.api_helper.get_single_synthesis_esri_json(
+        """Set stream to build the FeatureCollection from the streamed features, the raw response body is never held in memory"""
+        if stream:
+            _design_features = self.stream_design_features_from_geodesignhub()
+            if isinstance(_design_features, ErrorResponse):
+                return _design_features
+            return {"type": "FeatureCollection", "features": list(_design_features)}
+
+        r = self.api_helper.get_single_synthesis(
             teamid=int(self.cteam_id), synthesisid=self.synthesis_id
         )
+        return self.parse_design_data(r)
 
+    def parse_design_data(self, r) -> Union[ErrorResponse, dict]:
         try:
             assert r.status_code == 200
         except AssertionError:
@@ -262,27 +295,54 @@ class GeodesignhubDataDownloader:
             )
             return error_msg
 
-        _esri_design_details_raw = r.json()
+        _esri_design_details_raw = loads_json(r.content)
 
         return _esri_design_details_raw
 
-    def download_project_data_from_geodesignhub(
+    async def _download_export_data(self) -> GeodesignhubExportData:
+        async with GeodesignHub.AsyncGeodesignHubClient(
+            client=self.api_helper, max_concurrency=self.max_concurrency
+        ) as async_api_helper:
+            (
+                project_details,
+                systems,
+                design_data,
+                r_details,
+                tags,
+            ) = await asyncio.gather(
+                async_api_helper.run(self.get_project_details),
+                async_api_helper.run(self.download_project_systems),
+                async_api_helper.run(
+                    self.download_design_data_from_geodesignhub, stream=True
+                ),
+                async_api_helper.get_single_synthesis_details(
+                    teamid=int(self.cteam_id), synthesisid=self.synthesis_id
+                ),
+                async_api_helper.run(self.download_project_tags),
+            )
+
+        return GeodesignhubExportData(
+            project_details=project_details,
+            systems=systems,
+            design_data=design_data,
+            design_details=self.parse_design_details(r_details),
+            tags=tags,
+        )
+
+    def download_export_data_from_geodesignhub(self) -> GeodesignhubExportData:
+        """Downloads the project details, systems, design, design details and tags
+        concurrently, the export page then waits only for the slowest of the calls"""
+        return asyncio.run(self._download_export_data())
+
+    def download_esri_design_data_from_geodesignhub(
         self,
-    ) -> Union[ErrorResponse, GeodesignhubProjectData]:
-        my_api_helper = GeodesignHub.GeodesignHubClient(
-            url=config.external_api_settings["GDH_SERVICE_URL"],
-            project_id=self.project_id,
-            token=self.apitoken,
+    ) -> Union[ErrorResponse, dict]:
+        r = self.api_helper.get_single_synthesis_esri_json(
+            teamid=int(self.cteam_id), synthesisid=self.synthesis_id
         )
-        # Download Data
-        s = my_api_helper.get_all_systems()
-        b = my_api_helper.get_project_bounds()
-        c = my_api_helper.get_project_center()
-        t = my_api_helper.get_project_tags()
 
-        # Check responses / data
         try:
-            assert s.status_code == 200
+            assert r.status_code == 200
         except AssertionError:
             error_msg = ErrorResponse(
                 status=0,
@@ -291,32 +351,86 @@ class GeodesignhubDataDownloader:
             )
             return error_msg
 
-        systems = s.json()
-        all_systems: List[GeodesignhubSystem] = []
-        all_system_details: List[GeodesignhubSystemDetail] = []
-        for s in systems:
-            current_system = from_dict(data_class=GeodesignhubSystem, data=s)
-            sd = my_api_helper.get_single_system(system_id=current_system.id)
-            sd_raw = sd.json()
-            current_system_details = from_dict(
-                data_class=GeodesignhubSystemDetail, data=sd_raw
+        _esri_design_details_raw = loads_json(r.content)
+
+        return _esri_design_details_raw
+
+    async def _download_diagram_change_ids(
+        self, diagram_ids: List[int]
+    ) -> Dict[str, str]:
+        async with GeodesignHub.AsyncGeodesignHubClient(
+            client=self.api_helper, max_concurrency=self.max_concurrency
+        ) as async_api_helper:
+            change_id_responses = await asyncio.gather(
+                *[
+                    async_api_helper.get_diagram_changeid(diagid=int(diagram_id))
+                    for diagram_id in diagram_ids
+                ],
+                return_exceptions=True,
             )
-            all_system_details.append(current_system_details)
-            all_systems.append(current_system)
 
-        try:
-            assert b.status_code == 200
-        except AssertionError:
-            error_msg = ErrorResponse(
-                status=0,
-                message="Could not parse Project ID, Diagram ID or API Token ID. One or more of these were not found in your JSON request.",
-                code=400,
+        diagram_change_ids: Dict[str, str] = {}
+        for diagram_id, c in zip(diagram_ids, change_id_responses):
+            try:
+                if isinstance(c, Exception):
+                    raise c
+                if c.status_code != 200:
+                    continue
+                _change_id = c.json()
+            except Exception as e:
+                logger.warning(f"Could not read the change ID of diagram {diagram_id}: {e}")
+                continue
+            if isinstance(_change_id, dict) and "changeid" in _change_id:
+                _change_id = _change_id["changeid"]
+            diagram_change_ids[str(diagram_id)] = str(_change_id)
+        return diagram_change_ids
+
+    def download_diagram_change_ids(self, diagram_ids: List[int]) -> Dict[str, str]:
+        """Returns the current change ID of each diagram, diagrams whose change ID could not be
+        read are left out and are treated as changed by an incremental sync"""
+        return asyncio.run(self._download_diagram_change_ids(diagram_ids))
+
+    async def _download_project_data(
+        self,
+    ) -> Union[ErrorResponse, GeodesignhubProjectData]:
+        async with GeodesignHub.AsyncGeodesignHubClient(
+            client=self.api_helper, max_concurrency=self.max_concurrency
+        ) as async_api_helper:
+            # Download Data, the project level requests are all started together
+            s_request = asyncio.ensure_future(
+                async_api_helper.run(self.download_project_systems)
             )
-            return error_msg
+            project_requests = asyncio.gather(
+                async_api_helper.run(self.download_project_bounds),
+                async_api_helper.run(self.download_project_center),
+                async_api_helper.run(self.download_project_tags),
+            )
+            all_systems = await s_request
+
+            # Check responses / data
+            if isinstance(all_systems, ErrorResponse):
+                await project_requests
+                return all_systems
+
+            # The per system details are fetched while bounds, center and tags may still be in flight
+            system_detail_responses = await asyncio.gather(
+                *[
+                    async_api_helper.get_single_system(system_id=current_system.id)
+                    for current_system in all_systems
+                ]
+            )
+            bounds, center, tags = await project_requests
 
-        center = from_dict(data_class=GeodesignhubProjectCenter, data=c.json())
-        bounds = from_dict(data_class=GeodesignhubProjectBounds, data=b.json())
-        tags = from_dict(data_class=GeodesignhubProjectTags, data={"tags": t.json()})
+        all_system_details: List[GeodesignhubSystemDetail] = [
+            from_dict(data_class=GeodesignhubSystemDetail, data=sd.json())
+            for sd in system_detail_responses
+        ]
+
+        for _downloaded in (bounds, center, tags):
+            if isinstance(_downloaded, ErrorResponse):
+                return _downloaded
+
+        tags = from_dict(data_class=GeodesignhubProjectTags, data=tags)
         project_data = GeodesignhubProjectData(
             systems=all_systems,
             system_details=all_system_details,
@@ -326,3 +440,10 @@ class GeodesignhubDataDownloader:
         )
 
         return project_data
+
+    def download_project_data_from_geodesignhub(
+        self,
+    ) -> Union[ErrorResponse, GeodesignhubProjectData]:
+        """Downloads systems, bounds, center, tags and the details of every system, at most
+        max_concurrency requests are sent to Geodesignhub at the same time"""
+        return asyncio.run(self._download_project_data())
@@ -2,18 +2,21 @@ import tempfile
 from data_definitions import ImporttoGDHItem
 from utils import ArcGISHelper
 from dataclasses import dataclass
-from typing import List
+from typing import Dict, List, Tuple
 import logging
 import os
 from dotenv import load_dotenv, find_dotenv
-import GeodesignHub
+from gdh_api_client_helper import create_gdh_api_client
 import fiona
 import geopandas as gpd
+import shapely
 import boto3
 from botocore.exceptions import ClientError
 import config
 import shutil
 from conn import get_redis
+from progress_helper import PROGRESS_EVENT_LOG, publish_progress
+from session_log_helper import append_session_log
 import redis
 
 logger = logging.getLogger("esri-gdh-bridge")
@@ -40,14 +43,23 @@ class ImporttoGDHPayload:
 
 def log_to_redis(message: str, session_id: str, redis_instance: redis.Redis):
     """
-    Logs a message to Redis associated with the session ID.
+    Logs a message to Redis associated with the session ID and publishes it to the progress stream.
     """
     logger.info(message)
-    redis_instance.lpush(f"session_logs:{session_id}", message)
+    cursor = append_session_log(redis_instance, session_id, message)
+    publish_progress(
+        redis_instance,
+        session_id,
+        PROGRESS_EVENT_LOG,
+        {"message": message, "cursor": cursor},
+    )
 
 
 def process_geopackage_layers(
-    downloaded_file: str, session_id: str, redis_instance: redis.Redis
+    downloaded_file: str,
+    session_id: str,
+    redis_instance: redis.Redis,
+    precision: int = None,
 ) -> List[gpd.GeoDataFrame]:
     """
     Processes layers from a GeoPackage file and returns a list of GeoDataFrames.
@@ -56,10 +68,13 @@ def process_geopackage_layers(
         downloaded_file (str): Path to the downloaded GeoPackage file.
         session_id (str): Session ID for logging purposes.
         redis_instance (redis.Redis): Redis instance for logging.
+        precision (int): Decimals the WGS84 coordinates are rounded to, defaults to GDH_COORDINATE_PRECISION.
 
     Returns:
         List[gpd.GeoDataFrame]: A list of GeoDataFrames for each processed layer.
     """
+    if precision is None:
+        precision = config.external_api_settings["GDH_COORDINATE_PRECISION"]
     log_to_redis(
         f"Reading layers from GeoPackage file: {downloaded_file}.",
         session_id,
@@ -87,11 +102,74 @@ def process_geopackage_layers(
                 filtered = exploded.filter(["geometry"])
                 rp_gdf = filtered.to_crs(epsg=4326)
 
+                # Snap to the precision grid, vertices that collapse onto each other are removed
+                num_coordinates = int(shapely.get_num_coordinates(rp_gdf.geometry.values).sum())
+                rp_gdf["geometry"] = rp_gdf.geometry.set_precision(
+                    grid_size=10**-precision
+                )
+                rp_gdf = rp_gdf[~rp_gdf.geometry.is_empty]
+                log_to_redis(
+                    f"Rounded coordinates to {precision} decimals, {num_coordinates - int(shapely.get_num_coordinates(rp_gdf.geometry.values).sum())} of {num_coordinates} vertices removed.",
+                    session_id,
+                    redis_instance,
+                )
+
                 all_gdf.append(rp_gdf)
 
     return all_gdf
 
 
+def post_diagrams_to_gdh(
+    diagrams_to_post: List[Tuple[str, str, str, dict]],
+    session_id: str,
+    redis_instance: redis.Redis,
+) -> None:
+    """
+    Posts diagrams with external geometries to Geodesignhub, one client and connection pool is
+    used per project and API token and the diagrams are sent in parallel.
+
+    Args:
+        diagrams_to_post (List[Tuple[str, str, str, dict]]): Tuples of a label for the logs, the
+            target project ID, the API token and the keyword arguments for
+            post_as_diagram_with_external_geometries.
+        session_id (str): Session ID for logging purposes.
+        redis_instance (redis.Redis): Redis instance for logging.
+    """
+    diagrams_by_project: Dict[Tuple[str, str], List[Tuple[str, dict]]] = {}
+    for label, project_id, gdh_api_token, diagram in diagrams_to_post:
+        diagrams_by_project.setdefault((project_id, gdh_api_token), []).append(
+            (label, diagram)
+        )
+
+    for (project_id, gdh_api_token), project_diagrams in diagrams_by_project.items():
+        gdh_api_helper = create_gdh_api_client(
+            project_id=project_id,
+            token=gdh_api_token,
+        )
+        log_to_redis(
+            f"Submitting {len(project_diagrams)} diagrams to GeodesignHub project {project_id}.",
+            session_id,
+            redis_instance,
+        )
+        responses = gdh_api_helper.post_many_as_diagram_with_external_geometries(
+            diagrams=[diagram for _, diagram in project_diagrams],
+            max_parallel=config.external_api_settings["GDH_MAX_CONCURRENCY"],
+        )
+        for (label, _), response in zip(project_diagrams, responses):
+            if isinstance(response, Exception):
+                log_to_redis(
+                    f"Error submitting {label} to GeodesignHub: {response}",
+                    session_id,
+                    redis_instance,
+                )
+            else:
+                log_to_redis(
+                    f"Submitted {label} to GeodesignHub. Response: {response.text}",
+                    session_id,
+                    redis_instance,
+                )
+
+
 def process_gdh_feature_service_import(
     _migrate_to_gdh_payload: ImporttoGDHPayload,
 ) -> None:
@@ -102,42 +180,33 @@ def process_gdh_feature_service_import(
         r,
     )
 
+    diagrams_to_post = []
     for item in _migrate_to_gdh_payload.items_to_migrate:
-        log_to_redis(
-            f"Submitting item {item.agol_id} to GeodesignHub via API.",
-            _migrate_to_gdh_payload.session_id,
-            r,
-        )
-        gdh_api_helper = GeodesignHub.GeodesignHubClient(
-            url=config.external_api_settings["GDH_SERVICE_URL"],
-            project_id=item.target_gdh_project_id,
-            token=item.gdh_api_token,
+        diagrams_to_post.append(
+            (
+                f"item {item.agol_id}",
+                item.target_gdh_project_id,
+                item.gdh_api_token,
+                dict(
+                    url=item.agol_url,
+                    layer_type="esri-org-featurelayer",
+                    projectorpolicy=item.target_gdh_project_or_policy,
+                    featuretype="polygon",
+                    description=item.agol_item_title,
+                    sysid=item.target_gdh_system,
+                    fundingtype="pp",
+                    additional_metadata={"agol_item_id": item.agol_id},
+                    cost=0,
+                    costtype="t",
+                ),
+            )
         )
 
-        try:
-            response = gdh_api_helper.post_as_diagram_with_external_geometries(
-                url=item.agol_url,
-                layer_type="esri-org-featurelayer",
-                projectorpolicy=item.target_gdh_project_or_policy,
-                featuretype="polygon",
-                description=item.agol_item_title,
-                sysid=item.target_gdh_system,
-                fundingtype="pp",
-                additional_metadata={"agol_item_id": item.agol_id},
-                cost=0,
-                costtype="t",
-            )
-            log_to_redis(
-                f"Submitted item {item.agol_id} to GeodesignHub. Response: {response.text}",
-                _migrate_to_gdh_payload.session_id,
-                r,
-            )
-        except Exception as e:
-            log_to_redis(
-                f"Error submitting item {item.agol_id} to GeodesignHub: {e}",
-                _migrate_to_gdh_payload.session_id,
-                r,
-            )
+    post_diagrams_to_gdh(
+        diagrams_to_post=diagrams_to_post,
+        session_id=_migrate_to_gdh_payload.session_id,
+        redis_instance=r,
+    )
 
 
 def process_gdh_import(_migrate_to_gdh_payload: ImporttoGDHPayload) -> None:
@@ -233,228 +302,203 @@ def process_gdh_import(_migrate_to_gdh_payload: ImporttoGDHPayload) -> None:
         r,
     )
 
-    for item_to_process in items_to_migrate:
-        log_to_redis(
-            f"Processing item with ID {item_to_process.agol_id}.",
-            _migrate_to_gdh_payload.session_id,
-            r,
-        )
-        if item_to_process.agol_item_type == file_type == "geopackage":
-            log_to_redis(
-                f"Item {item_to_process.agol_id} matches the file type {file_type}.",
-                _migrate_to_gdh_payload.session_id,
-                r,
-            )
-            # Get the item from ArcGIS Online
+    diagrams_to_post: List[Tuple[str, str, str, dict]] = []
+    try:
+        for item_to_process in items_to_migrate:
             log_to_redis(
-                "Retrieving GIS object from ArcGIS Online.",
+                f"Processing item with ID {item_to_process.agol_id}.",
                 _migrate_to_gdh_payload.session_id,
                 r,
             )
-            gis: object = my_agol_helper.get_gis()
-            item: object = gis.content.get(item_to_process.agol_id)
-
-            if not item:
+            if item_to_process.agol_item_type == file_type == "geopackage":
                 log_to_redis(
-                    f"Item with ID {item_to_process.agol_id} not found.",
+                    f"Item {item_to_process.agol_id} matches the file type {file_type}.",
                     _migrate_to_gdh_payload.session_id,
                     r,
                 )
-                continue
-
-            log_to_redis(
-                f"Downloading item {item_to_process.agol_id} to temporary directory.",
-                _migrate_to_gdh_payload.session_id,
-                r,
-            )
-            my_agol_helper.download_geojson_item_to_tmp_file(
-                item=item, save_path=temp_dir.name
-            )
-
-            # Get all the *.geojson files in the directory
-            log_to_redis(
-                "Searching for downloaded GeoPackage files.",
-                _migrate_to_gdh_payload.session_id,
-                r,
-            )
-            downloaded_file_name: str = [
-                f for f in os.listdir(temp_dir.name) if f.endswith(".gpkg")
-            ][0]
-
-            downloaded_file: str = os.path.join(temp_dir.name, downloaded_file_name)
-            log_to_redis(
-                f"Found downloaded file: {downloaded_file}.",
-                _migrate_to_gdh_payload.session_id,
-                r,
-            )
-            # Load the downloaded file into a GeoDataFrame
-
-            try:
-                all_gdf = process_geopackage_layers(
-                    downloaded_file=downloaded_file,
-                    session_id=_migrate_to_gdh_payload.session_id,
-                    redis_instance=r,
-                )
-
-            except Exception as e:
+                # Get the item from ArcGIS Online
                 log_to_redis(
-                    f"Error reading file {downloaded_file}: {e}",
+                    "Retrieving GIS object from ArcGIS Online.",
                     _migrate_to_gdh_payload.session_id,
                     r,
                 )
-                continue
-            # Simplify the geometry
-            for gdf in all_gdf:
+                gis: object = my_agol_helper.get_gis()
+                item: object = gis.content.get(item_to_process.agol_id)
+
+                if not item:
+                    log_to_redis(
+                        f"Item with ID {item_to_process.agol_id} not found.",
+                        _migrate_to_gdh_payload.session_id,
+                        r,
+                    )
+                    continue
+
                 log_to_redis(
-                    "Simplifying geometries in GeoDataFrame.",
+                    f"Downloading item {item_to_process.agol_id} to temporary directory.",
                     _migrate_to_gdh_payload.session_id,
                     r,
                 )
-                simplified_gdf: gpd.GeoDataFrame = gdf.copy()
-                simplified_gdf["geometry"] = simplified_gdf["geometry"].simplify(
-                    tolerance=0.01, preserve_topology=True
+                my_agol_helper.download_geojson_item_to_tmp_file(
+                    item=item, save_path=temp_dir.name
                 )
 
-                # Save the original GeoDataFrame as FlatGeobuf (FGB)
-                original_fgb_path: str = os.path.join(
-                    temp_dir.name, f"{item_to_process.agol_id}.fgb"
-                )
-                gdf.to_file(original_fgb_path, driver="FlatGeobuf")
-                # Save the simplified GeoDataFrame as FlatGeobuf (FGB)
-                simplified_fgb_path: str = os.path.join(
-                    temp_dir.name, f"{item_to_process.agol_id}_generalised.fgb"
-                )
-                simplified_gdf.to_file(simplified_fgb_path, driver="FlatGeobuf")
-
+                # Get all the *.geojson files in the directory
                 log_to_redis(
-                    f"Saved original and simplified FGB files for item {item_to_process.agol_id}.",
+                    "Searching for downloaded GeoPackage files.",
                     _migrate_to_gdh_payload.session_id,
                     r,
                 )
+                downloaded_file_name: str = [
+                    f for f in os.listdir(temp_dir.name) if f.endswith(".gpkg")
+                ][0]
 
-            original_file_name: str = os.path.basename(original_fgb_path)
-            simplified_file_name: str = os.path.basename(simplified_fgb_path)
-            target_path: str = f"projects/{item_to_process.target_gdh_project_id}/systems/{item_to_process.target_gdh_system}"
-            try:
+                downloaded_file: str = os.path.join(temp_dir.name, downloaded_file_name)
                 log_to_redis(
-                    f"Uploading original FGB file to S3 bucket at {target_path}.",
+                    f"Found downloaded file: {downloaded_file}.",
                     _migrate_to_gdh_payload.session_id,
                     r,
                 )
-                with open(original_fgb_path, "rb") as f:
-                    client.upload_fileobj(
-                        f,
-                        bucket_name,
-                        os.path.join(target_path, original_file_name),
-                        ExtraArgs={"ACL": "public-read"},
+                # Load the downloaded file into a GeoDataFrame
+
+                try:
+                    all_gdf = process_geopackage_layers(
+                        downloaded_file=downloaded_file,
+                        session_id=_migrate_to_gdh_payload.session_id,
+                        redis_instance=r,
                     )
+
+                except Exception as e:
                     log_to_redis(
-                        f"Uploaded {original_fgb_path} to S3 bucket {bucket_name} at {target_path}.",
+                        f"Error reading file {downloaded_file}: {e}",
                         _migrate_to_gdh_payload.session_id,
                         r,
                     )
-            except ClientError as e:
-                log_to_redis(
-                    f"Failed to upload {original_fgb_path} to S3 bucket: {e}",
-                    _migrate_to_gdh_payload.session_id,
-                    r,
-                )
-                raise
+                    continue
+                # Simplify the geometry
+                for gdf in all_gdf:
+                    log_to_redis(
+                        "Simplifying geometries in GeoDataFrame.",
+                        _migrate_to_gdh_payload.session_id,
+                        r,
+                    )
+                    simplified_gdf: gpd.GeoDataFrame = gdf.copy()
+                    simplified_gdf["geometry"] = simplified_gdf["geometry"].simplify(
+                        tolerance=0.01, preserve_topology=True
+                    )
 
-            # Upload the simplified FGB to the S3 bucket
-            try:
-                log_to_redis(
-                    f"Uploading simplified FGB file to S3 bucket at {target_path}.",
-                    _migrate_to_gdh_payload.session_id,
-                    r,
-                )
-                with open(simplified_fgb_path, "rb") as f:
-                    client.upload_fileobj(
-                        f,
-                        bucket_name,
-                        os.path.join(target_path, simplified_file_name),
-                        ExtraArgs={"ACL": "public-read"},
+                    # Save the original GeoDataFrame as FlatGeobuf (FGB)
+                    original_fgb_path: str = os.path.join(
+                        temp_dir.name, f"{item_to_process.agol_id}.fgb"
+                    )
+                    gdf.to_file(original_fgb_path, driver="FlatGeobuf")
+                    # Save the simplified GeoDataFrame as FlatGeobuf (FGB)
+                    simplified_fgb_path: str = os.path.join(
+                        temp_dir.name, f"{item_to_process.agol_id}_generalised.fgb"
                     )
+                    simplified_gdf.to_file(simplified_fgb_path, driver="FlatGeobuf")
+
                     log_to_redis(
-                        f"Uploaded {simplified_fgb_path} to S3 bucket {bucket_name} at {target_path}.",
+                        f"Saved original and simplified FGB files for item {item_to_process.agol_id}.",
                         _migrate_to_gdh_payload.session_id,
                         r,
                     )
-            except ClientError as e:
-                log_to_redis(
-                    f"Failed to upload {simplified_fgb_path} to S3 bucket: {e}",
-                    _migrate_to_gdh_payload.session_id,
-                    r,
-                )
-                raise
 
-            # Send to Geodesignhub project
-            log_to_redis(
-                "Initializing GeodesignHub API client.",
-                _migrate_to_gdh_payload.session_id,
-                r,
-            )
-            gdh_api_helper: GeodesignHub.GeodesignHubClient = (
-                GeodesignHub.GeodesignHubClient(
-                    url=config.external_api_settings["GDH_SERVICE_URL"],
-                    project_id=item_to_process.target_gdh_project_id,
-                    token=item_to_process.gdh_api_token,
-                )
-            )
+                original_file_name: str = os.path.basename(original_fgb_path)
+                simplified_file_name: str = os.path.basename(simplified_fgb_path)
+                target_path: str = f"projects/{item_to_process.target_gdh_project_id}/systems/{item_to_process.target_gdh_system}"
+                try:
+                    log_to_redis(
+                        f"Uploading original FGB file to S3 bucket at {target_path}.",
+                        _migrate_to_gdh_payload.session_id,
+                        r,
+                    )
+                    with open(original_fgb_path, "rb") as f:
+                        client.upload_fileobj(
+                            f,
+                            bucket_name,
+                            os.path.join(target_path, original_file_name),
+                            ExtraArgs={"ACL": "public-read"},
+                        )
+                        log_to_redis(
+                            f"Uploaded {original_fgb_path} to S3 bucket {bucket_name} at {target_path}.",
+                            _migrate_to_gdh_payload.session_id,
+                            r,
+                        )
+                except ClientError as e:
+                    log_to_redis(
+                        f"Failed to upload {original_fgb_path} to S3 bucket: {e}",
+                        _migrate_to_gdh_payload.session_id,
+                        r,
+                    )
+                    raise
 
-            def post_to_gdh_external_geometries(
-                gdh_api_helper: GeodesignHub.GeodesignHubClient,
-                url: str,
-                description: str,
-            ) -> None:
-                log_to_redis(
-                    f"Posting data to GeodesignHub: {description}.",
-                    _migrate_to_gdh_payload.session_id,
-                    r,
-                )
-                diagram_response = (
-                    gdh_api_helper.post_as_diagram_with_external_geometries(
-                        url=url,
-                        layer_type="fgb-layer",
-                        projectorpolicy=item_to_process.target_gdh_project_or_policy,
-                        featuretype="polygon",
-                        description=description,
-                        sysid=item_to_process.target_gdh_system,
-                        fundingtype="pu",
-                        cost=0,
-                        costtype="t",
+                # Upload the simplified FGB to the S3 bucket
+                try:
+                    log_to_redis(
+                        f"Uploading simplified FGB file to S3 bucket at {target_path}.",
+                        _migrate_to_gdh_payload.session_id,
+                        r,
+                    )
+                    with open(simplified_fgb_path, "rb") as f:
+                        client.upload_fileobj(
+                            f,
+                            bucket_name,
+                            os.path.join(target_path, simplified_file_name),
+                            ExtraArgs={"ACL": "public-read"},
+                        )
+                        log_to_redis(
+                            f"Uploaded {simplified_fgb_path} to S3 bucket {bucket_name} at {target_path}.",
+                            _migrate_to_gdh_payload.session_id,
+                            r,
+                        )
+                except ClientError as e:
+                    log_to_redis(
+                        f"Failed to upload {simplified_fgb_path} to S3 bucket: {e}",
+                        _migrate_to_gdh_payload.session_id,
+                        r,
                     )
+                    raise
+
+                original_fgb_url: str = (
+                    S3_CDN_ENDPOINT + "/" + target_path + "/" + original_file_name
                 )
-                log_to_redis(
-                    f"Posted data to GeodesignHub: {diagram_response.text}.",
-                    _migrate_to_gdh_payload.session_id,
-                    r,
+
+                # The original FGB is posted to the Geodesignhub project with the other items below
+                diagrams_to_post.append(
+                    (
+                        f"item {item_to_process.agol_id} (Original)",
+                        item_to_process.target_gdh_project_id,
+                        item_to_process.gdh_api_token,
+                        dict(
+                            url=original_fgb_url,
+                            layer_type="fgb-layer",
+                            projectorpolicy=item_to_process.target_gdh_project_or_policy,
+                            featuretype="polygon",
+                            description="Imported from AGOL (Original)",
+                            sysid=item_to_process.target_gdh_system,
+                            fundingtype="pu",
+                            cost=0,
+                            costtype="t",
+                        ),
+                    )
                 )
 
-            original_fgb_url: str = (
-                S3_CDN_ENDPOINT + "/" + target_path + "/" + original_file_name
+            log_to_redis(
+                f"Cleaning up temporary directory {temp_dir.name}.",
+                _migrate_to_gdh_payload.session_id,
+                r,
             )
-
-            # Post original FGB
+            shutil.rmtree(temp_dir.name, ignore_errors=True)
             log_to_redis(
-                "Posting original FGB to GeodesignHub.",
+                f"Temporary directory {temp_dir.name} deleted.",
                 _migrate_to_gdh_payload.session_id,
                 r,
             )
-            post_to_gdh_external_geometries(
-                gdh_api_helper=gdh_api_helper,
-                url=original_fgb_url,
-                description="Imported from AGOL (Original)",
+    finally:
+        # Items uploaded before a later item failed are posted too, they are in S3 already
+        if diagrams_to_post:
+            post_diagrams_to_gdh(
+                diagrams_to_post=diagrams_to_post,
+                session_id=_migrate_to_gdh_payload.session_id,
+                redis_instance=r,
             )
-
-        log_to_redis(
-            f"Cleaning up temporary directory {temp_dir.name}.",
-            _migrate_to_gdh_payload.session_id,
-            r,
-        )
-        shutil.rmtree(temp_dir.name, ignore_errors=True)
-        log_to_redis(
-            f"Temporary directory {temp_dir.name} deleted.",
-            _migrate_to_gdh_payload.session_id,
-            r,
-        )
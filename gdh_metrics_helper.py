@@ -0,0 +1,153 @@
+import logging
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List
+
+import redis
+
+from json_serialization_helper import dumps_json, loads_json
+
+logger = logging.getLogger("esri-gdh-bridge")
+
+METRICS_KEY_PREFIX = "gdh_api_metrics"
+# Upper bounds of the latency histogram buckets in seconds, the last bucket is unbounded
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class _EndpointMetrics:
+    def __init__(self):
+        self.count = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.bytes_sum = 0
+        self.bytes_max = 0
+        self.status_codes: Dict[str, int] = {}
+        self.retries = 0
+        self.retried_requests = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "latency": {
+                "sum": round(self.latency_sum, 6),
+                "max": round(self.latency_max, 6),
+                "mean": round(self.latency_sum / self.count, 6) if self.count else 0,
+                "buckets": {
+                    (str(bound) if i < len(LATENCY_BUCKETS) else "+Inf"): n
+                    for i, (bound, n) in enumerate(
+                        zip(LATENCY_BUCKETS + (None,), self.latency_buckets)
+                    )
+                },
+            },
+            "bytes": {"sum": self.bytes_sum, "max": self.bytes_max},
+            "status_codes": dict(self.status_codes),
+            "retries": self.retries,
+            "retried_requests": self.retried_requests,
+        }
+
+
+class GeodesignhubAPIMetrics:
+    """
+    A process local registry of the requests sent to the Geodesignhub API. For every endpoint
+    and method it keeps the request count, a latency histogram, response sizes, status codes
+    and retries. Latency is the time spent in the transport, including retries and waiting
+    for the rate limiter. Snapshots can be exported to Redis so that the metrics of the web
+    and worker processes can be read in one place.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, _EndpointMetrics] = {}
+        self.started_at = time.time()
+        self.updated_at = 0.0
+        self.exported_at = 0.0
+
+    def record(
+        self,
+        endpoint: str,
+        method: str,
+        status_code: int,
+        elapsed: float,
+        size: int,
+        retries: int = 0,
+    ):
+        name = f"{method} {endpoint}"
+        with self._lock:
+            metrics = self._endpoints.get(name)
+            if metrics is None:
+                metrics = _EndpointMetrics()
+                self._endpoints[name] = metrics
+            metrics.count += 1
+            metrics.latency_sum += elapsed
+            metrics.latency_max = max(metrics.latency_max, elapsed)
+            metrics.latency_buckets[bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+            metrics.bytes_sum += size
+            metrics.bytes_max = max(metrics.bytes_max, size)
+            status = str(status_code)
+            metrics.status_codes[status] = metrics.status_codes.get(status, 0) + 1
+            metrics.retries += retries
+            if retries:
+                metrics.retried_requests += 1
+            self.updated_at = time.time()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            endpoints = {
+                name: metrics.as_dict() for name, metrics in self._endpoints.items()
+            }
+        return {
+            "process": process_name(),
+            "started_at": self.started_at,
+            "updated_at": self.updated_at,
+            "endpoints": endpoints,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+            self.started_at = time.time()
+            self.updated_at = 0.0
+
+
+def process_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+registry = GeodesignhubAPIMetrics()
+
+
+def export_metrics(
+    redis_instance: redis.Redis, min_interval: float = 0, ttl: int = 86400
+):
+    """Stores the snapshot of this process in Redis when it changed, at most every min_interval seconds"""
+    now = time.time()
+    if registry.updated_at <= registry.exported_at or now - registry.exported_at < min_interval:
+        return
+    registry.exported_at = now
+    try:
+        redis_instance.set(
+            f"{METRICS_KEY_PREFIX}:{process_name()}",
+            dumps_json(registry.snapshot()),
+            ex=ttl,
+        )
+    except redis.RedisError as e:
+        logger.warning(f"Could not export Geodesignhub API metrics: {e}")
+
+
+def collect_metrics(redis_instance: redis.Redis) -> List[dict]:
+    """Returns the snapshots exported by all processes, the live snapshot replaces the one stored for this process"""
+    snapshots = {}
+    try:
+        for key in redis_instance.scan_iter(match=f"{METRICS_KEY_PREFIX}:*", count=100):
+            stored = redis_instance.get(key)
+            if stored:
+                snapshot = loads_json(stored)
+                snapshots[snapshot["process"]] = snapshot
+    except redis.RedisError as e:
+        logger.warning(f"Could not read exported Geodesignhub API metrics: {e}")
+    snapshots[process_name()] = registry.snapshot()
+    return list(snapshots.values())
@@ -0,0 +1,237 @@
+"""
+Records the traffic of GeodesignHubClient into fixtures and replays it from a local server,
+so that the export and import paths can be profiled without calling Geodesignhub.
+
+Record by setting GDH_RECORD_FIXTURES_PATH, every response received by the clients built in
+gdh_api_client_helper is then appended to that file. Replay with
+
+    python gdh_replay_helper.py fixtures.jsonl --port 8765 --error-rate 0.05
+
+and point SERVICE_URL at http://127.0.0.1:8765/api/v1/
+"""
+
+import argparse
+import base64
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger("esri-gdh-bridge")
+
+# Response headers worth replaying, everything else is set by the replay server
+RECORDED_HEADERS = ("Content-Type", "ETag", "Cache-Control")
+
+
+def _fixture_key(method: str, url: str) -> Tuple[str, str]:
+    parts = urlsplit(url)
+    path = parts.path + ("?" + parts.query if parts.query else "")
+    return method.upper(), path
+
+
+def _encode_body(body) -> Tuple[str, str]:
+    if body is None:
+        return "", "text"
+    if isinstance(body, str):
+        return body, "text"
+    try:
+        return body.decode("utf-8"), "text"
+    except UnicodeDecodeError:
+        return base64.b64encode(body).decode("ascii"), "base64"
+
+
+def _decode_body(body: str, encoding: str) -> bytes:
+    if encoding == "base64":
+        return base64.b64decode(body)
+    return body.encode("utf-8")
+
+
+class FixtureRecorder:
+    """
+    A response hook that appends every Geodesignhub response to a JSON lines fixture file,
+    with the url, request body, status, latency and response body. The Authorization header
+    is never written. The body of a streamed response is read to record it, so streaming
+    downloads are buffered while recording.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, r, *args, **kwargs):
+        try:
+            method, path = _fixture_key(r.request.method, r.request.url)
+            request_body, request_body_encoding = _encode_body(r.request.body)
+            body, body_encoding = _encode_body(r.content)
+            fixture = {
+                "method": method,
+                "path": path,
+                "request_body": request_body,
+                "request_body_encoding": request_body_encoding,
+                "status_code": r.status_code,
+                "headers": {
+                    header: r.headers[header]
+                    for header in RECORDED_HEADERS
+                    if header in r.headers
+                },
+                "latency": r.elapsed.total_seconds(),
+                "body": body,
+                "body_encoding": body_encoding,
+            }
+            with self._lock:
+                with open(self.path, "a", encoding="utf-8") as fixtures_file:
+                    fixtures_file.write(json.dumps(fixture) + "\n")
+        except Exception as e:
+            logger.warning(f"Could not record Geodesignhub fixture: {e}")
+
+
+def load_fixtures(path: str) -> Dict[Tuple[str, str], List[dict]]:
+    """Groups the recorded responses by method and path, in the order they were recorded"""
+    fixtures: Dict[Tuple[str, str], List[dict]] = {}
+    with open(path, encoding="utf-8") as fixtures_file:
+        for line in fixtures_file:
+            if not line.strip():
+                continue
+            fixture = json.loads(line)
+            fixtures.setdefault((fixture["method"], fixture["path"]), []).append(
+                fixture
+            )
+    return fixtures
+
+
+class GeodesignhubReplayServer(ThreadingHTTPServer):
+    """
+    Serves recorded fixtures in place of the Geodesignhub API. Responses for the same
+    request are served in turn. The recorded latency is multiplied by latency_scale and
+    extra_latency is added, error_rate is the share of requests answered with error_status.
+    Requests without a fixture are answered with 404.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        server_address: Tuple[str, int],
+        fixtures: Dict[Tuple[str, str], List[dict]],
+        latency_scale: float = 1.0,
+        extra_latency: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        seed: int = None,
+    ):
+        super().__init__(server_address, _ReplayRequestHandler)
+        self.fixtures = fixtures
+        self.latency_scale = latency_scale
+        self.extra_latency = extra_latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._served: Dict[Tuple[str, str], int] = {}
+
+    def next_fixture(self, key: Tuple[str, str]):
+        with self._lock:
+            fixtures = self.fixtures.get(key)
+            if not fixtures:
+                return None, False
+            served = self._served.get(key, 0)
+            self._served[key] = served + 1
+            inject_error = self.random.random() < self.error_rate
+            return fixtures[served % len(fixtures)], inject_error
+
+
+class _ReplayRequestHandler(BaseHTTPRequestHandler):
+    server: GeodesignhubReplayServer
+    protocol_version = "HTTP/1.1"
+
+    def _replay(self):
+        content_length = int(self.headers.get("Content-Length", 0))
+        if content_length:
+            self.rfile.read(content_length)
+
+        fixture, inject_error = self.server.next_fixture(
+            _fixture_key(self.command, self.path)
+        )
+        if fixture is None:
+            self._send(404, {"Content-Type": "application/json"}, b'{"detail": "Not found."}')
+            return
+
+        time.sleep(
+            fixture["latency"] * self.server.latency_scale + self.server.extra_latency
+        )
+        if inject_error:
+            self._send(
+                self.server.error_status,
+                {"Content-Type": "application/json"},
+                b'{"detail": "Injected error"}',
+            )
+            return
+
+        etag = fixture["headers"].get("ETag")
+        if etag and self.headers.get("If-None-Match") == etag:
+            self._send(304, {"ETag": etag}, b"")
+            return
+        self._send(
+            fixture["status_code"],
+            fixture["headers"],
+            _decode_body(fixture["body"], fixture["body_encoding"]),
+        )
+
+    def _send(self, status_code: int, headers: dict, body: bytes):
+        self.send_response(status_code)
+        for header, value in headers.items():
+            self.send_header(header, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _replay
+    do_POST = _replay
+    do_PUT = _replay
+    do_DELETE = _replay
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay recorded Geodesignhub API fixtures from a local server"
+    )
+    parser.add_argument("fixtures", help="Fixture file written by FixtureRecorder")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--extra-latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = GeodesignhubReplayServer(
+        (args.host, args.port),
+        fixtures=load_fixtures(args.fixtures),
+        latency_scale=args.latency_scale,
+        extra_latency=args.extra_latency,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    )
+    logger.info(
+        f"Replaying Geodesignhub fixtures on http://{args.host}:{args.port}/api/v1/"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from typing import Callable, Dict
+
+import redis
+import requests
+
+from gdh_api_cache_helper import build_cached_response
+from json_serialization_helper import dumps_json, loads_json
+
+logger = logging.getLogger("esri-gdh-bridge")
+
+SINGLE_FLIGHT_KEY_PREFIX = "gdh_singleflight"
+SKIPPED_RESULT_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+
+class _InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces identical GET requests that are in flight at the same time, requests are
+    identical when their keys match e.g. method, url and token hash. The first caller
+    sends the request, the others wait for it and receive the same response. Within a
+    process this uses a lock and an event per key. When a Redis instance is given, a short
+    Redis lock extends this to other processes, followers there poll for the result the
+    leader stores for a few seconds under its lock token, with the headers of the
+    response, and fall back to their own request if none appears. A result is only
+    served to callers that arrived while its request was in flight.
+    Every caller parses the shared body itself, the parsed data is mutated downstream.
+    """
+
+    def __init__(
+        self,
+        redis_instance: redis.Redis = None,
+        lock_timeout: float = 10,
+        result_ttl: float = 5,
+        poll_interval: float = 0.05,
+    ):
+        self.redis_instance = redis_instance
+        self.lock_timeout = lock_timeout
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _InFlightCall] = {}
+
+    def do(self, key: str, fetch: Callable[[], requests.Response]) -> requests.Response:
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _InFlightCall()
+                self._calls[key] = call
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.response
+
+        try:
+            if self.redis_instance is not None:
+                call.response = self._do_across_processes(key, fetch)
+            else:
+                call.response = fetch()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.response
+
+    def _do_across_processes(
+        self, key: str, fetch: Callable[[], requests.Response]
+    ) -> requests.Response:
+        key_hash = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        lock_key = f"{SINGLE_FLIGHT_KEY_PREFIX}:lock:{key_hash}"
+        lock_token = str(uuid.uuid4())
+        try:
+            acquired = self.redis_instance.set(
+                lock_key, lock_token, nx=True, px=int(self.lock_timeout * 1000)
+            )
+            leader_token = None if acquired else self.redis_instance.get(lock_key)
+        except redis.RedisError as e:
+            logger.warning(f"Single flight lock unavailable, fetching directly: {e}")
+            return fetch()
+
+        if acquired:
+            try:
+                r = fetch()
+                if r.status_code == 200:
+                    self._store_result(self.result_key(key_hash, lock_token), r)
+                return r
+            finally:
+                try:
+                    if self.redis_instance.get(lock_key) == lock_token.encode("utf-8"):
+                        self.redis_instance.delete(lock_key)
+                except redis.RedisError:
+                    pass
+
+        if leader_token is None:
+            # The leader finished between the two commands, its result is not shared
+            # with callers that did not wait for it
+            return fetch()
+
+        # Another process is sending the same request, wait for the result of that
+        # request only, a result stored by an earlier leader is never served
+        result_key = self.result_key(key_hash, leader_token.decode("utf-8"))
+        deadline = time.monotonic() + self.lock_timeout
+        try:
+            while time.monotonic() < deadline:
+                stored = self.redis_instance.hgetall(result_key)
+                if stored:
+                    return build_cached_response(
+                        stored[b"url"].decode("utf-8"),
+                        stored[b"content"],
+                        headers=loads_json(stored[b"headers"]),
+                    )
+                if self.redis_instance.get(lock_key) != leader_token:
+                    break
+                time.sleep(self.poll_interval)
+        except redis.RedisError:
+            pass
+        return fetch()
+
+    def result_key(self, key_hash: str, lock_token: str) -> str:
+        return f"{SINGLE_FLIGHT_KEY_PREFIX}:result:{key_hash}:{lock_token}"
+
+    def _store_result(self, result_key: str, r: requests.Response):
+        # The body is stored decoded, its encoding and length headers do not apply
+        headers = {
+            name: value
+            for name, value in r.headers.items()
+            if name.lower() not in SKIPPED_RESULT_HEADERS
+        }
+        try:
+            pipe = self.redis_instance.pipeline()
+            pipe.hset(
+                result_key,
+                mapping={
+                    "url": r.url,
+                    "content": r.content,
+                    "headers": dumps_json(headers),
+                },
+            )
+            pipe.pexpire(result_key, int(self.result_ttl * 1000))
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Could not share the response with other processes: {e}")
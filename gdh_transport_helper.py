@@ -0,0 +1,213 @@
+import json
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from circuit_breaker_helper import CircuitBreaker
+
+logger = logging.getLogger("esri-gdh-bridge")
+
+# Responses that mean the upstream did not process the request
+RETRY_SAFE_FOR_ALL_METHODS = (429,)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+@dataclass
+class RetryPolicy:
+    max_retries: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 20.0
+    retry_statuses: Tuple[int, ...] = (429, 502, 503, 504)
+    # Whether the request draws from the token bucket of the API token
+    rate_limited: bool = True
+
+    def backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+
+class TokenBucket:
+    """A thread safe token bucket that refills at rate tokens per second up to capacity"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1):
+        """Blocks until the tokens are available"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated_at) * self.rate
+                )
+                self.updated_at = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_token_buckets: Dict[str, TokenBucket] = {}
+_token_buckets_lock = threading.Lock()
+
+
+def get_token_bucket(token_hash: str, rate: float, capacity: float) -> TokenBucket:
+    """Returns the process wide bucket of an API token, all clients using the token share it"""
+    with _token_buckets_lock:
+        bucket = _token_buckets.get(token_hash)
+        if bucket is None:
+            bucket = TokenBucket(rate=rate, capacity=capacity)
+            _token_buckets[token_hash] = bucket
+        return bucket
+
+
+def retry_after_seconds(response: requests.Response) -> float:
+    """Parses the Retry-After header, given either in seconds or as a HTTP date"""
+    retry_after = response.headers.get("Retry-After")
+    if not retry_after:
+        return 0
+    try:
+        return max(float(retry_after), 0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def connection_not_made(e: requests.RequestException) -> bool:
+    """Whether a request failed before anything was sent, e.g. the connection was refused,
+    the host name did not resolve or the connect timed out, so it is safe to retry any method"""
+    if isinstance(e, requests.ConnectTimeout):
+        return True
+    reason = e.args[0] if e.args else None
+    # requests wraps the urllib3 MaxRetryError, which wraps the reason of the failure
+    reason = getattr(reason, "reason", reason)
+    return isinstance(reason, NewConnectionError)
+
+
+def circuit_open_response(
+    request: requests.PreparedRequest, retry_after: float
+) -> requests.Response:
+    """A 503 response returned without calling Geodesignhub while its circuit is open"""
+    response = requests.Response()
+    response.status_code = 503
+    response.reason = "Service Unavailable"
+    response.url = request.url
+    response.request = request
+    response.encoding = "utf-8"
+    response.headers["Content-Type"] = "application/json"
+    response.headers["Retry-After"] = str(int(retry_after) + 1)
+    response._content = json.dumps(
+        {"detail": "Geodesignhub is unavailable, the request was not sent"}
+    ).encode("utf-8")
+    response._content_consumed = True
+    response.gdh_circuit_open = True
+    return response
+
+
+class GeodesignhubTransportAdapter(HTTPAdapter):
+    """
+    A transport adapter for the Geodesignhub API session. Every request first takes a token
+    from the rate limiter of its API token and is retried with exponential backoff and jitter
+    when the upstream answers with a retryable status or the connection fails. A Retry-After
+    header takes precedence over the backoff. Non idempotent requests are only retried when
+    the upstream rejected them (429) or the connection could not be made. Retry policies are
+    looked up per endpoint, the number of retries is set on the response as gdh_retries.
+    Requests without a timeout get the default timeout. Every attempt is recorded by the
+    circuit breaker, while it is open a 503 response is returned without sending anything.
+    """
+
+    def __init__(
+        self,
+        token_hash: str,
+        endpoint_name: Callable[[str], str],
+        rate: float,
+        burst: float,
+        default_policy: RetryPolicy = None,
+        endpoint_policies: Dict[str, RetryPolicy] = None,
+        circuit_breaker: CircuitBreaker = None,
+        timeout: Union[float, Tuple[float, float]] = None,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.endpoint_name = endpoint_name
+        self.bucket = get_token_bucket(token_hash=token_hash, rate=rate, capacity=burst)
+        self.default_policy = default_policy if default_policy else RetryPolicy()
+        self.endpoint_policies = endpoint_policies if endpoint_policies else {}
+        self.circuit_breaker = circuit_breaker
+        self.timeout = timeout
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        endpoint = self.endpoint_name(request.url)
+        policy = self.endpoint_policies.get(endpoint, self.default_policy)
+        is_idempotent = request.method in IDEMPOTENT_METHODS
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        attempt = 0
+        while True:
+            if (
+                self.circuit_breaker is not None
+                and not self.circuit_breaker.allow_request()
+            ):
+                response = circuit_open_response(
+                    request, self.circuit_breaker.retry_after()
+                )
+                response.gdh_retries = attempt
+                return response
+            if policy.rate_limited:
+                self.bucket.acquire()
+            started_at = time.monotonic()
+            # Errors not handled below e.g. SSL or chunked encoding errors are failures too,
+            # every attempt is recorded so that a half open probe always gets its result
+            failed = True
+            try:
+                response = super().send(request, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                retryable = is_idempotent or connection_not_made(e)
+                if not retryable or attempt >= policy.max_retries:
+                    raise
+                delay = policy.backoff(attempt)
+                logger.info(
+                    f"Geodesignhub {endpoint} connection failed ({e}), retry {attempt + 1} in {delay:.2f}s"
+                )
+            else:
+                failed = response.status_code >= 500
+                retryable = response.status_code in policy.retry_statuses and (
+                    is_idempotent or response.status_code in RETRY_SAFE_FOR_ALL_METHODS
+                )
+                if not retryable or attempt >= policy.max_retries:
+                    response.gdh_retries = attempt
+                    return response
+                delay = min(
+                    retry_after_seconds(response) or policy.backoff(attempt),
+                    policy.backoff_max,
+                )
+                logger.info(
+                    f"Geodesignhub {endpoint} returned {response.status_code}, retry {attempt + 1} in {delay:.2f}s"
+                )
+                response.close()
+            finally:
+                self._record(failed=failed, started_at=started_at)
+            time.sleep(delay)
+            attempt += 1
+
+    def _record(self, failed: bool, started_at: float):
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record(
+                failed=failed, elapsed=time.monotonic() - started_at
+            )
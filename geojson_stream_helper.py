@@ -0,0 +1,100 @@
+import codecs
+import json
+import re
+from typing import Any, Iterable, Iterator
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DECODER = json.JSONDecoder()
+
+
+class _StreamBuffer:
+    """Holds the part of a streamed JSON document that has been read but not yet decoded"""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._utf8_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, min_chars: int = 1) -> bool:
+        """Reads chunks until at least min_chars more characters are buffered, returns False at the end of the stream"""
+        # Drop what has already been decoded
+        self.text = self.text[self.pos :]
+        self.pos = 0
+        target_length = len(self.text) + min_chars
+        read_any = False
+        while len(self.text) < target_length:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self.text += self._utf8_decoder.decode(b"", final=True)
+                self.eof = True
+                return read_any
+            self.text += self._utf8_decoder.decode(chunk)
+            read_any = True
+        return True
+
+    def peek(self) -> str:
+        """Returns the next character that is not whitespace, or an empty string at the end of the stream"""
+        while True:
+            self.pos = _WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self.text, self.pos)
+        self.pos += 1
+
+    def decode_value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.text, self.pos)
+                # A value that ends with the buffer could be a truncated number
+                if end < len(self.text) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Grow the buffer geometrically so a large value is not re-parsed for every chunk
+            self.fill(min_chars=max(len(self.text) - self.pos, 1))
+
+
+def iter_feature_collection_features(chunks: Iterable[bytes]) -> Iterator[dict]:
+    """
+    Decodes a GeoJSON FeatureCollection incrementally from a stream of byte chunks and yields
+    its features one at a time, only the feature being decoded is held in memory. Other
+    members of the collection are decoded and skipped.
+    """
+    buffer = _StreamBuffer(chunks)
+    buffer.expect("{")
+    if buffer.peek() == "}":
+        return
+
+    while True:
+        key = buffer.decode_value()
+        buffer.expect(":")
+        if key == "features":
+            buffer.expect("[")
+            if buffer.peek() == "]":
+                buffer.pos += 1
+            else:
+                while True:
+                    yield buffer.decode_value()
+                    if buffer.peek() == ",":
+                        buffer.pos += 1
+                        continue
+                    buffer.expect("]")
+                    break
+        else:
+            buffer.decode_value()
+
+        if buffer.peek() == ",":
+            buffer.pos += 1
+            continue
+        buffer.expect("}")
+        return
@@ -0,0 +1,176 @@
+import json
+import logging
+from dataclasses import fields, is_dataclass
+from numbers import Real
+from typing import Any, Union
+
+import numpy as np
+import shapely
+from shapely.geometry import mapping
+from shapely.geometry.base import BaseGeometry
+
+import config
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger("esri-gdh-bridge")
+
+# Separators without whitespace, the output is stored and uploaded, not read
+COMPACT_SEPARATORS = (",", ":")
+MAX_COORDINATE_PRECISION = 15
+JSON_BACKENDS = ("auto", "stdlib", "orjson")
+
+
+def quantize_coordinates(coordinates, precision: int):
+    """Rounds every number in a (nested) GeoJSON coordinates array to precision decimals"""
+    if isinstance(coordinates, (list, tuple)):
+        return [quantize_coordinates(c, precision) for c in coordinates]
+    if isinstance(coordinates, Real) and not isinstance(coordinates, bool):
+        return round(coordinates, precision)
+    return coordinates
+
+
+def _tuples_to_lists(coordinates):
+    if isinstance(coordinates, (list, tuple)):
+        return [_tuples_to_lists(c) for c in coordinates]
+    return coordinates
+
+
+def geometries_to_mappings(geometries, precision: int = None) -> list:
+    """
+    Converts Shapely geometries to GeoJSON geometry dicts without a JSON string in between.
+    When a precision is given all coordinates are rounded in one vectorized pass first.
+    """
+    geometries = np.asarray(geometries, dtype=object)
+    if precision is not None:
+        geometries = shapely.transform(
+            geometries, lambda coordinates: np.round(coordinates, precision)
+        )
+    geometry_mappings = []
+    for geometry in geometries.tolist():
+        geometry_mapping = mapping(geometry)
+        if "coordinates" in geometry_mapping:
+            geometry_mapping["coordinates"] = _tuples_to_lists(
+                geometry_mapping["coordinates"]
+            )
+        else:
+            geometry_mapping["geometries"] = geometries_to_mappings(
+                list(geometry.geoms)
+            )
+        geometry_mappings.append(geometry_mapping)
+    return geometry_mappings
+
+
+def to_jsonable(obj: Any, precision: int = None) -> Any:
+    """
+    Converts obj to plain dicts and lists that any JSON backend can serialize: Shapely
+    geometries become GeoJSON geometries and dataclasses are read field by field instead of
+    being deep copied by asdict. With a precision the coordinates are rounded on the way.
+    """
+    if isinstance(obj, BaseGeometry):
+        return geometries_to_mappings([obj], precision=precision)[0]
+    if isinstance(obj, dict):
+        converted = {}
+        for key, value in obj.items():
+            if key == "coordinates" and precision is not None:
+                converted[key] = quantize_coordinates(value, precision)
+            else:
+                converted[key] = to_jsonable(value, precision)
+        return converted
+    if isinstance(obj, (list, tuple)):
+        if obj and all(isinstance(value, BaseGeometry) for value in obj):
+            return geometries_to_mappings(obj, precision=precision)
+        return [to_jsonable(value, precision) for value in obj]
+    if is_dataclass(obj) and not isinstance(obj, type):
+        return {
+            field.name: to_jsonable(getattr(obj, field.name), precision)
+            for field in fields(obj)
+        }
+    return obj
+
+
+def _default(obj):
+    if isinstance(obj, BaseGeometry) or (
+        is_dataclass(obj) and not isinstance(obj, type)
+    ):
+        return to_jsonable(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _stdlib_dumps(obj: Any) -> str:
+    return json.dumps(obj, separators=COMPACT_SEPARATORS, default=_default)
+
+
+def _orjson_dumps(obj: Any) -> str:
+    return orjson.dumps(
+        obj,
+        default=_default,
+        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+    ).decode("utf-8")
+
+
+_dumps = _stdlib_dumps
+_loads = json.loads
+_backend_name = "stdlib"
+
+
+def set_json_backend(name: str) -> str:
+    """
+    Selects the library behind dumps_json and loads_json: stdlib, orjson or auto, which picks
+    orjson when it is installed. Falls back to stdlib when orjson is not installed, returns
+    the name of the backend in use.
+    """
+    global _dumps, _loads, _backend_name
+    if name not in JSON_BACKENDS:
+        logger.warning(f"Unknown JSON backend {name}, using the standard library")
+        name = "stdlib"
+    if name in ("auto", "orjson") and orjson is None:
+        if name == "orjson":
+            logger.warning("orjson is not installed, using the standard library")
+        name = "stdlib"
+    if name == "auto":
+        name = "orjson"
+
+    if name == "orjson":
+        _dumps, _loads = _orjson_dumps, orjson.loads
+    else:
+        _dumps, _loads = _stdlib_dumps, json.loads
+    _backend_name = name
+    return name
+
+
+def json_backend() -> str:
+    return _backend_name
+
+
+def dumps_json(obj: Any) -> str:
+    """Serializes compactly with the selected backend, Shapely geometries and dataclasses included"""
+    return _dumps(obj)
+
+
+def loads_json(s: Union[str, bytes]) -> Any:
+    return _loads(s)
+
+
+def dumps_geojson(obj: Any, precision: int = None) -> str:
+    """Serializes compactly, with the coordinates rounded when a precision is given"""
+    if precision is not None:
+        obj = to_jsonable(obj, precision)
+    return dumps_json(obj)
+
+
+def parse_precision(value, default: int) -> int:
+    """Reads a requested number of decimals, values that are missing or out of range give the default"""
+    try:
+        precision = int(value)
+    except (TypeError, ValueError):
+        return default
+    if 0 <= precision <= MAX_COORDINATE_PRECISION:
+        return precision
+    return default
+
+
+set_json_backend(config.external_api_settings["JSON_BACKEND"])
@@ -1,5 +1,8 @@
 import logging
 
+from gdh_metrics_helper import export_metrics
+from progress_helper import PROGRESS_EVENT_JOB, publish_progress
+
 logger = logging.getLogger("esri-gdh-bridge")
 
 
@@ -8,11 +11,15 @@ def notify_agol_submission_success(job, connection, result, *args, **kwargs):
 
     job_id = job.id + ":gdh_to_agol_export"
     logger.info("Job with %s completed successfully.." % job_id)
+    export_metrics(connection)
+    publish_progress(connection, job.id, PROGRESS_EVENT_JOB, {"status": "finished"})
 
 
 def notify_agol_submission_failure(job, connection, type, value, traceback):
     job_id = job.id + ":gdh_to_agol_export"
     logger.info("Job with %s failed.." % job_id)
+    export_metrics(connection)
+    publish_progress(connection, job.id, PROGRESS_EVENT_JOB, {"status": "failed"})
 
 
 def notify_gdh_submission_success(job, connection, result, *args, **kwargs):
@@ -20,8 +27,12 @@ def notify_gdh_submission_success(job, connection, result, *args, **kwargs):
 
     job_id = job.id + ":agol_to_gdh_import"
     logger.info("Job with %s completed successfully.." % job_id)
+    export_metrics(connection)
+    publish_progress(connection, job.id, PROGRESS_EVENT_JOB, {"status": "finished"})
 
 
 def notify_gdh_submission_failure(job, connection, type, value, traceback):
     job_id = job.id + ":agol_to_gdh_import"
     logger.info("Job with %s failed.." % job_id)
+    export_metrics(connection)
+    publish_progress(connection, job.id, PROGRESS_EVENT_JOB, {"status": "failed"})
@@ -0,0 +1,37 @@
+import logging
+from typing import Any
+
+import redis
+
+from json_serialization_helper import dumps_json
+
+logger = logging.getLogger("esri-gdh-bridge")
+
+PROGRESS_CHANNEL_PREFIX = "gdh_progress"
+
+# Events published per session: log lines of a job, the export status when it is stored
+# and the end of the job, after which the progress stream is closed
+PROGRESS_EVENT_LOG = "log"
+PROGRESS_EVENT_STATUS = "status"
+PROGRESS_EVENT_JOB = "job"
+
+
+def progress_channel(session_id: str) -> str:
+    return f"{PROGRESS_CHANNEL_PREFIX}:{session_id}"
+
+
+def publish_progress(
+    redis_instance: redis.Redis, session_id: str, event: str, data: Any
+):
+    """
+    Publishes a progress event of a session to the Redis channel the progress stream
+    server listens on. Nothing is stored, an event published while no page is open is
+    dropped, the pages read what they missed from get_task_debug_info when they connect.
+    A failed publish is logged and never fails the job.
+    """
+    try:
+        redis_instance.publish(
+            progress_channel(session_id), dumps_json({"event": event, "data": data})
+        )
+    except redis.RedisError as e:
+        logger.warning(f"Could not publish {event} progress of {session_id}: {e}")
@@ -0,0 +1,204 @@
+"""
+Streams the progress of export and import jobs to the status pages as Server-Sent Events.
+
+The server runs in its own process next to the Flask app, a stream is an open connection
+that costs a queue and a coroutine, so one event loop holds thousands of them where every
+open stream would take a gunicorn thread. All streams share one Redis connection that
+subscribes to the progress channels of every session, see progress_helper for the events.
+
+    python progress_stream.py --port 8090
+
+GET /progress/<session_id> streams the events of a session until its job ends.
+"""
+
+import argparse
+import asyncio
+import logging
+import re
+from typing import Dict, Set
+from urllib.parse import urlsplit
+
+import redis
+
+import config
+from conn import get_async_redis
+from json_serialization_helper import dumps_json, loads_json
+from progress_helper import PROGRESS_CHANNEL_PREFIX, PROGRESS_EVENT_JOB
+
+logger = logging.getLogger("esri-gdh-bridge")
+
+STREAM_PATH = re.compile(r"^/progress/([A-Za-z0-9_-]{1,64})$")
+# Events kept per stream for a client that reads slower than they are published
+STREAM_QUEUE_SIZE = 256
+# Seconds before the subscription is made again after the Redis connection failed
+RESUBSCRIBE_DELAY = 2
+# Milliseconds the browser waits before it opens a dropped stream again
+CLIENT_RETRY = 3000
+
+
+class ProgressBroker:
+    """
+    Fans the progress events published on Redis out to the open streams of their session.
+    The broker subscribes to the channels of all sessions once, the streams register a
+    queue for their session and receive the events published after they registered.
+    """
+
+    def __init__(self, redis_instance: redis.asyncio.Redis):
+        self.redis_instance = redis_instance
+        self.queues: Dict[str, Set[asyncio.Queue]] = {}
+
+    def register(self, session_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        self.queues.setdefault(session_id, set()).add(queue)
+        return queue
+
+    def unregister(self, session_id: str, queue: asyncio.Queue):
+        queues = self.queues.get(session_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self.queues[session_id]
+
+    def dispatch(self, session_id: str, message: dict):
+        for queue in self.queues.get(session_id, ()):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                logger.warning(f"Progress stream of {session_id} is behind, event dropped")
+
+    async def run(self):
+        while True:
+            pubsub = self.redis_instance.pubsub()
+            try:
+                await pubsub.psubscribe(f"{PROGRESS_CHANNEL_PREFIX}:*")
+                async for message in pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    session_id = message["channel"].decode("utf-8").split(":", 1)[1]
+                    if session_id in self.queues:
+                        self.dispatch(session_id, loads_json(message["data"]))
+            except redis.RedisError as e:
+                logger.warning(f"Progress subscription failed, subscribing again: {e}")
+                await asyncio.sleep(RESUBSCRIBE_DELAY)
+            finally:
+                await pubsub.aclose()
+
+
+def sse_event(event: str, data) -> bytes:
+    return f"event: {event}\ndata: {dumps_json(data)}\n\n".encode("utf-8")
+
+
+def http_head(status: str, content_type: str) -> bytes:
+    headers = [
+        f"HTTP/1.1 {status}",
+        f"Content-Type: {content_type}",
+        "Cache-Control: no-cache",
+        # The pages are served by the Flask app on another port, the session ID is the secret
+        "Access-Control-Allow-Origin: *",
+        "X-Accel-Buffering: no",
+        # The response ends when the connection is closed, there is no content length
+        "Connection: close",
+    ]
+    return ("\r\n".join(headers) + "\r\n\r\n").encode("utf-8")
+
+
+class ProgressStreamServer:
+    def __init__(self, broker: ProgressBroker, keepalive: float):
+        self.broker = broker
+        self.keepalive = keepalive
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                request_line = await asyncio.wait_for(reader.readline(), timeout=10)
+                # The headers are read and ignored, EventSource sends nothing the stream
+                # needs
+                while (await asyncio.wait_for(reader.readline(), timeout=10)) not in (
+                    b"\r\n",
+                    b"\n",
+                    b"",
+                ):
+                    pass
+            except (ValueError, asyncio.LimitOverrunError):
+                # A line longer than the limit of the stream reader, 64 KiB
+                writer.write(http_head("400 Bad Request", "text/plain"))
+                return
+            parts = request_line.decode("latin-1").split()
+            if len(parts) != 3 or parts[0] != "GET":
+                writer.write(http_head("405 Method Not Allowed", "text/plain"))
+                return
+            path = urlsplit(parts[1]).path
+            match = STREAM_PATH.match(path)
+            if match is None:
+                writer.write(http_head("404 Not Found", "text/plain"))
+                return
+            await self.stream(match.group(1), writer)
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def stream(self, session_id: str, writer: asyncio.StreamWriter):
+        # Registered before the response starts so nothing published after the page
+        # fetched the current state is missed
+        queue = self.broker.register(session_id)
+        try:
+            writer.write(http_head("200 OK", "text/event-stream; charset=utf-8"))
+            writer.write(f"retry: {CLIENT_RETRY}\n\n".encode("utf-8"))
+            await writer.drain()
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), self.keepalive)
+                except asyncio.TimeoutError:
+                    # A comment keeps proxies from closing an idle stream
+                    writer.write(b": keepalive\n\n")
+                else:
+                    writer.write(sse_event(message["event"], message["data"]))
+                    if message["event"] == PROGRESS_EVENT_JOB:
+                        await writer.drain()
+                        return
+                await writer.drain()
+        finally:
+            self.broker.unregister(session_id, queue)
+
+
+async def serve(host: str, port: int, keepalive: float):
+    broker = ProgressBroker(get_async_redis())
+    stream_server = ProgressStreamServer(broker, keepalive=keepalive)
+    server = await asyncio.start_server(stream_server.handle, host, port)
+    logger.info(f"Streaming job progress on http://{host}:{port}/progress/")
+    async with server:
+        await asyncio.gather(server.serve_forever(), broker.run())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Stream the progress of export and import jobs as Server-Sent Events"
+    )
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=config.external_api_settings["PROGRESS_STREAM_PORT"],
+    )
+    parser.add_argument(
+        "--keepalive",
+        type=float,
+        default=config.external_api_settings["PROGRESS_STREAM_KEEPALIVE"],
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(serve(args.host, args.port, args.keepalive))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple
+
+import redis
+
+import config
+from conn import get_redis
+from data_definitions import (
+    ErrorResponse,
+    GeodesignhubProjectBounds,
+    GeodesignhubProjectCenter,
+    GeodesignhubProjectDetails,
+    GeodesignhubSystem,
+)
+from json_serialization_helper import dumps_json, loads_json
+
+logger = logging.getLogger("esri-gdh-bridge")
+
+PROJECT_METADATA_KEY_PREFIX = "gdh_project_metadata"
+# The version counter outlives the entries it versions
+PROJECT_METADATA_VERSION_TTL = 30 * 24 * 3600
+
+# Rebuilds the typed value of each kind of metadata from its stored JSON
+PROJECT_METADATA_DECODERS: Dict[str, Callable[[Any], Any]] = {
+    "systems": lambda systems: [GeodesignhubSystem(**s) for s in systems],
+    "tags": lambda tags: tags,
+    "project_details": lambda d: GeodesignhubProjectDetails(**d),
+    "bounds": lambda b: GeodesignhubProjectBounds(**b),
+    "center": lambda c: GeodesignhubProjectCenter(**c),
+}
+
+
+class ProjectMetadataCache:
+    """
+    Caches the systems, tags, details, bounds and center of a project as parsed values so
+    that the web and worker processes download and parse them once per TTL. Entries are
+    stored in a Redis hash per project, API token hash and project version, invalidating a
+    project increments its version so the entries of every token are dropped at once.
+    Each process keeps the typed values it has read in a small memo that is valid as long
+    as the project version is unchanged and the entry has not expired, a read is then a
+    single GET of the version instead of a JSON decode. Errors are never cached.
+    """
+
+    def __init__(
+        self,
+        redis_instance: redis.Redis,
+        ttls: Dict[str, int],
+        memo_size: int = 256,
+    ):
+        self.redis_instance = redis_instance
+        self.ttls = ttls
+        self.memo_size = memo_size
+        self._memo: "OrderedDict[Tuple[str, str, str], Tuple[int, float, Any]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def version_key(self, project_id: str) -> str:
+        return f"{PROJECT_METADATA_KEY_PREFIX}:{project_id}:version"
+
+    def entries_key(self, project_id: str, token_hash: str, version: int) -> str:
+        return f"{PROJECT_METADATA_KEY_PREFIX}:{project_id}:{token_hash}:v{version}"
+
+    def get(self, project_id: str, token_hash: str, kind: str, load: Callable[[], Any]):
+        """Returns the cached value of kind, load is called on a miss and its result stored unless it is an ErrorResponse"""
+        ttl = self.ttls.get(kind)
+        if not ttl:
+            return load()
+
+        try:
+            version = int(self.redis_instance.get(self.version_key(project_id)) or 0)
+        except redis.RedisError as e:
+            logger.warning(f"Project metadata cache unavailable, loading {kind}: {e}")
+            return load()
+
+        memo_key = (project_id, token_hash, kind)
+        now = time.time()
+        with self._lock:
+            memoized = self._memo.get(memo_key)
+            if memoized is not None and memoized[0] == version and memoized[1] > now:
+                self._memo.move_to_end(memo_key)
+                return self._copy(memoized[2])
+
+        key = self.entries_key(project_id, token_hash, version)
+        try:
+            stored, expires_at = self.redis_instance.hmget(
+                key, kind, f"{kind}:expires_at"
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Project metadata cache unavailable, loading {kind}: {e}")
+            return load()
+
+        if stored is not None and float(expires_at) > now:
+            value = PROJECT_METADATA_DECODERS[kind](loads_json(stored))
+            self._memoize(memo_key, version, float(expires_at), value)
+            return self._copy(value)
+
+        value = load()
+        if isinstance(value, ErrorResponse):
+            return value
+        expires_at = now + ttl
+        try:
+            pipe = self.redis_instance.pipeline()
+            pipe.hset(
+                key,
+                mapping={kind: dumps_json(value), f"{kind}:expires_at": expires_at},
+            )
+            pipe.expire(key, max(self.ttls.values()))
+            pipe.expire(self.version_key(project_id), PROJECT_METADATA_VERSION_TTL)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Could not store project metadata in cache: {e}")
+            return value
+        self._memoize(memo_key, version, expires_at, value)
+        return self._copy(value)
+
+    def invalidate(self, project_id: str):
+        """Drops the metadata of a project for every token, in every process"""
+        self.redis_instance.incr(self.version_key(project_id))
+        self.redis_instance.expire(
+            self.version_key(project_id), PROJECT_METADATA_VERSION_TTL
+        )
+        with self._lock:
+            for memo_key in [k for k in self._memo if k[0] == project_id]:
+                del self._memo[memo_key]
+
+    def _memoize(self, memo_key: tuple, version: int, expires_at: float, value: Any):
+        with self._lock:
+            self._memo[memo_key] = (version, expires_at, value)
+            self._memo.move_to_end(memo_key)
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+
+    @staticmethod
+    def _copy(value: Any) -> Any:
+        # Callers may change the lists and dataclasses they get, the memo keeps its own
+        return copy.deepcopy(value)
+
+
+_project_metadata_cache = None
+_project_metadata_cache_lock = threading.Lock()
+
+
+def get_project_metadata_cache() -> ProjectMetadataCache:
+    """Returns the process wide project metadata cache, or None when it is disabled"""
+    global _project_metadata_cache
+    if not config.external_api_settings["GDH_PROJECT_METADATA_CACHE_ENABLED"]:
+        return None
+    with _project_metadata_cache_lock:
+        if _project_metadata_cache is None:
+            _project_metadata_cache = ProjectMetadataCache(
+                redis_instance=get_redis(),
+                ttls=config.external_api_settings["GDH_PROJECT_METADATA_TTLS"],
+            )
+        return _project_metadata_cache
@@ -0,0 +1,67 @@
+import re
+from typing import List, Tuple
+
+import redis
+
+import config
+
+SESSION_LOG_KEY_PREFIX = "session_log_stream"
+# A cursor is the ID of the last stream entry a client has read
+SESSION_LOG_CURSOR = re.compile(r"^\d+-\d+$")
+
+
+def session_log_key(session_id: str) -> str:
+    return f"{SESSION_LOG_KEY_PREFIX}:{session_id}"
+
+
+def is_session_log_cursor(cursor: str) -> bool:
+    return bool(SESSION_LOG_CURSOR.match(cursor))
+
+
+def append_session_log(
+    redis_instance: redis.Redis, session_id: str, message: str
+) -> str:
+    """
+    Appends a message to the log stream of a session and returns its entry ID, which is the
+    cursor of the message. A stream keeps about SESSION_LOG_MAX_ENTRIES messages, the
+    oldest are trimmed, and expires SESSION_LOG_TTL seconds after its last message.
+    """
+    key = session_log_key(session_id)
+    pipe = redis_instance.pipeline()
+    pipe.xadd(
+        key,
+        {"message": message},
+        maxlen=config.external_api_settings["SESSION_LOG_MAX_ENTRIES"],
+        approximate=True,
+    )
+    pipe.expire(key, config.external_api_settings["SESSION_LOG_TTL"])
+    entry_id, _ = pipe.execute()
+    return entry_id.decode("utf-8")
+
+
+def queue_session_log_read(
+    pipe: redis.client.Pipeline, session_id: str, since: str = ""
+):
+    """Adds the read of the messages after since to a pipeline, see parse_session_log_read"""
+    start = f"({since}" if since else "-"
+    pipe.xrange(session_log_key(session_id), min=start, max="+")
+
+
+def parse_session_log_read(entries: list, since: str = "") -> Tuple[List[str], str]:
+    if not entries:
+        return [], since
+    messages = [fields[b"message"].decode("utf-8") for _, fields in entries]
+    return messages, entries[-1][0].decode("utf-8")
+
+
+def read_session_logs(
+    redis_instance: redis.Redis, session_id: str, since: str = ""
+) -> Tuple[List[str], str]:
+    """
+    Returns the messages of a session logged after the since cursor, oldest first, and
+    the cursor to read the next messages from. Without a cursor all messages are returned.
+    """
+    pipe = redis_instance.pipeline(transaction=False)
+    queue_session_log_read(pipe, session_id, since=since)
+    (entries,) = pipe.execute()
+    return parse_session_log_read(entries, since=since)
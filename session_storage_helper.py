@@ -0,0 +1,134 @@
+import logging
+import zlib
+from typing import Any, Dict, Optional, Union
+
+import redis
+
+import config
+from json_serialization_helper import dumps_json, loads_json
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger("esri-gdh-bridge")
+
+SESSION_STORAGE_STATS_KEY = "session_storage:stats"
+# Values smaller than this are stored without compression
+COMPRESSION_THRESHOLD = 1024
+COMPRESSION_LEVEL = 3
+
+# The first byte of an encoded value says how the JSON after it is stored. Values written
+# before the codec start with the JSON itself and are read as is, the blobs written by the
+# first version of the blob store start with the zlib header.
+HEADER_JSON = b"\x01"
+HEADER_ZLIB = b"\x02"
+HEADER_ZSTD = b"\x03"
+ZLIB_STREAM_START = 0x78
+
+
+def _select_compression(name: str) -> str:
+    if name == "auto":
+        return "zstd" if zstandard is not None else "zlib"
+    if name == "zstd" and zstandard is None:
+        logger.warning("zstandard is not installed, values are compressed with zlib")
+        return "zlib"
+    if name not in ("zstd", "zlib", "none"):
+        logger.warning(f"Unknown session storage compression {name}, using zlib")
+        return "zlib"
+    return name
+
+
+compression = _select_compression(
+    config.external_api_settings["SESSION_STORAGE_COMPRESSION"]
+)
+
+
+def encode_serialized(serialized: bytes) -> bytes:
+    """Prefixes serialized JSON with the codec header, compressed when it is large enough"""
+    if compression == "none" or len(serialized) < COMPRESSION_THRESHOLD:
+        return HEADER_JSON + serialized
+    if compression == "zstd":
+        compressor = zstandard.ZstdCompressor(level=COMPRESSION_LEVEL)
+        return HEADER_ZSTD + compressor.compress(serialized)
+    return HEADER_ZLIB + zlib.compress(serialized, COMPRESSION_LEVEL)
+
+
+def encode_value(obj: Any) -> bytes:
+    """Encodes anything dumps_json serializes, dataclasses are read without an asdict copy"""
+    return encode_serialized(dumps_json(obj).encode("utf-8"))
+
+
+def decode_serialized(stored: bytes) -> bytes:
+    """Returns the JSON of an encoded value, values in the legacy formats included"""
+    header = stored[:1]
+    if header == HEADER_JSON:
+        return stored[1:]
+    if header == HEADER_ZLIB:
+        return zlib.decompress(stored[1:])
+    if header == HEADER_ZSTD:
+        if zstandard is None:
+            raise ValueError("The value is compressed with zstd, install zstandard")
+        return zstandard.ZstdDecompressor().decompress(stored[1:])
+    if stored and stored[0] == ZLIB_STREAM_START:
+        return zlib.decompress(stored)
+    return stored
+
+
+def decode_value(stored: bytes) -> Any:
+    return loads_json(decode_serialized(stored))
+
+
+def session_key_kind(key: str) -> str:
+    """The part of a session key after the session ID e.g. design for <session_id>_design"""
+    return key.rsplit("_", 1)[-1]
+
+
+class SessionStorage:
+    """
+    Stores the per session values of the web and worker processes e.g. <session_id>_design,
+    _tags and _status with the codec above. The raw and stored size of every write is
+    added to counters per kind of key so the memory used per export can be watched.
+    """
+
+    def __init__(self, redis_instance: redis.Redis):
+        self.redis_instance = redis_instance
+
+    def set(self, key: str, obj: Any, ex: int):
+        self.set_serialized(key, dumps_json(obj), ex=ex)
+
+    def set_serialized(self, key: str, serialized: Union[str, bytes], ex: int):
+        """Stores a value that is already serialized to JSON"""
+        if isinstance(serialized, str):
+            serialized = serialized.encode("utf-8")
+        encoded = encode_serialized(serialized)
+        pipe = self.redis_instance.pipeline()
+        pipe.set(key, encoded, ex=ex)
+        kind = session_key_kind(key)
+        pipe.hincrby(SESSION_STORAGE_STATS_KEY, f"{kind}:count", 1)
+        pipe.hincrby(SESSION_STORAGE_STATS_KEY, f"{kind}:raw_bytes", len(serialized))
+        pipe.hincrby(SESSION_STORAGE_STATS_KEY, f"{kind}:stored_bytes", len(encoded))
+        pipe.execute()
+
+    def get(self, key: str) -> Optional[Any]:
+        stored = self.redis_instance.get(key)
+        if stored is None:
+            return None
+        return decode_value(stored)
+
+    def getdel(self, key: str) -> Optional[Any]:
+        """Reads and deletes the value in one step, only one caller gets it"""
+        stored = self.redis_instance.getdel(key)
+        if stored is None:
+            return None
+        return decode_value(stored)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Returns the count, raw_bytes and stored_bytes counters per kind of key"""
+        stats: Dict[str, Dict[str, int]] = {}
+        stored_stats = self.redis_instance.hgetall(SESSION_STORAGE_STATS_KEY)
+        for field, value in stored_stats.items():
+            kind, counter = field.decode("utf-8").rsplit(":", 1)
+            stats.setdefault(kind, {})[counter] = int(value)
+        return stats
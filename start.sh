@@ -14,6 +14,10 @@ redis-server &
 echo "Starting Worker..."
 REDIS_URL=${REDIS_URL} python worker.py &
 
+# Start the progress stream server in the background, the status pages connect to it when PROGRESS_STREAM_URL is set
+echo "Starting Progress Stream..."
+REDIS_URL=${REDIS_URL} python progress_stream.py --port ${PROGRESS_STREAM_PORT:-8090} &
+
 # Start the Flask app in the foreground using Gunicorn
 echo "Starting Flask App..."
 gunicorn app:app --bind 0.0.0.0:${PORT} --workers 2 --threads 2 --timeout 120
@@ -0,0 +1,158 @@
+import unittest
+from unittest import mock
+
+from session_storage_helper import SessionStorage
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class AppTestCase(unittest.TestCase):
+    def setUp(self):
+        import app
+
+        self.app_module = app
+        self.redis_instance = fakeredis.FakeRedis()
+        self.session_storage = SessionStorage(self.redis_instance)
+        for name, value in (
+            ("r", self.redis_instance),
+            ("session_storage", self.session_storage),
+        ):
+            patcher = mock.patch.object(app, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = app.app.test_client()
+
+
+class TestGeodesignhubAPIMetricsRoute(AppTestCase):
+    def test_returns_process_metrics_and_cache_counters(self):
+        from gdh_metrics_helper import process_name, registry
+
+        registry.reset()
+        self.addCleanup(registry.reset)
+        registry.record("systems", "GET", 200, elapsed=0.2, size=100)
+        self.redis_instance.hincrby("gdh_api_cache:stats", "systems:hit", 3)
+
+        response = self.client.get("/gdh_api_metrics")
+        self.assertEqual(response.status_code, 200)
+        processes = {p["process"]: p for p in response.json["processes"]}
+        self.assertEqual(
+            processes[process_name()]["endpoints"]["GET systems"]["count"], 1
+        )
+        self.assertEqual(response.json["api_cache"], {"systems": {"hit": 3}})
+
+
+class TestImportProcessingResult(AppTestCase):
+    def test_reads_the_logs_after_the_cursor(self):
+        from session_log_helper import append_session_log
+
+        first = append_session_log(self.redis_instance, "s1", "Started")
+        last = append_session_log(self.redis_instance, "s1", "Done")
+        response = self.client.get(
+            "/get_gdh_import_processing_result",
+            query_string={"session_id": "s1", "since": first},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["messages"], ["Done"])
+        self.assertEqual(response.json["cursor"], last)
+
+    def test_rejects_an_invalid_cursor(self):
+        response = self.client.get(
+            "/get_gdh_import_processing_result",
+            query_string={"session_id": "s1", "since": "-"},
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class TestInvalidateProjectMetadata(AppTestCase):
+    def test_token_is_checked_with_geodesignhub_not_the_cache(self):
+        import GeodesignHub
+        from gdh_api_cache_helper import GeodesignhubAPICache, build_cached_response
+
+        def fetch(client, url, headers=None):
+            return build_cached_response(url, b"", status_code=401)
+
+        def cached(cache, client, url):
+            return build_cached_response(
+                url, b'{"id": "p1", "projecttitle": "P", "projectdesc": ""}'
+            )
+
+        with mock.patch.dict(
+            self.app_module.config.external_api_settings,
+            {"GDH_API_CACHE_ENABLED": True, "GDH_SINGLE_FLIGHT_ENABLED": False},
+        ), mock.patch.object(
+            GeodesignHub.GeodesignHubClient, "_fetch", autospec=True, side_effect=fetch
+        ) as _fetch, mock.patch.object(
+            GeodesignhubAPICache, "get", autospec=True, side_effect=cached
+        ), mock.patch.object(
+            GeodesignhubAPICache, "invalidate"
+        ) as invalidate:
+            response = self.client.post(
+                "/invalidate_project_metadata/",
+                data={"projectid": "p1", "apitoken": "revoked"},
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(_fetch.call_count, 1)
+        invalidate.assert_not_called()
+
+
+class TestProcessingResults(AppTestCase):
+    def post(self, body):
+        return self.client.post("/get_processing_results", json=body)
+
+    def test_returns_the_statuses_of_found_and_missing_sessions(self):
+        from session_log_helper import append_session_log
+
+        self.session_storage.set(
+            "s1_status",
+            {"status": 1, "messages": ["Done"], "success_url": "https://x"},
+            ex=60,
+        )
+        first = append_session_log(self.redis_instance, "s1", "Started")
+        last = append_session_log(self.redis_instance, "s1", "Done")
+
+        response = self.post(
+            {"session_ids": ["s1", "s2", "s1"], "cursors": {"s1": first}}
+        )
+        self.assertEqual(response.status_code, 200)
+        export_statuses = response.json["export_statuses"]
+        import_statuses = response.json["import_statuses"]
+        self.assertEqual(list(export_statuses), ["s1", "s2"])
+        self.assertEqual(export_statuses["s1"]["status"], 1)
+        self.assertEqual(export_statuses["s1"]["success_url"], "https://x")
+        # Sessions without a stored status are still in progress
+        self.assertEqual(export_statuses["s2"]["status"], 2)
+        self.assertEqual(import_statuses["s1"]["messages"], ["Done"])
+        self.assertEqual(import_statuses["s1"]["cursor"], last)
+        self.assertEqual(import_statuses["s2"]["messages"], [])
+
+    def test_rejects_too_many_session_ids(self):
+        with mock.patch.dict(
+            self.app_module.config.external_api_settings,
+            {"BATCH_STATUS_MAX_SESSION_IDS": 2},
+        ):
+            self.assertEqual(self.post({"session_ids": ["s1", "s2"]}).status_code, 200)
+            response = self.post({"session_ids": ["s1", "s2", "s3"]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json["code"], 400)
+
+    def test_rejects_invalid_input(self):
+        for body in (
+            None,
+            {},
+            {"session_ids": []},
+            {"session_ids": "s1"},
+            {"session_ids": ["s1", 2]},
+            {"session_ids": ["s1"], "cursors": ["0-1"]},
+            {"session_ids": ["s1"], "cursors": {"s1": "-"}},
+            {"session_ids": ["s1"], "cursors": {"s1": 1}},
+        ):
+            with self.subTest(body=body):
+                self.assertEqual(self.post(body).status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from unittest import mock
+
+import redis
+
+from blob_store_helper import BlobStore
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class TestBlobStore(unittest.TestCase):
+    def setUp(self):
+        self.redis_instance = fakeredis.FakeRedis()
+        self.blob_store = BlobStore(self.redis_instance, ttl=60)
+        self.systems = [{"id": 1, "name": "Energy", "color": "#ff0000"}]
+
+    def test_shared_blob_is_kept_until_the_last_release(self):
+        first = self.blob_store.put(self.systems)
+        second = self.blob_store.put(list(self.systems))
+        self.assertEqual(first, second)
+
+        self.blob_store.release(first)
+        self.assertEqual(self.blob_store.get(first), self.systems)
+        self.blob_store.release(second)
+        with self.assertRaises(KeyError):
+            self.blob_store.get(first)
+        self.assertFalse(self.redis_instance.exists(self.blob_store.refs_key(first)))
+
+    def test_put_while_the_last_reference_is_released(self):
+        blob_hash = self.blob_store.put(self.systems)
+        get = redis.client.Pipeline.get
+        calls = []
+
+        def put_during_release(pipe, name):
+            # Another job stores the same systems while the release watches the count
+            if not calls:
+                calls.append(name)
+                self.blob_store.put(self.systems)
+            return get(pipe, name)
+
+        with mock.patch.object(redis.client.Pipeline, "get", put_during_release):
+            self.blob_store.release(blob_hash)
+
+        self.assertEqual(self.blob_store.get(blob_hash), self.systems)
+        self.assertEqual(
+            int(self.redis_instance.get(self.blob_store.refs_key(blob_hash))), 1
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
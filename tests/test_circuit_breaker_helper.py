@@ -0,0 +1,150 @@
+import unittest
+from unittest import mock
+
+import requests
+
+import circuit_breaker_helper
+from circuit_breaker_helper import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    guarded_by,
+    is_upstream_failure,
+)
+from gdh_transport_helper import GeodesignhubTransportAdapter, RetryPolicy
+
+
+def failing(exception: BaseException):
+    def function():
+        raise exception
+
+    return function
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(
+            circuit_breaker_helper.time, "monotonic", side_effect=lambda: self.now
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(
+            name="test", window_seconds=60, min_requests=4, open_seconds=30
+        )
+
+    def trip(self):
+        for _ in range(4):
+            with self.assertRaises(requests.ConnectionError):
+                self.breaker.call(failing(requests.ConnectionError("refused")))
+
+    def test_closed_open_half_open_closed(self):
+        self.trip()
+        self.assertEqual(self.breaker.state, OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.call(lambda: 1)
+
+        self.now += 31
+        self.assertTrue(self.breaker.allow_request())
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        # Only one probe at a time
+        self.assertFalse(self.breaker.allow_request())
+        self.breaker.record(failed=False, elapsed=0.1)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_failed_probe_opens_again(self):
+        self.trip()
+        self.now += 31
+        with self.assertRaises(requests.ConnectionError):
+            self.breaker.call(failing(requests.ConnectionError("refused")))
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertEqual(self.breaker.trips, 2)
+
+    def test_probe_raising_an_unexpected_error_is_recorded(self):
+        self.trip()
+        self.now += 31
+        with self.assertRaises(KeyboardInterrupt):
+            self.breaker.call(failing(KeyboardInterrupt()))
+        self.assertEqual(self.breaker.state, OPEN)
+        self.now += 31
+        self.assertEqual(self.breaker.call(lambda: 1), 1)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_ignored_exceptions_do_not_count(self):
+        for _ in range(10):
+            with self.assertRaises(ValueError):
+                self.breaker.call(
+                    failing(ValueError("not found")), ignored_exceptions=(ValueError,)
+                )
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_bad_arcgis_token_does_not_trip_the_breaker(self):
+        for message in (
+            "Invalid token.\n(Error Code: 498)",
+            "You do not have permissions to access this resource or perform this operation.\n(Error Code: 403)",
+            "Token Required",
+        ):
+            for _ in range(10):
+                with self.assertRaises(Exception):
+                    self.breaker.call(
+                        failing(Exception(message)), is_failure=is_upstream_failure
+                    )
+        self.assertEqual(self.breaker.state, CLOSED)
+
+        # Outages still open it once the token errors left the window
+        self.now += 61
+        for _ in range(4):
+            with self.assertRaises(Exception):
+                self.breaker.call(
+                    failing(Exception("Service unavailable\n(Error Code: 503)")),
+                    is_failure=is_upstream_failure,
+                )
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_guarded_by_uses_upstream_failures(self):
+        breaker = CircuitBreaker(name="arcgis-test", min_requests=4)
+
+        @guarded_by("arcgis-test")
+        def create_gis_object():
+            raise Exception("Invalid token.\n(Error Code: 498)")
+
+        with mock.patch.object(
+            circuit_breaker_helper, "get_circuit_breaker", return_value=breaker
+        ):
+            for _ in range(10):
+                with self.assertRaises(Exception):
+                    create_gis_object()
+        self.assertEqual(breaker.state, CLOSED)
+
+
+class TestTransportAdapterRecordsEveryAttempt(unittest.TestCase):
+    def test_unexpected_send_error_releases_the_probe(self):
+        breaker = CircuitBreaker(name="gdh-test", min_requests=1, open_seconds=0)
+        breaker.record(failed=True, elapsed=0.1)
+        self.assertEqual(breaker.state, OPEN)
+
+        adapter = GeodesignhubTransportAdapter(
+            token_hash="test-probe",
+            endpoint_name=lambda url: "project",
+            rate=1000,
+            burst=1000,
+            default_policy=RetryPolicy(max_retries=0),
+            circuit_breaker=breaker,
+        )
+        request = requests.Request("GET", "https://example.com/api/v1/").prepare()
+        with mock.patch.object(
+            requests.adapters.HTTPAdapter,
+            "send",
+            side_effect=requests.exceptions.ChunkedEncodingError("broken"),
+        ):
+            with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+                adapter.send(request)
+        # The probe failed, the next one is let through instead of waiting forever
+        self.assertEqual(breaker.state, OPEN)
+        self.assertTrue(breaker.allow_request())
+
+
+if __name__ == "__main__":
+    unittest.main()
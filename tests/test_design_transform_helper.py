@@ -0,0 +1,155 @@
+import unittest
+from dataclasses import asdict
+
+import geojson
+from dacite import from_dict
+from geojson import Feature, LineString, Point, Polygon
+
+from data_definitions import GeodesignhubFeatureProperties
+from design_transform_helper import (
+    MULTIPART_EXPLODE,
+    route_features_to_layers,
+    transform_design_features,
+)
+from esri_fields_schema_helper import AGOLItemSchemaGenerator
+
+
+def gdh_properties(diagram_id: int) -> dict:
+    return {
+        "diagramid": diagram_id,
+        "areatype": "project",
+        "description": f"Diagram {diagram_id}",
+        "color": "#ff0000",
+        "tag_codes": "T1",
+        "notes": "Ünïcödé",
+        "start_date": "2024-01-01",
+        "end_date": "2030-01-01",
+        "grid_location": "B2",
+        "sysname": "Energy",
+        "ignored": True,
+    }
+
+
+class TestTransformDesignFeatures(unittest.TestCase):
+    def setUp(self):
+        self.geometries = [
+            {
+                "type": "Polygon",
+                "coordinates": [
+                    [[0.123456789, 1.5], [2, 3], [4.25, -5.0000005], [0.123456789, 1.5]]
+                ],
+            },
+            {"type": "LineString", "coordinates": [(1.1234567, 2.0, 10.5), (3, 4, 0)]},
+            {"type": "Point", "coordinates": [-73.98765432, 40.7]},
+        ]
+        self.design_feature_collection = {
+            "geojson": {
+                "type": "FeatureCollection",
+                "features": [
+                    {"type": "Feature", "geometry": g, "properties": gdh_properties(i)}
+                    for i, g in enumerate(self.geometries)
+                ],
+            }
+        }
+
+    def expected_features(self):
+        geometry_classes = {"Polygon": Polygon, "LineString": LineString, "Point": Point}
+        expected = []
+        for f in self.design_feature_collection["geojson"]["features"]:
+            geometry_class = geometry_classes.get(f["geometry"]["type"])
+            if geometry_class is None:
+                continue
+            p = f["properties"]
+            properties = from_dict(
+                data_class=GeodesignhubFeatureProperties,
+                data={
+                    "diagram_id": p["diagramid"],
+                    "project_or_policy": p["areatype"],
+                    "diagram_name": p["description"],
+                    "color": p["color"],
+                    "tag_codes": p["tag_codes"],
+                    "notes": p["notes"],
+                    "start_date": p["start_date"],
+                    "end_date": p["end_date"],
+                    "grid_location": p["grid_location"],
+                    "system_name": p["sysname"],
+                },
+            )
+            expected.append(
+                Feature(
+                    geometry=geometry_class(coordinates=f["geometry"]["coordinates"]),
+                    properties=asdict(properties),
+                )
+            )
+        return geojson.FeatureCollection(features=expected)
+
+    def test_matches_geojson_objects(self):
+        transformed = transform_design_features(self.design_feature_collection)
+        expected = self.expected_features()
+        self.assertIsInstance(transformed, geojson.FeatureCollection)
+        self.assertEqual(transformed, expected)
+        self.assertEqual(geojson.dumps(transformed), geojson.dumps(expected))
+
+    def test_multipart_geometries(self):
+        multipart_geometries = [
+            {
+                "type": "MultiPolygon",
+                "coordinates": [
+                    [[[0, 0], [1, 0], [0, 1], [0, 0]]],
+                    [[[5, 5], [6, 5], [5, 6.1234567], [5, 5]]],
+                ],
+            },
+            {"type": "MultiLineString", "coordinates": [[[0, 0], [1, 1]], [[2, 2], [3, 3]]]},
+            {"type": "MultiPoint", "coordinates": [[0, 0], [1, 1]]},
+            {"type": "GeometryCollection", "geometries": []},
+        ]
+        design_feature_collection = {
+            "geojson": {
+                "type": "FeatureCollection",
+                "features": [
+                    {"type": "Feature", "geometry": g, "properties": gdh_properties(i)}
+                    for i, g in enumerate(multipart_geometries)
+                ],
+            }
+        }
+
+        kept = transform_design_features(design_feature_collection)["features"]
+        self.assertEqual(
+            [f["geometry"]["type"] for f in kept],
+            ["MultiPolygon", "MultiLineString", "Point", "Point"],
+        )
+        self.assertEqual(
+            kept[0]["geometry"]["coordinates"][1][0][2], [5, 6.123457]
+        )
+
+        exploded = transform_design_features(
+            design_feature_collection, multipart_policy=MULTIPART_EXPLODE
+        )["features"]
+        self.assertEqual(
+            [(f["geometry"]["type"], f["properties"]["diagram_id"]) for f in exploded],
+            [
+                ("Polygon", 0),
+                ("Polygon", 0),
+                ("LineString", 1),
+                ("LineString", 1),
+                ("Point", 2),
+                ("Point", 2),
+            ],
+        )
+        self.assertIsNot(exploded[0]["properties"], exploded[1]["properties"])
+
+        publish_parameters = AGOLItemSchemaGenerator("design").publish_parameters
+        routed = route_features_to_layers(kept, publish_parameters)
+        self.assertEqual(
+            {name: len(features) for name, features in routed.items()},
+            {"design_polygons": 1, "design_points": 2, "design_lines": 1},
+        )
+
+    def test_missing_property_raises(self):
+        del self.design_feature_collection["geojson"]["features"][0]["properties"]["sysname"]
+        with self.assertRaises(KeyError):
+            transform_design_features(self.design_feature_collection)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import unittest
+from unittest import mock
+
+import GeodesignHub
+import gdh_api_cache_helper
+from gdh_api_cache_helper import GeodesignhubAPICache, build_cached_response
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+SERVICE_URL = "https://example.com/api/v1/"
+SYSTEMS_URL = SERVICE_URL + "projects/p1/systems/"
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class TestGeodesignhubAPICache(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(
+            gdh_api_cache_helper.time, "time", side_effect=lambda: self.now
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.redis_instance = fakeredis.FakeRedis()
+        self.cache = GeodesignhubAPICache(
+            self.redis_instance, endpoint_ttls={"systems": 60}
+        )
+        self.client = self.make_client("token-1")
+        self.responses = []
+
+    def make_client(self, token: str) -> GeodesignHub.GeodesignHubClient:
+        client = GeodesignHub.GeodesignHubClient(
+            token=token, url=SERVICE_URL, project_id="p1"
+        )
+        client._fetch = mock.Mock(
+            side_effect=lambda url, headers=None: self.responses.pop(0)
+        )
+        return client
+
+    def respond(self, content: bytes, status_code: int = 200, etag: str = ""):
+        self.responses.append(
+            build_cached_response(
+                SYSTEMS_URL,
+                content,
+                status_code=status_code,
+                headers={"ETag": etag} if etag else None,
+            )
+        )
+
+    def get(self, client: GeodesignHub.GeodesignHubClient = None):
+        return self.cache.get(client or self.client, SYSTEMS_URL)
+
+    def test_fresh_entries_are_served_from_the_cache(self):
+        self.respond(b'[{"id": 1}]')
+        self.assertEqual(self.get().json(), [{"id": 1}])
+        self.assertEqual(self.get().json(), [{"id": 1}])
+        self.assertEqual(self.client._fetch.call_count, 1)
+        self.assertEqual(self.cache.stats(), {"systems": {"miss": 1, "hit": 1}})
+
+    def test_expired_entry_without_etag_is_downloaded_again(self):
+        self.respond(b'[{"id": 1}]')
+        self.get()
+        self.now += 61
+        self.respond(b'[{"id": 2}]')
+        self.assertEqual(self.get().json(), [{"id": 2}])
+        self.assertEqual(self.client._fetch.call_args.kwargs["headers"], None)
+
+    def test_expired_entry_is_revalidated_with_its_etag(self):
+        self.respond(b'[{"id": 1}]', etag='"v1"')
+        self.get()
+        self.now += 61
+        self.respond(b"", status_code=304)
+        r = self.get()
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json(), [{"id": 1}])
+        self.assertEqual(
+            self.client._fetch.call_args.kwargs["headers"], {"If-None-Match": '"v1"'}
+        )
+        # Revalidation makes the entry fresh again
+        self.assertEqual(self.get().json(), [{"id": 1}])
+        self.assertEqual(self.client._fetch.call_count, 2)
+        self.assertEqual(self.cache.stats()["systems"]["revalidated"], 1)
+
+    def test_stale_entry_is_served_when_geodesignhub_fails(self):
+        self.respond(b'[{"id": 1}]', etag='"v1"')
+        self.get()
+        self.now += 61
+        self.respond(b"", status_code=503)
+        r = self.get()
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json(), [{"id": 1}])
+        self.assertEqual(self.cache.stats()["systems"]["stale"], 1)
+
+    def test_errors_are_not_cached(self):
+        self.respond(b"", status_code=404)
+        self.assertEqual(self.get().status_code, 404)
+        self.respond(b'[{"id": 1}]')
+        self.assertEqual(self.get().status_code, 200)
+
+    def test_entries_are_kept_per_token(self):
+        other_client = self.make_client("token-2")
+        self.respond(b'[{"id": 1}]')
+        self.get()
+        self.respond(b"", status_code=401)
+        self.assertEqual(self.get(other_client).status_code, 401)
+
+    def test_invalidate_drops_the_entries_of_every_token(self):
+        other_client = self.make_client("token-2")
+        self.respond(b'[{"id": 1}]')
+        self.get()
+        self.respond(b'[{"id": 1}]')
+        self.get(other_client)
+
+        self.cache.invalidate("p1")
+        self.respond(b'[{"id": 2}]')
+        self.assertEqual(self.get().json(), [{"id": 2}])
+        self.respond(b'[{"id": 2}]')
+        self.assertEqual(self.get(other_client).json(), [{"id": 2}])
+
+    def test_endpoints_without_ttl_are_not_cached(self):
+        url = SERVICE_URL + "projects/p1/"
+        for _ in range(2):
+            self.respond(b"{}")
+            self.cache.get(self.client, url)
+        self.assertEqual(self.client._fetch.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import io
+import unittest
+from unittest import mock
+
+import requests
+
+import gdh_downloads_helper
+from gdh_downloads_helper import GeodesignhubDataDownloader
+
+
+def change_id_response(content: bytes, status_code: int = 200) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = content
+    return response
+
+
+class TestDownloadDiagramChangeIds(unittest.TestCase):
+    def setUp(self):
+        self.downloader = GeodesignhubDataDownloader(
+            session_id="test", project_id="p1", apitoken="token", max_concurrency=2
+        )
+
+    def download(self, responses: dict) -> dict:
+        def get_diagram_changeid(diagid: int):
+            response = responses[diagid]
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        with mock.patch.object(
+            self.downloader.api_helper,
+            "get_diagram_changeid",
+            side_effect=get_diagram_changeid,
+        ):
+            return self.downloader.download_diagram_change_ids(
+                diagram_ids=list(responses)
+            )
+
+    def test_reads_change_ids(self):
+        change_ids = self.download(
+            {
+                1: change_id_response(b'"a1"'),
+                2: change_id_response(b'{"changeid": "b2"}'),
+            }
+        )
+        self.assertEqual(change_ids, {"1": "a1", "2": "b2"})
+
+    def test_failed_diagrams_are_left_out(self):
+        with mock.patch.object(gdh_downloads_helper.logger, "warning") as warning:
+            change_ids = self.download(
+                {
+                    1: change_id_response(b'"a1"'),
+                    2: requests.ConnectionError("refused"),
+                    3: change_id_response(b"<html>Maintenance</html>"),
+                    4: change_id_response(b"", status_code=404),
+                }
+            )
+        self.assertEqual(change_ids, {"1": "a1"})
+        self.assertEqual(warning.call_count, 2)
+
+
+class TestStreamDesignFeatures(unittest.TestCase):
+    def test_counts_the_bytes_of_the_design(self):
+        body = (
+            b'{"type": "FeatureCollection", "features": [{"type": "Feature", '
+            b'"geometry": {"type": "Point", "coordinates": [4.123456789012, 52.1]}, '
+            b'"properties": {}}]}'
+        )
+        response = requests.Response()
+        response.status_code = 200
+        response.raw = io.BytesIO(body)
+        downloader = GeodesignhubDataDownloader(
+            session_id="test",
+            project_id="p1",
+            apitoken="token",
+            cteam_id="1",
+            synthesis_id="s1",
+        )
+        with mock.patch.object(
+            downloader.api_helper, "get_single_synthesis", return_value=response
+        ):
+            design = downloader.download_design_data_from_geodesignhub(stream=True)
+        self.assertEqual(len(design["features"]), 1)
+        self.assertEqual(downloader.design_bytes_downloaded, len(body))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+from unittest import mock
+
+import requests
+
+import GeodesignHub
+from gdh_metrics_helper import (
+    METRICS_KEY_PREFIX,
+    collect_metrics,
+    export_metrics,
+    process_name,
+    registry,
+)
+from json_serialization_helper import dumps_json, loads_json
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+class TestGeodesignhubAPIMetrics(unittest.TestCase):
+    def setUp(self):
+        registry.reset()
+        registry.exported_at = 0.0
+        self.addCleanup(registry.reset)
+
+    def record_requests(self):
+        registry.record("systems", "GET", 200, elapsed=0.04, size=100)
+        registry.record("systems", "GET", 200, elapsed=0.3, size=300, retries=2)
+        registry.record("systems", "GET", 503, elapsed=45, size=0)
+        registry.record("diagrams/{id}", "POST", 201, elapsed=0.1, size=10)
+
+    def test_histogram_status_codes_and_retries(self):
+        self.record_requests()
+        endpoints = registry.snapshot()["endpoints"]
+        self.assertEqual(set(endpoints), {"GET systems", "POST diagrams/{id}"})
+
+        systems = endpoints["GET systems"]
+        self.assertEqual(systems["count"], 3)
+        self.assertEqual(systems["latency"]["buckets"]["0.05"], 1)
+        self.assertEqual(systems["latency"]["buckets"]["0.5"], 1)
+        self.assertEqual(systems["latency"]["buckets"]["+Inf"], 1)
+        self.assertEqual(sum(systems["latency"]["buckets"].values()), 3)
+        self.assertEqual(systems["latency"]["max"], 45)
+        self.assertEqual(systems["status_codes"], {"200": 2, "503": 1})
+        self.assertEqual(systems["bytes"], {"sum": 400, "max": 300})
+        self.assertEqual(systems["retries"], 2)
+        self.assertEqual(systems["retried_requests"], 1)
+        # A latency on a bucket bound is counted in that bucket
+        self.assertEqual(
+            endpoints["POST diagrams/{id}"]["latency"]["buckets"]["0.1"], 1
+        )
+
+    @unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+    def test_collect_metrics_of_all_processes(self):
+        redis_instance = fakeredis.FakeRedis()
+        other_process = {
+            "process": "worker:1",
+            "started_at": 0,
+            "updated_at": 1,
+            "endpoints": {},
+        }
+        redis_instance.set(f"{METRICS_KEY_PREFIX}:worker:1", dumps_json(other_process))
+        self.record_requests()
+        export_metrics(redis_instance)
+        stored = redis_instance.get(f"{METRICS_KEY_PREFIX}:{process_name()}")
+        self.assertIsNotNone(stored)
+
+        # The live snapshot replaces the exported one of this process
+        registry.record("systems", "GET", 200, elapsed=0.04, size=100)
+        collected = {s["process"]: s for s in collect_metrics(redis_instance)}
+        self.assertEqual(set(collected), {"worker:1", process_name()})
+        self.assertEqual(
+            collected[process_name()]["endpoints"]["GET systems"]["count"], 4
+        )
+
+    @unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+    def test_export_is_throttled(self):
+        redis_instance = fakeredis.FakeRedis()
+        self.record_requests()
+        export_metrics(redis_instance, min_interval=30)
+        registry.record("systems", "GET", 200, elapsed=0.04, size=100)
+        export_metrics(redis_instance, min_interval=30)
+        stored = loads_json(
+            redis_instance.get(f"{METRICS_KEY_PREFIX}:{process_name()}")
+        )
+        self.assertEqual(stored["endpoints"]["GET systems"]["count"], 3)
+
+
+class TestClientRecordsMetrics(unittest.TestCase):
+    def test_unreadable_response_is_logged(self):
+        metrics = mock.Mock()
+        client = GeodesignHub.GeodesignHubClient(
+            token="token", project_id="p1", metrics=metrics
+        )
+        response = requests.Response()
+        response.status_code = 200
+        response.url = client.sec_url + "projects/p1/systems/"
+        response.headers["Content-Length"] = "not a number"
+        with mock.patch.object(GeodesignHub.logger, "warning") as warning:
+            client._record_metrics(response, stream=True)
+        warning.assert_called_once()
+        metrics.record.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
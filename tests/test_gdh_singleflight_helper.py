@@ -0,0 +1,70 @@
+import hashlib
+import unittest
+
+from gdh_api_cache_helper import build_cached_response
+from gdh_singleflight_helper import SINGLE_FLIGHT_KEY_PREFIX, SingleFlight
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+KEY = "GET https://example.com/api/v1/projects/p1/systems/ token-hash "
+URL = "https://example.com/api/v1/projects/p1/systems/"
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class TestSingleFlightAcrossProcesses(unittest.TestCase):
+    def setUp(self):
+        self.redis_instance = fakeredis.FakeRedis()
+        self.key_hash = hashlib.sha1(KEY.encode("utf-8")).hexdigest()
+        self.lock_key = f"{SINGLE_FLIGHT_KEY_PREFIX}:lock:{self.key_hash}"
+        self.fetches = 0
+
+    def process(self) -> SingleFlight:
+        return SingleFlight(
+            redis_instance=self.redis_instance, lock_timeout=0.2, poll_interval=0.01
+        )
+
+    def fetch(self):
+        self.fetches += 1
+        return build_cached_response(
+            URL,
+            b'[{"id": 1}]',
+            headers={"ETag": f'"v{self.fetches}"', "Content-Encoding": "gzip"},
+        )
+
+    def test_later_callers_send_their_own_request(self):
+        first = self.process().do(KEY, self.fetch)
+        second = self.process().do(KEY, self.fetch)
+        self.assertEqual(self.fetches, 2)
+        self.assertEqual(first.headers["ETag"], '"v1"')
+        self.assertEqual(second.headers["ETag"], '"v2"')
+
+    def test_waiting_callers_get_the_result_with_its_headers(self):
+        # A leader in another process stores its result while the lock is held
+        self.redis_instance.set(self.lock_key, "leader")
+        leader = self.process()
+        leader._store_result(leader.result_key(self.key_hash, "leader"), self.fetch())
+
+        r = self.process().do(KEY, self.fetch)
+        self.assertEqual(self.fetches, 1)
+        self.assertEqual(r.json(), [{"id": 1}])
+        self.assertEqual(r.headers["ETag"], '"v1"')
+        self.assertNotIn("Content-Encoding", r.headers)
+
+    def test_result_of_an_earlier_leader_is_not_served(self):
+        earlier = self.process()
+        earlier._store_result(
+            earlier.result_key(self.key_hash, "earlier"), self.fetch()
+        )
+        # The current leader fails without a result, the follower sends its own request
+        self.redis_instance.set(self.lock_key, "leader", px=50)
+
+        r = self.process().do(KEY, self.fetch)
+        self.assertEqual(self.fetches, 2)
+        self.assertEqual(r.headers["ETag"], '"v2"')
+
+
+if __name__ == "__main__":
+    unittest.main()
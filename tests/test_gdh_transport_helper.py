@@ -0,0 +1,125 @@
+import io
+import unittest
+from unittest import mock
+
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+import gdh_transport_helper
+from gdh_transport_helper import (
+    GeodesignhubTransportAdapter,
+    RetryPolicy,
+    TokenBucket,
+    connection_not_made,
+)
+
+
+def make_response(status_code: int, headers: dict = None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response.raw = io.BytesIO(b"{}")
+    return response
+
+
+def refused_connection_error() -> requests.ConnectionError:
+    reason = NewConnectionError(None, "Failed to establish a new connection: refused")
+    return requests.ConnectionError(MaxRetryError(None, "/api/v1/", reason=reason))
+
+
+class TestGeodesignhubTransportAdapter(unittest.TestCase):
+    def setUp(self):
+        self.sleeps = []
+        patcher = mock.patch.object(
+            gdh_transport_helper.time, "sleep", side_effect=self.sleeps.append
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.adapter = GeodesignhubTransportAdapter(
+            token_hash="test-retries",
+            endpoint_name=lambda url: "project",
+            rate=1000,
+            burst=1000,
+            default_policy=RetryPolicy(max_retries=2, backoff_base=0.01),
+        )
+
+    def send(self, method: str, outcomes: list) -> requests.Response:
+        request = requests.Request(method, "https://example.com/api/v1/").prepare()
+        self.send_mock = mock.patch.object(
+            requests.adapters.HTTPAdapter, "send", side_effect=outcomes
+        ).start()
+        self.addCleanup(mock.patch.stopall)
+        return self.adapter.send(request)
+
+    def test_get_is_retried_on_retryable_statuses(self):
+        response = self.send("GET", [make_response(503), make_response(200)])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.gdh_retries, 1)
+
+    def test_retries_stop_at_max_retries(self):
+        response = self.send("GET", [make_response(502)] * 3)
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(response.gdh_retries, 2)
+        self.assertEqual(self.send_mock.call_count, 3)
+
+    def test_retry_after_takes_precedence_over_backoff(self):
+        self.send("GET", [make_response(429, {"Retry-After": "7"}), make_response(200)])
+        self.assertEqual(self.sleeps, [7.0])
+
+    def test_post_is_not_retried_after_it_was_processed(self):
+        response = self.send("POST", [make_response(503), make_response(201)])
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.send_mock.call_count, 1)
+
+    def test_post_is_retried_when_rejected(self):
+        response = self.send("POST", [make_response(429), make_response(201)])
+        self.assertEqual(response.status_code, 201)
+
+    def test_post_is_retried_when_the_connection_was_not_made(self):
+        response = self.send("POST", [refused_connection_error(), make_response(201)])
+        self.assertEqual(response.status_code, 201)
+        response = self.send(
+            "POST", [requests.ConnectTimeout("connect timeout"), make_response(201)]
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_post_is_not_retried_after_a_read_timeout(self):
+        with self.assertRaises(requests.ReadTimeout):
+            self.send(
+                "POST", [requests.ReadTimeout("read timeout"), make_response(201)]
+            )
+
+    def test_connection_not_made(self):
+        self.assertTrue(connection_not_made(refused_connection_error()))
+        self.assertTrue(connection_not_made(requests.ConnectTimeout()))
+        self.assertFalse(connection_not_made(requests.ReadTimeout()))
+        self.assertFalse(connection_not_made(requests.ConnectionError("reset")))
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_waits_for_tokens_once_the_burst_is_used(self):
+        now = [0.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+
+        with mock.patch.object(
+            gdh_transport_helper.time, "monotonic", side_effect=lambda: now[0]
+        ), mock.patch.object(gdh_transport_helper.time, "sleep", side_effect=sleep):
+            bucket = TokenBucket(rate=2, capacity=3)
+            for _ in range(3):
+                bucket.acquire()
+            self.assertEqual(sleeps, [])
+            bucket.acquire()
+            self.assertEqual(sleeps, [0.5])
+            # Refills up to the capacity only
+            now[0] += 100
+            for _ in range(3):
+                bucket.acquire()
+            self.assertEqual(sleeps, [0.5])
+
+
+if __name__ == "__main__":
+    unittest.main()
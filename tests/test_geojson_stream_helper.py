@@ -0,0 +1,69 @@
+import json
+import unittest
+
+from geojson_stream_helper import iter_feature_collection_features
+
+
+def chunked(document: str, size: int):
+    encoded = document.encode("utf-8")
+    return [encoded[i : i + size] for i in range(0, len(encoded), size)]
+
+
+class TestIterFeatureCollectionFeatures(unittest.TestCase):
+    def setUp(self):
+        self.features = [
+            {
+                "type": "Feature",
+                "geometry": {
+                    "type": "Polygon",
+                    "coordinates": [[[0.123456789, 1.5], [2, 3], [4.25, -5e-3], [0.123456789, 1.5]]],
+                },
+                "properties": {"description": "Ünïcödé diagram", "diagramid": i},
+            }
+            for i in range(5)
+        ]
+        self.feature_collection = {
+            "type": "FeatureCollection",
+            "crs": {"type": "name", "properties": {"name": "EPSG:4326"}},
+            "features": self.features,
+            "bbox": [0, -0.005, 4.25, 3],
+        }
+
+    def test_matches_full_decode_for_any_chunk_size(self):
+        document = json.dumps(self.feature_collection, indent=2)
+        for size in (1, 3, 7, 64, len(document)):
+            features = list(iter_feature_collection_features(chunked(document, size)))
+            self.assertEqual(features, self.features)
+
+    def test_empty_collections(self):
+        self.assertEqual(list(iter_feature_collection_features([b"{}"])), [])
+        self.assertEqual(
+            list(
+                iter_feature_collection_features(
+                    chunked('{"type": "FeatureCollection", "features": [ ]}', 2)
+                )
+            ),
+            [],
+        )
+
+    def test_truncated_document_raises(self):
+        document = json.dumps(self.feature_collection)[:-40]
+        with self.assertRaises(json.JSONDecodeError):
+            list(iter_feature_collection_features(chunked(document, 16)))
+
+    def test_features_are_yielded_before_the_stream_ends(self):
+        document = json.dumps({"type": "FeatureCollection", "features": self.features})
+        chunks_read = []
+
+        def chunks():
+            for chunk in chunked(document, 32):
+                chunks_read.append(chunk)
+                yield chunk
+
+        features = iter_feature_collection_features(chunks())
+        next(features)
+        self.assertLess(len(chunks_read), len(chunked(document, 32)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import json
+import unittest
+
+from shapely.geometry import GeometryCollection, MultiPolygon, Point, Polygon, mapping
+
+import json_serialization_helper
+from data_definitions import ErrorResponse
+from json_serialization_helper import (
+    dumps_json,
+    loads_json,
+    set_json_backend,
+    to_jsonable,
+)
+
+
+class TestToJsonable(unittest.TestCase):
+    def setUp(self):
+        self.polygon = Polygon([(0.123456789, 1.5), (2, 3), (4.25, -5e-3)])
+        self.multi_polygon = MultiPolygon(
+            [self.polygon, Polygon([(5, 5), (6, 5), (6, 6)])]
+        )
+
+    def test_matches_shapely_encoder_round_trip(self):
+        geometries = [self.polygon, self.multi_polygon, Point(1, 2)]
+        data = {
+            "type": "FeatureCollection",
+            "features": [
+                {"type": "Feature", "geometry": geometry, "properties": {"id": i}}
+                for i, geometry in enumerate(geometries)
+            ],
+        }
+        expected = json.loads(
+            json.dumps(data, default=lambda geometry: mapping(geometry))
+        )
+        self.assertEqual(to_jsonable(data), expected)
+
+    def test_rounds_geometries_and_coordinates(self):
+        converted = to_jsonable(
+            {
+                "geometry": self.polygon,
+                "feature": {"coordinates": [0.123456789, 1.987654321]},
+                "properties": {"area": 0.123456789},
+            },
+            precision=3,
+        )
+        self.assertEqual(converted["geometry"]["coordinates"][0][0], [0.123, 1.5])
+        self.assertEqual(converted["feature"]["coordinates"], [0.123, 1.988])
+        self.assertEqual(converted["properties"]["area"], 0.123456789)
+
+    def test_geometry_collections(self):
+        converted = to_jsonable(
+            GeometryCollection([Point(0.1234, 1), self.polygon]), precision=2
+        )
+        self.assertEqual(converted["type"], "GeometryCollection")
+        self.assertEqual(
+            converted["geometries"][0], {"type": "Point", "coordinates": [0.12, 1.0]}
+        )
+
+    def test_dataclasses(self):
+        error = ErrorResponse(status=0, message="Not found", code=404)
+        self.assertEqual(
+            to_jsonable([error]), [{"status": 0, "message": "Not found", "code": 404}]
+        )
+
+
+class TestJsonBackends(unittest.TestCase):
+    def tearDown(self):
+        set_json_backend("auto")
+
+    def test_backends_produce_the_same_document(self):
+        data = {
+            "error": ErrorResponse(status=0, message="Ünïcödé", code=400),
+            "geometry": Point(1.5, 2),
+            "values": [1, 2.5, None, True],
+        }
+        documents = []
+        for backend in ("stdlib", "orjson"):
+            if backend == "orjson" and json_serialization_helper.orjson is None:
+                continue
+            set_json_backend(backend)
+            documents.append(loads_json(dumps_json(data).encode("utf-8")))
+        for document in documents:
+            self.assertEqual(document, documents[0])
+
+    def test_unknown_backend_falls_back_to_stdlib(self):
+        self.assertEqual(set_json_backend("simdjson"), "stdlib")
+
+
+if __name__ == "__main__":
+    unittest.main()
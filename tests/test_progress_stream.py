@@ -0,0 +1,48 @@
+import asyncio
+import unittest
+
+from progress_stream import ProgressBroker, ProgressStreamServer
+
+
+class TestProgressStreamServer(unittest.TestCase):
+    def request(self, data: bytes) -> bytes:
+        async def send():
+            stream_server = ProgressStreamServer(
+                ProgressBroker(redis_instance=None), keepalive=1
+            )
+            server = await asyncio.start_server(stream_server.handle, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.write(data)
+                await writer.drain()
+                response = await asyncio.wait_for(reader.read(), timeout=5)
+                writer.close()
+                return response
+
+        return asyncio.run(send())
+
+    def status_line(self, data: bytes) -> bytes:
+        return self.request(data).split(b"\r\n", 1)[0]
+
+    def test_oversized_header_lines_are_rejected(self):
+        data = b"GET /progress/s1 HTTP/1.1\r\nX-Big: " + b"a" * 70000 + b"\r\n\r\n"
+        self.assertEqual(self.status_line(data), b"HTTP/1.1 400 Bad Request")
+
+    def test_oversized_request_lines_are_rejected(self):
+        data = b"GET /progress/" + b"a" * 70000 + b" HTTP/1.1\r\n\r\n"
+        self.assertEqual(self.status_line(data), b"HTTP/1.1 400 Bad Request")
+
+    def test_unknown_paths_are_not_found(self):
+        for path in (b"/stats", b"/progress/bad.id"):
+            with self.subTest(path=path):
+                data = b"GET " + path + b" HTTP/1.1\r\n\r\n"
+                self.assertEqual(self.status_line(data), b"HTTP/1.1 404 Not Found")
+
+    def test_other_methods_are_not_allowed(self):
+        data = b"POST /progress/s1 HTTP/1.1\r\n\r\n"
+        self.assertEqual(self.status_line(data), b"HTTP/1.1 405 Method Not Allowed")
+
+
+if __name__ == "__main__":
+    unittest.main()
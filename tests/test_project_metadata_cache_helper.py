@@ -0,0 +1,82 @@
+import unittest
+from unittest import mock
+
+import project_metadata_cache_helper
+from data_definitions import ErrorResponse, GeodesignhubSystem
+from project_metadata_cache_helper import ProjectMetadataCache
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class TestProjectMetadataCache(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(
+            project_metadata_cache_helper.time, "time", side_effect=lambda: self.now
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.redis_instance = fakeredis.FakeRedis()
+        self.cache = ProjectMetadataCache(
+            self.redis_instance, ttls={"systems": 300, "tags": 60}
+        )
+        self.loads = 0
+
+    def load_systems(self):
+        self.loads += 1
+        return [
+            GeodesignhubSystem(
+                id=1, name="Energy", color="#ff0000", verbose_description="Energy"
+            )
+        ]
+
+    def get_systems(self, cache: ProjectMetadataCache = None):
+        return (cache or self.cache).get("p1", "t1", "systems", self.load_systems)
+
+    def test_values_are_loaded_once_per_ttl(self):
+        self.assertEqual(self.get_systems(), self.get_systems())
+        self.assertEqual(self.loads, 1)
+        # Another process reads the stored entry
+        other_process = ProjectMetadataCache(self.redis_instance, ttls={"systems": 300})
+        self.get_systems(other_process)
+        self.assertEqual(self.loads, 1)
+
+    def test_memo_and_entry_expire(self):
+        self.get_systems()
+        self.now += 299
+        self.get_systems()
+        self.assertEqual(self.loads, 1)
+        self.now += 2
+        self.get_systems()
+        self.assertEqual(self.loads, 2)
+
+    def test_invalidate_drops_the_entries_of_every_process(self):
+        other_process = ProjectMetadataCache(self.redis_instance, ttls={"systems": 300})
+        self.get_systems()
+        self.get_systems(other_process)
+        self.assertEqual(self.loads, 1)
+
+        self.cache.invalidate("p1")
+        self.get_systems(other_process)
+        self.assertEqual(self.loads, 2)
+        self.get_systems()
+        self.assertEqual(self.loads, 2)
+
+    def test_callers_get_copies(self):
+        systems = self.get_systems()
+        systems[0].name = "Changed"
+        systems.append(None)
+        self.assertEqual(self.get_systems(), self.load_systems())
+
+    def test_errors_are_not_cached(self):
+        error = ErrorResponse(status=0, message="Not found", code=404)
+        self.cache.get("p1", "t1", "tags", lambda: error)
+        self.assertEqual(self.cache.get("p1", "t1", "tags", lambda: ["t"]), ["t"])
+
+
+if __name__ == "__main__":
+    unittest.main()
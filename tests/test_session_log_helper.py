@@ -0,0 +1,76 @@
+import unittest
+from unittest import mock
+
+import redis
+
+import config
+from session_log_helper import (
+    append_session_log,
+    is_session_log_cursor,
+    read_session_logs,
+    session_log_key,
+)
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+class TestSessionLogCursor(unittest.TestCase):
+    def test_only_stream_entry_ids_are_cursors(self):
+        self.assertTrue(is_session_log_cursor("1700000000000-0"))
+        for cursor in ("", "-", "+", "1700000000000", "0-0-0", "abc-1", "1-1 "):
+            with self.subTest(cursor=cursor):
+                self.assertFalse(is_session_log_cursor(cursor))
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class TestSessionLogStream(unittest.TestCase):
+    def setUp(self):
+        self.redis_instance = fakeredis.FakeRedis()
+
+    def test_reads_the_messages_after_a_cursor(self):
+        cursors = [
+            append_session_log(self.redis_instance, "s1", f"message {i}")
+            for i in range(3)
+        ]
+        messages, cursor = read_session_logs(self.redis_instance, "s1")
+        self.assertEqual(messages, ["message 0", "message 1", "message 2"])
+        self.assertEqual(cursor, cursors[-1])
+
+        messages, cursor = read_session_logs(
+            self.redis_instance, "s1", since=cursors[0]
+        )
+        self.assertEqual(messages, ["message 1", "message 2"])
+        self.assertEqual(cursor, cursors[-1])
+
+        # Nothing new keeps the cursor
+        messages, cursor = read_session_logs(
+            self.redis_instance, "s1", since=cursors[-1]
+        )
+        self.assertEqual((messages, cursor), ([], cursors[-1]))
+
+    def test_missing_stream_has_no_messages(self):
+        self.assertEqual(read_session_logs(self.redis_instance, "missing"), ([], ""))
+        self.assertEqual(
+            read_session_logs(self.redis_instance, "missing", since="1-0"),
+            ([], "1-0"),
+        )
+
+    def test_stream_is_capped_and_expires(self):
+        xadd = redis.client.Pipeline.xadd
+        with mock.patch.dict(
+            config.external_api_settings,
+            {"SESSION_LOG_MAX_ENTRIES": 10, "SESSION_LOG_TTL": 60},
+        ), mock.patch.object(
+            redis.client.Pipeline, "xadd", autospec=True, side_effect=xadd
+        ) as xadd_spy:
+            append_session_log(self.redis_instance, "s1", "message 0")
+            self.redis_instance.expire(session_log_key("s1"), 5)
+            append_session_log(self.redis_instance, "s1", "message 1")
+        # Redis trims whole nodes of the stream once it is well over the cap
+        self.assertEqual(xadd_spy.call_args.kwargs["maxlen"], 10)
+        self.assertTrue(xadd_spy.call_args.kwargs["approximate"])
+        # Every message refreshes the TTL
+        self.assertGreater(self.redis_instance.ttl(session_log_key("s1")), 5)
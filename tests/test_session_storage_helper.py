@@ -0,0 +1,58 @@
+import json
+import unittest
+import zlib
+
+import session_storage_helper
+from data_definitions import AGOLExportStatus
+from session_storage_helper import decode_value, encode_value
+
+
+class TestSessionStorageCodec(unittest.TestCase):
+    def setUp(self):
+        self.design = {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": [i * 0.001, 51.5]},
+                    "properties": {"diagram_name": "Ünïcödé", "diagram_id": i},
+                }
+                for i in range(200)
+            ],
+        }
+
+    def test_round_trip_for_every_compression(self):
+        self.addCleanup(
+            setattr,
+            session_storage_helper,
+            "compression",
+            session_storage_helper.compression,
+        )
+        for compression in ("zlib", "none", "zstd"):
+            if compression == "zstd" and session_storage_helper.zstandard is None:
+                continue
+            with self.subTest(compression=compression):
+                session_storage_helper.compression = compression
+                encoded = encode_value(self.design)
+                self.assertEqual(decode_value(encoded), self.design)
+                if compression != "none":
+                    self.assertLess(len(encoded), len(json.dumps(self.design)))
+
+    def test_small_values_and_dataclasses(self):
+        status = AGOLExportStatus(status=1, messages=["Done"], success_url="")
+        encoded = encode_value(status)
+        self.assertEqual(encoded[:1], session_storage_helper.HEADER_JSON)
+        self.assertEqual(
+            decode_value(encoded),
+            {"status": 1, "messages": ["Done"], "success_url": ""},
+        )
+
+    def test_legacy_values(self):
+        self.assertEqual(decode_value(json.dumps(self.design).encode()), self.design)
+        self.assertEqual(
+            decode_value(zlib.compress(json.dumps(self.design).encode())), self.design
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
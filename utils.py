@@ -1,32 +1,63 @@
 from arcgis.gis import GIS, Item
+from arcgis.features import FeatureLayerCollection
 from conn import get_redis
 import time
-from typing import Union
+from typing import Dict, List, Optional, Union
 from data_definitions import (
     ArcGISDesignPayload,
     AGOLItemDetails,
     AGOLExportStatus,
     AGOLSubmissionPayload,
+    AGOLSubmissionJobReference,
+    GeodesignhubDataStorage,
+    GeodesignhubDesignGeoJSON,
+    GeodesignhubSystem,
     GeodesignhubProjectTags,
     AllSystemDetails,
     AGOLFeatureLayerPublishingResponse,
     AGOLWebMapCombinedExtent,
     AGOLWebMapSpatialExtent,
+    GeodesignhubDesignSyncState,
+    AGOLExportContext,
+    GeoJSONSerializationReport,
+    ErrorResponse,
+    ExportPrefetchPayload,
+    ExportPrefetchResult,
+    FeatureServiceLayer,
+    GeodesignhubDesignDetail,
 )
 import shutil
 from PIL import ImageColor
-import geojson
 from geojson import FeatureCollection
-import json
 from dataclasses import asdict
 import logging
 import tempfile
 from dacite import from_dict
 import os
 import pandas as pd
+import re
+import shapely
+from shapely.geometry import shape
 from arcgis.map import Map
 from storymap_helper import StoryMapPublisher
 from esri_fields_schema_helper import AGOLItemSchemaGenerator
+from circuit_breaker_helper import guarded_by
+from design_sync_helper import (
+    design_exported_key,
+    design_sync_key,
+    geojson_to_esri_feature,
+    group_features_by_diagram,
+    is_design_exported,
+    load_design_sync_state,
+    store_design_sync_state,
+)
+from gdh_downloads_helper import GeodesignhubDataDownloader
+from design_transform_helper import LAYER_GEOMETRY_TYPES, route_features_to_layers
+from json_serialization_helper import dumps_geojson, dumps_json
+from blob_store_helper import BlobStore
+from session_storage_helper import SessionStorage
+from progress_helper import PROGRESS_EVENT_LOG, PROGRESS_EVENT_STATUS, publish_progress
+import config
 
 logger = logging.getLogger("esri-gdh-bridge")
 from dotenv import load_dotenv, find_dotenv
@@ -37,18 +68,183 @@ ENV_FILE = find_dotenv()
 if ENV_FILE:
     load_dotenv(ENV_FILE)
 r = get_redis()
+blob_store = BlobStore(r, ttl=config.external_api_settings["BLOB_STORE_TTL"])
+session_storage = SessionStorage(r)
+
+# Designs are uploaded as a GeoJSON item and published, or added to an empty feature service
+EXPORT_MODE_GEOJSON = "geojson"
+EXPORT_MODE_ESRI_JSON = "esri_json"
+
+
+def load_agol_submission_payload(
+    job_reference: AGOLSubmissionJobReference,
+) -> AGOLSubmissionPayload:
+    """Builds the submission payload of a job from the blobs it references"""
+    design_data = blob_store.get(job_reference.design_blob)
+    # The dataclasses are built directly, dacite would rebuild the whole FeatureCollection
+    design_data["design_geojson"] = GeodesignhubDesignGeoJSON(
+        geojson=design_data["design_geojson"]["geojson"]
+    )
+    return AGOLSubmissionPayload(
+        design_data=ArcGISDesignPayload(
+            gdh_design_details=GeodesignhubDataStorage(**design_data)
+        ),
+        tags_data=from_dict(
+            data_class=GeodesignhubProjectTags,
+            data=blob_store.get(job_reference.tags_blob),
+        ),
+        agol_token=job_reference.agol_token,
+        session_id=job_reference.session_id,
+        gdh_systems_information=AllSystemDetails(
+            systems=[
+                GeodesignhubSystem(**system)
+                for system in blob_store.get(job_reference.systems_blob)
+            ]
+        ),
+        gdh_project_details=job_reference.gdh_project_details,
+        include_webmap=job_reference.include_webmap,
+        include_storymap=job_reference.include_storymap,
+        incremental_sync=job_reference.incremental_sync,
+        diagram_change_ids=job_reference.diagram_change_ids,
+        export_mode=job_reference.export_mode,
+    )
+
+
+def export_prefetch_key(session_id: str) -> str:
+    return f"{session_id}_prefetch"
+
+
+def prefetch_export_context(prefetch_payload: ExportPrefetchPayload):
+    """Downloads project details, systems, the design, its details and tags from Geodesignhub,
+    transforms the design and stores it with the tags and systems as the export context of
+    the session, so that the confirmation form of /export/ can be rendered right away and its
+    POST only has to enqueue. The feature count and name of the design, or the error, are
+    stored as the prefetch result the export page polls for."""
+    session_id = prefetch_payload.session_id
+    prefetch_result = ExportPrefetchResult(
+        status=0, message="Error in downloading the design from Geodesignhub"
+    )
+    try:
+        my_geodesignhub_downloader = GeodesignhubDataDownloader(
+            session_id=session_id,
+            project_id=prefetch_payload.project_id,
+            synthesis_id=prefetch_payload.design_id,
+            cteam_id=prefetch_payload.design_team_id,
+            apitoken=prefetch_payload.apitoken,
+        )
+        # Project details, systems, the design, its details and the tags are downloaded together
+        _gdh_export_data = (
+            my_geodesignhub_downloader.download_export_data_from_geodesignhub()
+        )
+        for _downloaded in (
+            _gdh_export_data.project_details,
+            _gdh_export_data.systems,
+            _gdh_export_data.design_data,
+            _gdh_export_data.design_details,
+            _gdh_export_data.tags,
+        ):
+            if isinstance(_downloaded, ErrorResponse):
+                prefetch_result.message = _downloaded.message
+                return
+        # The design is decoded feature by feature from the response stream into plain dicts,
+        # so there is no need for another serialization round trip
+        gj_serialized = _gdh_export_data.design_data
+        _num_features = len(gj_serialized["features"])
+
+        design_geojson = GeodesignhubDesignGeoJSON(
+            geojson=my_geodesignhub_downloader.parse_transform_geojson(
+                design_feature_collection={"geojson": gj_serialized},
+                precision=prefetch_payload.coordinate_precision,
+            )
+        )
+        design_details = from_dict(
+            data_class=GeodesignhubDesignDetail, data=_gdh_export_data.design_details
+        )
+        # Make the design name only alpha numeric since AGOL only supports alpha-numeric names
+        _design_name = re.sub("[^0-9a-zA-Z]+", "_", design_details.description)
+
+        gdh_data_for_storage = GeodesignhubDataStorage(
+            design_geojson=design_geojson,
+            design_id=prefetch_payload.design_id,
+            design_team_id=prefetch_payload.design_team_id,
+            project_id=prefetch_payload.project_id,
+            design_name=_design_name,
+            coordinate_precision=prefetch_payload.coordinate_precision,
+        )
 
+        # The change IDs are read right after the design, an edit after this is seen by the
+        # next incremental sync. Only a design with a sync state can be synced incrementally,
+        # the first export records an empty state and syncs every diagram the next time.
+        diagram_change_ids: Dict[str, str] = {}
+        if is_design_exported(
+            r,
+            project_id=prefetch_payload.project_id,
+            design_team_id=prefetch_payload.design_team_id,
+            design_id=prefetch_payload.design_id,
+        ):
+            diagram_change_ids = my_geodesignhub_downloader.download_diagram_change_ids(
+                diagram_ids=list(group_features_by_diagram(design_geojson.geojson))
+            )
 
-def publish_design_to_agol(agol_submission_payload: AGOLSubmissionPayload):
-    """This method one by one submits the designs and the tags data to AGOL"""
-    agol_token = agol_submission_payload.agol_token
-    my_arc_gis_helper = ArcGISHelper(agol_token=agol_token)
+        # The design is serialized once, for the blob store, and its size reported against
+        # the design JSON as it was received
+        design_serialized = dumps_json(gdh_data_for_storage).encode("utf-8")
+        serialization_report = GeoJSONSerializationReport(
+            precision=prefetch_payload.coordinate_precision,
+            original_bytes=my_geodesignhub_downloader.design_bytes_downloaded,
+            serialized_bytes=len(design_serialized),
+            bytes_saved=my_geodesignhub_downloader.design_bytes_downloaded
+            - len(design_serialized),
+        )
+
+        # Everything the job needs, the POST of the confirmation form enqueues it as is
+        export_context = AGOLExportContext(
+            design_blob=blob_store.put_serialized(design_serialized),
+            tags_blob=blob_store.put(_gdh_export_data.tags),
+            systems_blob=blob_store.put(_gdh_export_data.systems),
+            gdh_project_details=_gdh_export_data.project_details,
+            diagram_change_ids=diagram_change_ids,
+        )
+        session_storage.set(session_id + "_context", export_context, ex=60000)
+        logger.info(
+            f"Export context stored with {_num_features} features at {serialization_report.precision} decimals, {serialization_report.serialized_bytes} bytes, {serialization_report.bytes_saved} bytes saved"
+        )
+        prefetch_result = ExportPrefetchResult(
+            status=1,
+            message="Design is ready for migration",
+            geodesignhub_design_feature_count=_num_features,
+            geodesignhub_design_name=_design_name,
+        )
+    except Exception as e:
+        logger.error(f"Unhandled error in prefetch_export_context: {e}")
+    finally:
+        session_storage.set(export_prefetch_key(session_id), prefetch_result, ex=60000)
+
+
+def publish_design_to_agol(
+    agol_submission_payload: Union[AGOLSubmissionPayload, AGOLSubmissionJobReference],
+):
+    """This method one by one submits the designs and the tags data to AGOL, jobs enqueued
+    with a reference load the design, tags and systems from the blob store and release them
+    when they finish"""
+    job_reference = None
+    if isinstance(agol_submission_payload, AGOLSubmissionJobReference):
+        job_reference = agol_submission_payload
     agol_export_status = AGOLExportStatus(status=0, messages=[""], success_url="")
     submission_processing_result_key = "{session_id}_status".format(
         session_id=agol_submission_payload.session_id
     )
+    session_id = agol_submission_payload.session_id
+
+    def report_progress(message: str):
+        logger.info(message)
+        publish_progress(r, session_id, PROGRESS_EVENT_LOG, {"message": message})
 
     try:
+        if job_reference is not None:
+            agol_submission_payload = load_agol_submission_payload(job_reference)
+        agol_token = agol_submission_payload.agol_token
+        my_arc_gis_helper = ArcGISHelper(agol_token=agol_token)
         folder_created = my_arc_gis_helper.create_folder(
             project_title=agol_submission_payload.gdh_project_details.project_title
         )
@@ -57,26 +253,80 @@ def publish_design_to_agol(agol_submission_payload: AGOLSubmissionPayload):
             agol_export_status.messages.append(
                 "Error creating folder in AGOL, aborting export, this happens becuase your ArcGIS token might have expired, please relogin via Geodesignhub interface and try again..."
             )
-            logger.info("Error creating folder in AGOL, aborting export...")
+            report_progress("Error creating folder in AGOL, aborting export...")
 
         else:
-            submission_status_details = my_arc_gis_helper.export_design_json_to_agol(
-                design_data=agol_submission_payload.design_data,
-                gdh_systems_information=agol_submission_payload.gdh_systems_information,
+            _gdh_design_details = agol_submission_payload.design_data.gdh_design_details
+            # The change IDs were read with the design, the state recorded here lets the
+            # next export of the design be incremental
+            diagram_change_ids = agol_submission_payload.diagram_change_ids
+            sync_key = design_sync_key(
+                project_id=_gdh_design_details.project_id,
+                design_team_id=_gdh_design_details.design_team_id,
+                design_id=_gdh_design_details.design_id,
+                agol_username=my_arc_gis_helper.get_gis().users.me.username,
             )
+            sync_state = None
+            if agol_submission_payload.incremental_sync:
+                sync_state = load_design_sync_state(r, sync_key)
+
+            submission_status_details = None
+            if sync_state:
+                submission_status_details = my_arc_gis_helper.sync_design_json_to_agol(
+                    design_data=agol_submission_payload.design_data,
+                    sync_state=sync_state,
+                    diagram_change_ids=diagram_change_ids,
+                )
+                if submission_status_details is None:
+                    report_progress(
+                        "The previously exported layer no longer exists, publishing the design again..."
+                    )
+            synced_in_place = submission_status_details is not None
+            if not synced_in_place:
+                report_progress("Exporting the design to ArcGIS Online...")
+                export_design = (
+                    my_arc_gis_helper.create_design_feature_service_in_agol
+                    if agol_submission_payload.export_mode == EXPORT_MODE_ESRI_JSON
+                    else my_arc_gis_helper.export_design_json_to_agol
+                )
+                submission_status_details = export_design(
+                    design_data=agol_submission_payload.design_data,
+                    gdh_systems_information=agol_submission_payload.gdh_systems_information,
+                )
 
             if submission_status_details.status == 0:
                 agol_export_status.status = 0
                 agol_export_status.messages.append(
-                    "A design with the same ID already exists in your profile in ArcGIS Online, you must delete that first in ArcGIS Online and try the migration again."
+                    submission_status_details.message
+                    if synced_in_place
+                    else "A design with the same ID already exists in your profile in ArcGIS Online, you must delete that first in ArcGIS Online and try the migration again."
                 )
             else:
                 agol_export_status.status = 1
                 agol_export_status.success_url = submission_status_details.url
                 agol_export_status.messages.append(
-                    "Successfully created Feature Layer on ArcGIS Online"
+                    submission_status_details.message
+                    if synced_in_place
+                    else "Successfully created Feature Layer on ArcGIS Online"
                 )
-            logger.info(
+                if not synced_in_place:
+                    sync_state = GeodesignhubDesignSyncState(
+                        feature_service_item_id=submission_status_details.item.id,
+                        diagram_change_ids=dict(diagram_change_ids),
+                        synced_at=time.time(),
+                    )
+                sync_state.synced_at = time.time()
+                store_design_sync_state(
+                    r,
+                    sync_key,
+                    sync_state,
+                    exported_key=design_exported_key(
+                        project_id=_gdh_design_details.project_id,
+                        design_team_id=_gdh_design_details.design_team_id,
+                        design_id=_gdh_design_details.design_id,
+                    ),
+                )
+            report_progress(
                 "Found {num_tags} tags in Geodesignhub".format(
                     num_tags=len(agol_submission_payload.tags_data.tags)
                 )
@@ -93,17 +343,17 @@ def publish_design_to_agol(agol_submission_payload: AGOLSubmissionPayload):
                         f"Warning: Failed to export project tags: {tags_error}"
                     )
 
-            # Create a web map and publish it
-            if submission_status_details.status:
+            # Create a web map and publish it, a layer updated in place is already in them
+            if submission_status_details.status and not synced_in_place:
                 if agol_submission_payload.include_webmap:
-                    logger.info("Webmap included in the export")
+                    report_progress("Webmap included in the export")
                     my_webmap_item = my_arc_gis_helper.publish_feature_layer_as_webmap(
                         feature_layer_item=submission_status_details.item,
                         design_data=agol_submission_payload.design_data,
                         gdh_systems_information=agol_submission_payload.gdh_systems_information,
                     )
                 if agol_submission_payload.include_storymap:
-                    logger.info("Storymap included in the export")
+                    report_progress("Storymap included in the export")
                     my_storymap_publisher = StoryMapPublisher(
                         design_data=agol_submission_payload.design_data,
                         gdh_systems_information=agol_submission_payload.gdh_systems_information,
@@ -119,8 +369,17 @@ def publish_design_to_agol(agol_submission_payload: AGOLSubmissionPayload):
         agol_export_status.messages.append(f"Export failed with error: {e}")
 
     finally:
-        r.set(submission_processing_result_key, json.dumps(asdict(agol_export_status)))
-        r.expire(submission_processing_result_key, time=6000)
+        session_storage.set(
+            submission_processing_result_key, agol_export_status, ex=6000
+        )
+        publish_progress(r, session_id, PROGRESS_EVENT_STATUS, agol_export_status)
+        if job_reference is not None:
+            for blob_hash in (
+                job_reference.design_blob,
+                job_reference.tags_blob,
+                job_reference.systems_blob,
+            ):
+                blob_store.release(blob_hash)
 
 
 class ArcGISHelper:
@@ -170,15 +429,24 @@ class ArcGISHelper:
     def get_gis(self) -> GIS:
         return self.gis
 
-    def get_layers_for_feature_service(self, item_id: str) -> list:
-        """Get all layers for a feature service"""
+    @guarded_by("arcgis")
+    def get_layers_for_feature_service(self, item_id: str) -> List[FeatureServiceLayer]:
+        """Get all layers for a feature service, they are listed from the service definition
+        in one request instead of loading the properties of every layer"""
         item = self.gis.content.get(item_id)
         if item is None:
             raise ValueError(f"Item with ID {item_id} not found.")
         if item.type != "Feature Service":
             raise ValueError(f"Item with ID {item_id} is not a Feature Service.")
-        return item.layers
+        service_url = item.url.rstrip("/")
+        return [
+            FeatureServiceLayer(
+                id=layer.id, name=layer.name, url=f"{service_url}/{layer.id}"
+            )
+            for layer in FeatureLayerCollection.fromitem(item).properties.layers
+        ]
 
+    @guarded_by("arcgis")
     def get_ok_for_migration_items(self, data_format: str):
         """Get all items that are ok for migration from AGOL"""
         owner = self.gis.users.me.username
@@ -228,6 +496,7 @@ class ArcGISHelper:
         logger.info(f"Item downloaded to {save_path}")
         return True
 
+    @guarded_by("arcgis")
     def create_gis_object(self) -> GIS:
         gis = GIS("https://www.arcgis.com/", token=self.agol_token)
         return gis
@@ -260,8 +529,9 @@ class ArcGISHelper:
 
     def check_if_design_exists(self, project_id: str, design_id: str, gis: GIS) -> bool:
         object_already_exists = False
+        # Designs are exported as GeoJSON items or created directly as feature services
         search_results = gis.content.search(
-            query=f"snippet:{design_id}-{project_id}", item_type="GeoJson"
+            query=f'snippet:{design_id}-{project_id} AND (type:"GeoJson" OR type:"Feature Service")'
         )
 
         if search_results:
@@ -508,6 +778,269 @@ class ArcGISHelper:
         else:
             logger.info("No 'CODE:' prefix found to remove.")
 
+    def sync_design_json_to_agol(
+        self,
+        design_data: ArcGISDesignPayload,
+        sync_state: GeodesignhubDesignSyncState,
+        diagram_change_ids: Dict[str, str],
+        batch_size: int = 250,
+    ) -> Optional[AGOLFeatureLayerPublishingResponse]:
+        """
+        Updates the feature layer of an earlier export in place. Features of diagrams whose
+        change ID moved, or could not be read, are deleted and added again, features of
+        diagrams no longer in the design are deleted. The change IDs of the diagrams that
+        were synced are updated in sync_state. Returns None when the layer no longer exists.
+        """
+        feature_layer_item = self.gis.content.get(sync_state.feature_service_item_id)
+        if feature_layer_item is None:
+            return None
+
+        features_by_diagram = group_features_by_diagram(
+            design_data.gdh_design_details.design_geojson.geojson
+        )
+        changed_diagram_ids = [
+            diagram_id
+            for diagram_id in features_by_diagram
+            if diagram_id not in diagram_change_ids
+            or sync_state.diagram_change_ids.get(diagram_id)
+            != diagram_change_ids[diagram_id]
+        ]
+        removed_diagram_ids = [
+            diagram_id
+            for diagram_id in sync_state.diagram_change_ids
+            if diagram_id not in features_by_diagram
+        ]
+        logger.info(
+            f"{len(changed_diagram_ids)} diagrams changed and {len(removed_diagram_ids)} removed since the last export"
+        )
+
+        layers = {
+            layer.properties.geometryType: layer for layer in feature_layer_item.layers
+        }
+        for diagram_id in changed_diagram_ids:
+            for feature in features_by_diagram[diagram_id]:
+                if (
+                    LAYER_GEOMETRY_TYPES.get(feature["geometry"]["type"])
+                    not in layers
+                ):
+                    return AGOLFeatureLayerPublishingResponse(
+                        status=0,
+                        item=None,
+                        url="",
+                        message="The design has geometry types that the layer exported earlier does not have, you must delete that layer first in ArcGIS Online and try the migration again.",
+                    )
+
+        stale_diagram_ids = changed_diagram_ids + removed_diagram_ids
+        failed_diagram_ids = set()
+        if stale_diagram_ids:
+            stale_where = "diagram_id IN ({})".format(
+                ",".join(
+                    diagram_id if diagram_id.isdigit() else f"'{diagram_id}'"
+                    for diagram_id in stale_diagram_ids
+                )
+            )
+            for geometry_type, layer in layers.items():
+                layer.delete_features(where=stale_where)
+
+                spatial_reference = layer.properties.extent["spatialReference"]
+                wkid = spatial_reference.get(
+                    "latestWkid", spatial_reference.get("wkid", 4326)
+                )
+                field_names = {
+                    field["name"].lower(): field["name"]
+                    for field in layer.properties.fields
+                }
+                adds: List[dict] = []
+                add_diagram_ids: List[str] = []
+                for diagram_id in changed_diagram_ids:
+                    for feature in features_by_diagram[diagram_id]:
+                        if (
+                            LAYER_GEOMETRY_TYPES[feature["geometry"]["type"]]
+                            != geometry_type
+                        ):
+                            continue
+                        adds.append(
+                            geojson_to_esri_feature(feature, field_names, wkid=wkid)
+                        )
+                        add_diagram_ids.append(diagram_id)
+
+                added = self.add_features_in_batches(layer, adds, batch_size)
+                for diagram_id, success in zip(add_diagram_ids, added):
+                    if not success:
+                        failed_diagram_ids.add(diagram_id)
+
+        for diagram_id in removed_diagram_ids:
+            sync_state.diagram_change_ids.pop(diagram_id, None)
+        for diagram_id in changed_diagram_ids:
+            if diagram_id in failed_diagram_ids or diagram_id not in diagram_change_ids:
+                # Synced again on the next export
+                sync_state.diagram_change_ids.pop(diagram_id, None)
+            else:
+                sync_state.diagram_change_ids[diagram_id] = diagram_change_ids[diagram_id]
+
+        message = f"Updated the existing Feature Layer on ArcGIS Online, {len(changed_diagram_ids)} changed and {len(removed_diagram_ids)} removed diagrams"
+        if failed_diagram_ids:
+            message += f", {len(failed_diagram_ids)} diagrams could not be added"
+        return AGOLFeatureLayerPublishingResponse(
+            status=1,
+            item=feature_layer_item,
+            url=feature_layer_item.url,
+            message=message,
+        )
+
+    def add_features_in_batches(
+        self, layer, adds: List[dict], batch_size: int = 250
+    ) -> List[bool]:
+        """Adds Esri JSON features to a layer batch_size at a time, returns whether each feature was added"""
+        added: List[bool] = []
+        for start in range(0, len(adds), batch_size):
+            batch = adds[start : start + batch_size]
+            result = layer.edit_features(adds=batch)
+            add_results = result.get("addResults", [])
+            added.extend(
+                add_results[offset].get("success", False)
+                if offset < len(add_results)
+                else False
+                for offset in range(len(batch))
+            )
+        return added
+
+    def create_design_feature_service_in_agol(
+        self,
+        design_data: ArcGISDesignPayload,
+        gdh_systems_information: AllSystemDetails,
+        batch_size: int = 250,
+    ) -> AGOLFeatureLayerPublishingResponse:
+        """
+        Exports a design without the GeoJSON item: an empty hosted feature service is created
+        with a layer per geometry type from the AGOLItemSchemaGenerator schema and renderer,
+        and the features are added as Esri JSON with batched edit_features calls. The tag
+        codes are written to a text field so they need no fixing afterwards.
+        """
+        _gdh_design_details = design_data.gdh_design_details
+        design_id = _gdh_design_details.design_id
+        project_id = _gdh_design_details.project_id
+        agol_snippet = design_id + "-" + project_id
+
+        design_exists_in_profile = self.check_if_design_exists(
+            gis=self.gis, design_id=design_id, project_id=project_id
+        )
+        if design_exists_in_profile:
+            logger.info("Design already exists in profile, it cannot be re-uploaded")
+            return AGOLFeatureLayerPublishingResponse(
+                status=0,
+                item=None,
+                url="",
+                message="Design already exists in profile, it cannot be re-uploaded",
+            )
+
+        safe_design_name = (
+            _gdh_design_details.design_name.strip()
+            if _gdh_design_details.design_name
+            else "UntitledDesign"
+        )
+        if not safe_design_name:
+            safe_design_name = "UntitledDesign"
+        # Service names may only contain letters, digits and underscores
+        service_name = re.sub(
+            r"[^A-Za-z0-9_]+", "_", f"{safe_design_name}_{design_id}"
+        ).strip("_")
+
+        schema = AGOLItemSchemaGenerator(item_name=service_name)
+        routed_features = route_features_to_layers(
+            _gdh_design_details.design_geojson.geojson["features"],
+            schema.publish_parameters,
+        )
+        spatial_reference = {"wkid": 4326, "latestWkid": 4326}
+        layer_definitions = []
+        for layer_definition in schema.publish_parameters["layers"]:
+            layer_features = routed_features[layer_definition["name"]]
+            # Like publish(), only the geometry types in the design get a layer
+            if not layer_features:
+                continue
+            xmin, ymin, xmax, ymax = shapely.total_bounds(
+                [shape(f["geometry"]) for f in layer_features]
+            ).tolist()
+            layer_definitions.append(
+                {
+                    **layer_definition,
+                    "id": len(layer_definitions),
+                    # Area and length are maintained by the hosted service
+                    "fields": [
+                        {**field, "editable": field["type"] != "esriFieldTypeOID"}
+                        for field in layer_definition["fields"]
+                        if field["name"] not in ("Shape__Area", "Shape__Length")
+                    ],
+                    "extent": {
+                        "xmin": xmin,
+                        "ymin": ymin,
+                        "xmax": xmax,
+                        "ymax": ymax,
+                        "spatialReference": spatial_reference,
+                    },
+                    "drawingInfo": {
+                        "renderer": self.create_uv_renderer(
+                            geometry_type=layer_definition["geometryType"],
+                            unique_field_name="system_name",
+                            gdh_project_systems=gdh_systems_information,
+                        )
+                    },
+                }
+            )
+
+        feature_service_item = None
+        try:
+            feature_service_item = self.gis.content.create_service(
+                name=service_name,
+                wkid=4326,
+                folder=self.folder.name,
+                item_properties={
+                    "title": safe_design_name,
+                    "snippet": agol_snippet,
+                    "description": design_id,
+                    "tags": "Geodesignhub",
+                },
+            )
+            FeatureLayerCollection.fromitem(
+                feature_service_item
+            ).manager.add_to_definition({"layers": layer_definitions})
+
+            failed_features = 0
+            for layer in feature_service_item.layers:
+                field_names = {
+                    field["name"].lower(): field["name"]
+                    for field in layer.properties.fields
+                }
+                adds = [
+                    geojson_to_esri_feature(feature, field_names, wkid=4326)
+                    for feature in routed_features[layer.properties.name]
+                ]
+                added = self.add_features_in_batches(layer, adds, batch_size)
+                failed_features += added.count(False)
+                logger.info(
+                    f"Added {len(adds)} features to {layer.properties.name} - {layer.properties.geometryType}"
+                )
+        except Exception as e:
+            logger.info(f"Error creating the feature service in AGOL: {e}")
+            if feature_service_item is not None:
+                feature_service_item.delete()
+            return AGOLFeatureLayerPublishingResponse(
+                status=0,
+                item=None,
+                url="",
+                message="Error publishing the Design JSON to ArcGIS online",
+            )
+
+        message = "Layer is published as Feature Service"
+        if failed_features:
+            message += f", {failed_features} features could not be added"
+        return AGOLFeatureLayerPublishingResponse(
+            status=1,
+            item=feature_service_item,
+            url=feature_service_item.url,
+            message=message,
+        )
+
     def export_design_json_to_agol(
         self,
         design_data: ArcGISDesignPayload,
@@ -516,7 +1049,7 @@ class ArcGISHelper:
         _gdh_design_details = design_data.gdh_design_details
         _gdh_project_systems = gdh_systems_information
         design_id = _gdh_design_details.design_id
-        project_id = _gdh_design_details.design_id
+        project_id = _gdh_design_details.project_id
         agol_snippet = design_id + "-" + project_id
 
         design_exists_in_profile = self.check_if_design_exists(
@@ -562,7 +1095,7 @@ class ArcGISHelper:
 
         # Write GeoJSON to temp file
         with tempfile.NamedTemporaryFile(mode="w", delete=False) as output:
-            output.write(geojson.dumps(_gdh_design_feature_collection))
+            output.write(dumps_geojson(_gdh_design_feature_collection))
             temp_geojson_path = output.name
 
         # Add the item